@@ -1,3 +1,5 @@
+import os
+import sys
 import socket
 import struct
 import threading
@@ -5,6 +7,11 @@ import time
 import tkinter as tk
 import json
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from grid_canvas import GridCanvas
+from protocol import JSON_ZDICT, RECV_BUFFER, decompress_payload
+from receiver import DatagramReceiver
+
 serverName = 'localhost'
 serverPort = 12000
 
@@ -25,29 +32,15 @@ info_label.pack(pady=5)
 frame = tk.Frame(root)
 frame.pack(pady=10)
 
-# 10x10 grid buttons
+# 10x10 grid drawn on one canvas
 GRID_SIZE = 10
-buttons = []
 cell_owner = [[0 for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]  # track ownership locally
 player_id = None  # optional (could be assigned by server)
 
 
 def update_button_colors():
-    """Update colors based on cell_owner values."""
-    for r in range(GRID_SIZE):
-        for c in range(GRID_SIZE):
-            val = cell_owner[r][c]
-            if val == 0:
-                color = "lightgray"
-            elif val == 1:
-                color = "lightblue"
-            elif val == 2:
-                color = "lightgreen"
-            elif val == 3:
-                color = "salmon"
-            else:
-                color = "plum"
-            buttons[r][c].config(bg=color)
+    """Hand the new cell_owner values to the board; only changed cells get redrawn."""
+    board.set_all(val for row in cell_owner for val in row)
 
 
 def on_cell_click(r, c):
@@ -58,15 +51,10 @@ def on_cell_click(r, c):
     print(f"[EVENT] Sent ACQUIRE_CELL ({r}, {c})")
 
 
-# Create grid buttons
-for r in range(GRID_SIZE):
-    row = []
-    for c in range(GRID_SIZE):
-        b = tk.Button(frame, text=f"{r},{c}", width=5, height=2,
-                      command=lambda r=r, c=c: on_cell_click(r, c))
-        b.grid(row=r, column=c, padx=2, pady=2)
-        row.append(b)
-    buttons.append(row)
+# Create grid board (owner 0 = unclaimed, 4+ = plum)
+board = GridCanvas(frame, GRID_SIZE, {0: "lightgray", 1: "lightblue", 2: "lightgreen", 3: "salmon"},
+                   "plum", initial_owner=0, cell_px=44, on_click=on_cell_click)
+board.pack()
 
 # ===================== NETWORKING =====================
 
@@ -74,16 +62,17 @@ for r in range(GRID_SIZE):
 def listen_for_snapshots():
     """Continuously listens for incoming snapshots and updates grid."""
     global cell_owner
+    receiver = DatagramReceiver(clientSocket)  # one reused buffer, payloads are views into it
     while running:
         try:
-            data, serverAddress = clientSocket.recvfrom(2048)
-            header = struct.unpack(HEADER_FORMAT, data[:HEADER_SIZE])
+            header, snapshot_data, serverAddress = receiver.receive()
             protocol_id, version, msg_type, snapshot_id, seq_num, timestamp, payload_len = header
 
             if msg_type in (3, 4, 5):  # FULL / DELTA / HEARTBEAT
-                snapshot_data = data[HEADER_SIZE:HEADER_SIZE + payload_len]
+                if version == 2:  # deflated JSON
+                    snapshot_data = decompress_payload(snapshot_data, JSON_ZDICT)
                 try:
-                    grid = json.loads(snapshot_data.decode())
+                    grid = json.loads(bytes(snapshot_data))
                 except Exception:
                     grid = []
                 if grid:
@@ -101,13 +90,14 @@ def listen_for_snapshots():
 
 
 # INIT handshake
-init_packet = struct.pack(HEADER_FORMAT, b'DOMX', 1, 0, 0, 0, int(time.time() * 1000), 0)
+# version 2 = this client accepts compressed snapshots
+init_packet = struct.pack(HEADER_FORMAT, b'DOMX', 2, 0, 0, 0, int(time.time() * 1000), 0)
 clientSocket.sendto(init_packet, (serverName, serverPort))
 info_label.config(text="Sent INIT message")
 print("Sent INIT message")
 
 # Wait for ACK
-data, serverAddress = clientSocket.recvfrom(1200)
+data, serverAddress = clientSocket.recvfrom(RECV_BUFFER)
 header = struct.unpack(HEADER_FORMAT, data[:HEADER_SIZE])
 print(f"Received ACK: msg_type={header[2]}")
 info_label.config(text="Connected! Waiting for snapshots...")
@@ -4,11 +4,26 @@
 # 3. Add GAME_OVER to be better than Tarek
 # Delta Encoding: Changes since last snapshot, heartbeat snapshot, resending lost snapshot
 
+import argparse
+import os
+import sys
 import socket
 import threading
 import time
 import struct
 import json
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tick_scheduler import TickScheduler
+from protocol import JSON_ZDICT, compress_payload
+from receiver import DatagramReceiver
+from recorder import InputRecorder
+from timer_wheel import TimerWheel
+
+parser = argparse.ArgumentParser(description="Aser GridClash server")
+parser.add_argument('--record', metavar='PATH', help="append every inbound datagram and snapshot round to PATH")
+args = parser.parse_args()
 
 serverPort = 12000
 serverSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -17,9 +32,17 @@ print(f"Server Started on port number {serverPort}")
 
 frequency = 20
 TICK_INTERVAL = 1 / frequency
+SNAPSHOT_INTERVAL = TICK_INTERVAL * 10  # snapshots go out every 10 ticks
 
 clients = {}  # Track connected clients
 clientNumber = 0
+
+# Clients silent for CLIENT_TIMEOUT seconds are dropped. The receive loop only stamps
+# 'last_heard' and queues new clients; the broadcast thread alone uses the timer wheel
+CLIENT_TIMEOUT = 10.0
+liveness = TimerWheel(resolution=0.1, slots=512, now=time.time())
+joinedClients = deque()
+evictedClients = 0
 snapshot_id = 0
 
 rows, cols = 10, 10
@@ -32,48 +55,125 @@ HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
 
 modifiedFlag = True  # Tracks if the grid was modified
 
+# Clients that send INIT with header version 2 accept deflated JSON (JSON_ZDICT);
+# a compressed snapshot is sent with header version 2, a plain one with version 1
+COMPRESSED_VERSION = 2
+compression_stats = {'snapshots': 0, 'raw_bytes': 0, 'sent_bytes': 0, 'seconds': 0.0}
+STATS_ROUNDS = 100  # snapshot rounds between compression stats lines
+snapshotRounds = 0
+
+# Inbound datagrams and snapshot rounds in the recorder.py format (replay.py --info reads it)
+recorder = None
+if args.record:
+    recorder = InputRecorder(args.record, {'server': 'aser', 'grid_size': rows,
+                                           'frequency': 1 / SNAPSHOT_INTERVAL})
+    print(f"Recording inputs to {args.record}")
+
+
+def encode_grid(compressible):
+    """Return (header version, payload) for the current grid"""
+    payload = json.dumps(grid).encode()
+    if not compressible:
+        return 1, payload
+    start = time.perf_counter()
+    compressed = compress_payload(payload, JSON_ZDICT)
+    compression_stats['snapshots'] += 1
+    compression_stats['raw_bytes'] += len(payload)
+    compression_stats['seconds'] += time.perf_counter() - start
+    if len(compressed) < len(payload):
+        compression_stats['sent_bytes'] += len(compressed)
+        return COMPRESSED_VERSION, compressed
+    compression_stats['sent_bytes'] += len(payload)
+    return 1, payload
+
+
+def compression_summary():
+    stats = compression_stats
+    ratio = stats['sent_bytes'] / stats['raw_bytes'] if stats['raw_bytes'] else 1.0
+    cost = stats['seconds'] / stats['snapshots'] * 1e6 if stats['snapshots'] else 0.0
+    return (f"[STATS] {stats['snapshots']} snapshots compressed, ratio {ratio:.2f}, "
+            f"{cost:.0f} us/snapshot")
+
 # ======================================
 # Broadcast Thread
 # ======================================
 def broadcast_snapshots():
     """Periodically broadcast current game state to all clients."""
-    global modifiedFlag
+    scheduler = TickScheduler(1 / SNAPSHOT_INTERVAL)
+    scheduler.start()
     while True:
-        for client_addr, info in list(clients.items()):
-            info['last_snapshot'] += 1
-            info['seq'] += 1
-
-            # If the grid was modified and client has ACKed, send delta (msg_type=4)
-            if modifiedFlag and info['last_ack']:
-                snapshot_payload = json.dumps(grid).encode()
-                payloadLen = len(snapshot_payload)
-                snapshot_packet = struct.pack(
-                    HEADER_FORMAT, b'DOMX', 1, 4, info['last_snapshot'], info['seq'],
-                    int(time.time() * 1000), payloadLen
-                )
-                serverSocket.sendto(snapshot_packet + snapshot_payload, client_addr)
-                info['last_ack'] = False
-
-            # If grid not modified, send heartbeat (msg_type=5)
-            elif not modifiedFlag:
-                snapshot_packet = struct.pack(
-                    HEADER_FORMAT, b'DOMX', 1, 5, info['last_snapshot'], info['seq'],
-                    int(time.time() * 1000), 0
-                )
-                serverSocket.sendto(snapshot_packet, client_addr)
-
-            # If client missed last ACK, send full snapshot (msg_type=3)
-            elif not info['last_ack']:
-                snapshot_payload = json.dumps(grid).encode()
-                payloadLen = len(snapshot_payload)
-                snapshot_packet = struct.pack(
-                    HEADER_FORMAT, b'DOMX', 1, 3, info['last_snapshot'], info['seq'],
-                    int(time.time() * 1000), payloadLen
-                )
-                serverSocket.sendto(snapshot_packet + snapshot_payload, client_addr)
-
-        modifiedFlag = False
-        time.sleep(TICK_INTERVAL * 10)
+        time.sleep(scheduler.delay())
+        scheduler.tick(send_snapshots)
+
+
+def send_snapshots():
+    """Send one round of FULL / DELTA / HEARTBEAT snapshots."""
+    global modifiedFlag, snapshotRounds
+    if recorder:
+        recorder.tick()
+    expire_clients(time.time())
+    snapshotRounds += 1
+    if snapshotRounds % STATS_ROUNDS == 0 and compression_stats['snapshots']:
+        print(compression_summary())
+    encoded = {}  # the grid is encoded once per round for each payload format
+    for client_addr, info in list(clients.items()):
+        compressible = info['version'] >= COMPRESSED_VERSION
+        info['last_snapshot'] += 1
+        info['seq'] += 1
+
+        # If the grid was modified and client has ACKed, send delta (msg_type=4)
+        if modifiedFlag and info['last_ack']:
+            if compressible not in encoded:
+                encoded[compressible] = encode_grid(compressible)
+            version, snapshot_payload = encoded[compressible]
+            payloadLen = len(snapshot_payload)
+            snapshot_packet = struct.pack(
+                HEADER_FORMAT, b'DOMX', version, 4, info['last_snapshot'], info['seq'],
+                int(time.time() * 1000), payloadLen
+            )
+            serverSocket.sendto(snapshot_packet + snapshot_payload, client_addr)
+            info['last_ack'] = False
+
+        # If grid not modified, send heartbeat (msg_type=5)
+        elif not modifiedFlag:
+            snapshot_packet = struct.pack(
+                HEADER_FORMAT, b'DOMX', 1, 5, info['last_snapshot'], info['seq'],
+                int(time.time() * 1000), 0
+            )
+            serverSocket.sendto(snapshot_packet, client_addr)
+
+        # If client missed last ACK, send full snapshot (msg_type=3)
+        elif not info['last_ack']:
+            if compressible not in encoded:
+                encoded[compressible] = encode_grid(compressible)
+            version, snapshot_payload = encoded[compressible]
+            payloadLen = len(snapshot_payload)
+            snapshot_packet = struct.pack(
+                HEADER_FORMAT, b'DOMX', version, 3, info['last_snapshot'], info['seq'],
+                int(time.time() * 1000), payloadLen
+            )
+            serverSocket.sendto(snapshot_packet + snapshot_payload, client_addr)
+
+    modifiedFlag = False
+
+
+def expire_clients(now):
+    """Drop clients not heard from for CLIENT_TIMEOUT seconds; only the timers that fire are checked"""
+    global evictedClients
+    for _ in range(len(joinedClients)):
+        client_addr = joinedClients.popleft()
+        if client_addr in clients:
+            liveness.schedule(client_addr, clients[client_addr]['last_heard'] + CLIENT_TIMEOUT)
+    for client_addr in liveness.advance(now):
+        info = clients.get(client_addr)
+        if info is None:
+            continue
+        if info['last_heard'] + CLIENT_TIMEOUT > now:
+            liveness.schedule(client_addr, info['last_heard'] + CLIENT_TIMEOUT)
+        else:
+            del clients[client_addr]
+            evictedClients += 1
+            print(f"[TIMEOUT] Client {client_addr} dropped: {len(clients)} active, {evictedClients} evicted")
 
 
 # Start broadcasting in a background thread
@@ -83,30 +183,36 @@ threading.Thread(target=broadcast_snapshots, daemon=True).start()
 # ======================================
 # Listen for Client Messages
 # ======================================
+receiver = DatagramReceiver(serverSocket)  # preallocated buffer, header parsed in place
 while True:  # msg_type: INIT=0, ACK=1, EVENT=2, FULL=3, DELTA=4, HEARTBEAT=5
-    data, clientAddress = serverSocket.recvfrom(2048)
-
-    # Parse header
-    header = struct.unpack(HEADER_FORMAT, data[:HEADER_SIZE])
+    header, payload, clientAddress = receiver.receive()
+    if recorder:
+        recorder.datagram(struct.pack(HEADER_FORMAT, *header) + payload, clientAddress)
     protocol_id, version, msg_type, snap_id, seq, timestamp, payload_len = header
+    info = clients.get(clientAddress)
+    if info is not None:
+        info['last_heard'] = time.time()
 
     # Handle INIT (client connects)
     if msg_type == 0:
         clientNumber += 1
-        clients[clientAddress] = {'seq': 0, 'last_snapshot': 0, 'client number': clientNumber, 'last_ack': False}
+        clients[clientAddress] = {'seq': 0, 'last_snapshot': 0, 'client number': clientNumber, 'last_ack': False,
+                                  'version': version, 'last_heard': time.time()}
+        joinedClients.append(clientAddress)
         print(f"[INIT] Client connected: {clientAddress}, Player #{clientNumber}")
 
+
         # Send ACK
         response = struct.pack(HEADER_FORMAT, b'DOMX', 1, 1, 0, 0, int(time.time() * 1000), 0)
         serverSocket.sendto(response, clientAddress)
 
         # Send FULL snapshot (msg_type=3)
-        initial_snapshot_payload = json.dumps(grid).encode()
+        snapshot_version, initial_snapshot_payload = encode_grid(version >= COMPRESSED_VERSION)
         payloadLen = len(initial_snapshot_payload)
         clients[clientAddress]['last_snapshot'] += 1
         clients[clientAddress]['seq'] += 1
         headers = struct.pack(
-            HEADER_FORMAT, b'DOMX', 1, 3,
+            HEADER_FORMAT, b'DOMX', snapshot_version, 3,
             clients[clientAddress]['last_snapshot'],
             clients[clientAddress]['seq'],
             int(time.time() * 1000), payloadLen
@@ -115,16 +221,15 @@ while True:  # msg_type: INIT=0, ACK=1, EVENT=2, FULL=3, DELTA=4, HEARTBEAT=5
 
     # Handle ACK
     elif msg_type == 1:
-        if clientAddress in clients:
-            clients[clientAddress]['last_ack'] = True
+        if info is not None:
+            info['last_ack'] = True
             # print(f"[ACK] from {clientAddress}")
 
     # Handle EVENT (ACQUIRE_CELL r c)
     elif msg_type == 2:
 
         modifiedFlag = True
-        payload = data[HEADER_SIZE:HEADER_SIZE + payload_len]
-        message = payload.decode()
+        message = bytes(payload).decode()
         print(f"[EVENT] From {clientAddress}: {message}")
 
         parts = message.split()
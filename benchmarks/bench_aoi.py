@@ -0,0 +1,73 @@
+"""Bytes per tick per client and broadcast cost, whole-map deltas versus viewports.
+
+1000x1000 board, 256 clients that acknowledge every snapshot, random claims
+all over the map. With --view each client subscribes to its own square
+viewport at a random position, so no two clients share a delta.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gridclash_core import GridClashCore
+
+GRID_SIZE = 1000
+CLIENTS = 256
+CHANGES_PER_TICK = 2000
+WARMUP_TICKS = 5
+TICKS = 20
+
+
+class CountingEngine:
+    def __init__(self):
+        self.bytes = 0
+        self.datagrams = 0
+
+    def sendto(self, data, address):
+        self.bytes += len(data)
+        self.datagrams += 1
+
+
+def measure(grid_engine, view_size):
+    rng = random.Random(1)
+    # No timeout: the simulated clients never send anything
+    core = GridClashCore(port=0, grid_size=GRID_SIZE, grid_engine=grid_engine, client_timeout=0)
+    core.engine = engine = CountingEngine()
+    core.running = True
+    core.next_stats_log = float('inf')
+    for i in range(CLIENTS):
+        address = ('10.0.0.1', 20000 + i)
+        core.add_client(address, 2)
+        if view_size:
+            core.set_view(address, (rng.randrange(GRID_SIZE - view_size), rng.randrange(GRID_SIZE - view_size),
+                                    view_size, view_size))
+
+    cells = GRID_SIZE * GRID_SIZE
+    for _ in range(cells // 4):
+        core.grid.set(rng.randrange(cells), rng.randint(1, 4))
+
+    elapsed = 0.0
+    for tick in range(WARMUP_TICKS + TICKS):
+        for _ in range(CHANGES_PER_TICK):
+            core.grid.set(rng.randrange(cells), rng.randint(1, 4))
+        if tick == WARMUP_TICKS:
+            engine.bytes = engine.datagrams = 0
+        start = time.perf_counter()
+        core.broadcast_delta_snapshot()
+        if tick >= WARMUP_TICKS:
+            elapsed += time.perf_counter() - start
+        for address in core.clients:
+            core.record_ack(address, core.snapshot_id)
+    return engine.bytes / TICKS / CLIENTS, engine.datagrams / TICKS / CLIENTS, elapsed / TICKS * 1000
+
+
+if __name__ == "__main__":
+    print(f"{GRID_SIZE}x{GRID_SIZE}, {CLIENTS} clients, {CHANGES_PER_TICK} changes/tick")
+    print(f"{'engine':>7} {'view':>10} {'B/tick/client':>14} {'dgrams/tick/client':>19} {'broadcast ms':>13}")
+    for grid_engine in ('dict', 'array'):
+        for view_size in (0, 100, 50):
+            per_client, datagrams, ms = measure(grid_engine, view_size)
+            view = f"{view_size}x{view_size}" if view_size else "whole map"
+            print(f"{grid_engine:>7} {view:>10} {per_client:>14.0f} {datagrams:>19.1f} {ms:>13.1f}")
@@ -0,0 +1,42 @@
+"""Compare text and binary delta payload sizes and encode/decode cost."""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol import HEADER_SIZE, encode_delta, decode_delta, encode_text_delta, decode_text_delta
+
+GRID_SIZE = 10
+ROUNDS = 2000
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func(*args)
+    return (time.perf_counter() - start) / ROUNDS * 1e6
+
+
+if __name__ == "__main__":
+    rng = random.Random(1)
+    print(f"{'changes':>8} {'text B':>8} {'bin B':>8} {'B/chg txt':>10} {'B/chg bin':>10} "
+          f"{'txt enc+dec us':>15} {'bin enc+dec us':>15}")
+    for changes in (1, 5, 10, 50, 100):
+        cells = rng.sample(range(GRID_SIZE * GRID_SIZE), changes)
+        owners = [rng.randint(1, 4) for _ in cells]
+
+        text = encode_text_delta(cells, owners, GRID_SIZE)
+        binary = encode_delta(cells, owners, GRID_SIZE)
+
+        # Both formats must carry exactly the same changes
+        assert decode_text_delta(text.decode(), GRID_SIZE) == (cells, owners)
+        _, _, indices, decoded_owners = decode_delta(binary)
+        assert list(zip(indices, decoded_owners)) == list(zip(cells, owners))
+
+        text_us = timed(lambda: decode_text_delta(encode_text_delta(cells, owners, GRID_SIZE).decode(), GRID_SIZE))
+        bin_us = timed(lambda: decode_delta(encode_delta(cells, owners, GRID_SIZE)))
+        print(f"{changes:>8} {len(text) + HEADER_SIZE:>8} {len(binary) + HEADER_SIZE:>8} "
+              f"{len(text) / changes:>10.1f} {len(binary) / changes:>10.1f} "
+              f"{text_us:>15.1f} {bin_us:>15.1f}")
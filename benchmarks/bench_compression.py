@@ -0,0 +1,70 @@
+"""Full-state snapshot size and CPU cost with and without compression.
+
+Boards are filled either with random owners or with four owner regions
+(what a played-out game looks like). Sizes include the protocol header;
+"1 dgram" says whether the snapshot fits a 1200 byte datagram.
+"""
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol import (HEADER_SIZE, JSON_ZDICT, encode_delta, decode_delta, compress_payload,
+                      decompress_payload)
+
+MTU_PAYLOAD = 1200
+ROUNDS = 50
+
+
+def timed(func):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func()
+    return (time.perf_counter() - start) / ROUNDS * 1e6
+
+
+def board(grid_size, fill, layout, rng):
+    owners = [0] * (grid_size * grid_size)
+    for index in rng.sample(range(len(owners)), int(len(owners) * fill)):
+        row, col = divmod(index, grid_size)
+        if layout == 'regions':
+            owners[index] = 1 + (row * 2 // grid_size) * 2 + col * 2 // grid_size
+        else:
+            owners[index] = rng.randint(1, 4)
+    return owners
+
+
+if __name__ == "__main__":
+    rng = random.Random(1)
+    print(f"{'grid':>5} {'fill':>5} {'layout':>8} | {'binary B':>9} {'deflate B':>9} {'ratio':>6} "
+          f"{'enc us':>8} {'+zip us':>8} {'dec us':>8} {'1 dgram':>8} | {'json B':>8} {'deflate B':>9} "
+          f"{'zip us':>7}")
+    for grid_size in (10, 32, 64, 100):
+        for fill in (0.3, 1.0):
+            for layout in ('random', 'regions'):
+                owners = board(grid_size, fill, layout, rng)
+                indices = [i for i, owner in enumerate(owners) if owner]
+                owned = [owners[i] for i in indices]
+
+                plain = encode_delta(indices, owned, grid_size, 1)
+                packed = encode_delta(indices, owned, grid_size, 1, compress=True)
+                assert list(decode_delta(packed)[2]) == indices
+                enc_us = timed(lambda: encode_delta(indices, owned, grid_size, 1))
+                zip_us = timed(lambda: encode_delta(indices, owned, grid_size, 1, compress=True)) - enc_us
+                dec_us = timed(lambda: decode_delta(packed))
+
+                # Aser_GUI ships the whole grid as a JSON list of lists
+                rows = [owners[r * grid_size:(r + 1) * grid_size] for r in range(grid_size)]
+                text = json.dumps(rows).encode()
+                deflated = compress_payload(text, JSON_ZDICT)
+                assert decompress_payload(deflated, JSON_ZDICT) == text
+                json_us = timed(lambda: compress_payload(text, JSON_ZDICT))
+
+                fits = 'yes' if HEADER_SIZE + len(packed) <= MTU_PAYLOAD else 'no'
+                print(f"{grid_size:>5} {fill:>5} {layout:>8} | {HEADER_SIZE + len(plain):>9} "
+                      f"{HEADER_SIZE + len(packed):>9} {len(packed) / len(plain):>6.2f} "
+                      f"{enc_us:>8.0f} {zip_us:>8.0f} {dec_us:>8.0f} {fits:>8} | "
+                      f"{HEADER_SIZE + len(text):>8} {HEADER_SIZE + len(deflated):>9} {json_us:>7.0f}")
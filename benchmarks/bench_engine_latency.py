@@ -0,0 +1,64 @@
+"""Request/response latency of the threaded and asyncio server engines."""
+import os
+import socket
+import statistics
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol import HEADER_FORMAT, HEADER_STRUCT
+from server_engine import create_engine
+from tick_scheduler import TickScheduler
+
+PINGS = 1000
+
+
+class EchoServer:
+    """Minimal engine host: echoes every datagram and ticks at 20 Hz"""
+
+    def __init__(self):
+        self.scheduler = TickScheduler(20)
+        self.engine = None
+        self.ticks = 0
+
+    def handle_packet(self, header, payload, address):
+        self.engine.sendto(HEADER_STRUCT.pack(*header), address)
+
+    def broadcast_delta_snapshot(self):
+        self.ticks += 1
+
+
+def measure(engine_type, port):
+    server = EchoServer()
+    server.engine = create_engine(server, port, engine_type)
+    server.engine.start()
+    time.sleep(0.1)
+
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    client.settimeout(1.0)
+    samples = []
+    for i in range(PINGS):
+        start = time.perf_counter()
+        client.sendto(struct.pack(HEADER_FORMAT, b'GCLP', 1, 4, 0, i, 0, 0), ('127.0.0.1', port))
+        client.recvfrom(2048)
+        samples.append((time.perf_counter() - start) * 1e6)
+    client.close()
+    server.engine.stop()
+
+    samples.sort()
+    return {
+        'p50': samples[len(samples) // 2],
+        'p99': samples[int(len(samples) * 0.99)],
+        'max': samples[-1],
+        'mean': statistics.mean(samples),
+    }
+
+
+if __name__ == "__main__":
+    print(f"{'engine':>10} {'mean us':>9} {'p50 us':>9} {'p99 us':>9} {'max us':>9}")
+    for engine_type, port in (('threaded', 12101), ('asyncio', 12102)):
+        result = measure(engine_type, port)
+        print(f"{engine_type:>10} {result['mean']:>9.1f} {result['p50']:>9.1f} "
+              f"{result['p99']:>9.1f} {result['max']:>9.1f}")
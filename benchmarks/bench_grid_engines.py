@@ -0,0 +1,80 @@
+"""Per-tick delta cost of the dict grid, the versioned store and the NumPy array engine."""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol import encode_delta
+from grid_store import VersionedGrid
+
+try:
+    from grid_array import ArrayGrid
+except ImportError:
+    ArrayGrid = None
+
+TICKS = 20
+CHURN = 0.001  # fraction of cells changed per tick
+
+
+def bench_dict(grid_size, changes_per_tick, rng):
+    """The original server: copy grid_state per tick and walk it against the baseline"""
+    grid_state = {}
+    for index in range(0, grid_size * grid_size, 2):
+        row, col = divmod(index, grid_size)
+        grid_state[f"{row}_{col}"] = rng.randint(1, 4)
+    history = {0: grid_state.copy()}
+
+    elapsed = 0.0
+    for snapshot_id in range(1, TICKS + 1):
+        for _ in range(changes_per_tick):
+            row, col = divmod(rng.randrange(grid_size * grid_size), grid_size)
+            grid_state[f"{row}_{col}"] = rng.randint(1, 4)
+
+        start = time.perf_counter()
+        history[snapshot_id] = grid_state.copy()
+        last_state = history[snapshot_id - 1]
+        delta = {}
+        for cell_id, owner in grid_state.items():
+            if cell_id not in last_state or last_state[cell_id] != owner:
+                delta[cell_id] = owner
+        indices = [int(r) * grid_size + int(c)
+                   for r, c in (cell_id.split('_') for cell_id in delta)]
+        encode_delta(indices, list(delta.values()), grid_size)
+        elapsed += time.perf_counter() - start
+        history.pop(snapshot_id - 1)
+    return elapsed / TICKS
+
+
+def bench_store(grid, changes_per_tick, rng):
+    """A grid store from this repo: commit the tick then encode the delta against the previous one"""
+    cell_count = grid.grid_size * grid.grid_size
+    for index in range(0, cell_count, 2):
+        grid.set(index, rng.randint(1, 4))
+    grid.commit(1)
+
+    elapsed = 0.0
+    for snapshot_id in range(2, TICKS + 2):
+        for _ in range(changes_per_tick):
+            grid.set(rng.randrange(cell_count), rng.randint(1, 4))
+
+        start = time.perf_counter()
+        grid.commit(snapshot_id)
+        indices, owners = grid.changes_since(snapshot_id - 1)
+        encode_delta(indices, owners, grid.grid_size)
+        elapsed += time.perf_counter() - start
+    return elapsed / TICKS
+
+
+if __name__ == "__main__":
+    print(f"{'grid':>10} {'changes':>8} {'dict ms':>10} {'versioned ms':>13} {'array ms':>10}")
+    for grid_size in (10, 100, 1000):
+        changes = max(1, int(grid_size * grid_size * CHURN))
+        dict_ms = bench_dict(grid_size, changes, random.Random(1)) * 1000
+        store_ms = bench_store(VersionedGrid(grid_size), changes, random.Random(1)) * 1000
+        if ArrayGrid is not None:
+            array_ms = f"{bench_store(ArrayGrid(grid_size), changes, random.Random(1)) * 1000:>10.3f}"
+        else:
+            array_ms = f"{'n/a':>10}"
+        print(f"{f'{grid_size}x{grid_size}':>10} {changes:>8} {dict_ms:>10.3f} {store_ms:>13.3f} {array_ms}")
@@ -0,0 +1,79 @@
+"""Cold-start time and request throughput of the headless and GUI servers.
+
+The GUI server is only measured when a display is available.
+"""
+import os
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from protocol import HEADER_FORMAT, PROTOCOL_VERSION
+
+REQUESTS = 20000
+WINDOW = 32  # requests kept in flight
+
+
+def init_packet():
+    return struct.pack(HEADER_FORMAT, b'GCLP', PROTOCOL_VERSION, 0, 0, 0,
+                       int(time.time() * 1000), 0)
+
+
+def measure(script, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(0.01)
+    address = ('127.0.0.1', port)
+
+    # Cold start: process launch until the first INIT is answered
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, script), '--port', str(port)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            sock.sendto(init_packet(), address)
+            try:
+                sock.recvfrom(2048)
+                break
+            except (socket.timeout, ConnectionRefusedError):
+                if process.poll() is not None:
+                    raise RuntimeError(f"{script} exited with code {process.returncode}")
+        cold_start = time.perf_counter() - start
+
+        # Throughput: INIT request/response pairs with a fixed window in flight
+        sock.settimeout(1.0)
+        packet = init_packet()
+        answered = 0
+        start = time.perf_counter()
+        for _ in range(WINDOW):
+            sock.sendto(packet, address)
+        while answered < REQUESTS:
+            try:
+                sock.recvfrom(2048)
+            except socket.timeout:
+                break
+            answered += 1
+            if answered + WINDOW <= REQUESTS:
+                sock.sendto(packet, address)
+        elapsed = time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.wait()
+        sock.close()
+    return cold_start, answered / elapsed
+
+
+if __name__ == "__main__":
+    targets = [('headless', 'server_headless.py', 12201)]
+    if os.environ.get('DISPLAY'):
+        targets.append(('gui', 'server_Decode.py', 12202))
+    else:
+        print("No DISPLAY: skipping the GUI server")
+
+    print(f"{'server':>10} {'cold start ms':>14} {'requests/s':>12}")
+    for name, script, port in targets:
+        cold_start, rate = measure(script, port)
+        print(f"{name:>10} {cold_start * 1000:>14.1f} {rate:>12.0f}")
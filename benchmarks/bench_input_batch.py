@@ -0,0 +1,71 @@
+"""Server cost per claim: one DATA datagram per claim versus INPUT_BATCH datagrams.
+
+Datagrams are fed straight into GridClashCore.handle_datagram, so the
+numbers are the parsing and apply cost on the receive path; every
+datagram also costs one recvfrom syscall on the server that a batch saves.
+"""
+import os
+import random
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol import (HEADER_FORMAT, PROTOCOL_VERSION, MSG_INPUT_BATCH, encode_ack,
+                      encode_input_batch)
+from gridclash_core import GridClashCore
+
+GRID_SIZE = 100
+CLAIMS = 20000
+ADDRESS = ('10.0.0.1', 20000)
+
+
+class NullEngine:
+    def sendto(self, data, address):
+        pass
+
+
+def make_core():
+    core = GridClashCore(port=0, grid_size=GRID_SIZE)
+    core.engine = NullEngine()
+    core.running = True
+    core.handle_datagram(struct.pack(HEADER_FORMAT, b'GCLP', PROTOCOL_VERSION, 0, 0, 0, 0, 0), ADDRESS)
+    return core
+
+
+def data_packets(cells):
+    packets = []
+    for seq, index in enumerate(cells, 1):
+        row, col = divmod(index, GRID_SIZE)
+        payload = encode_ack(0, 0) + f"ACQUIRE {row}_{col} 1".encode()
+        packets.append(struct.pack(HEADER_FORMAT, b'GCLP', PROTOCOL_VERSION, 1, 0, seq, 0, len(payload))
+                       + payload)
+    return packets
+
+
+def batch_packets(cells, size):
+    packets = []
+    for start in range(0, len(cells), size):
+        indices = cells[start:start + size]
+        payload = encode_input_batch(0, 0, indices, list(range(start + 1, start + 1 + len(indices))))
+        packets.append(struct.pack(HEADER_FORMAT, b'GCLP', PROTOCOL_VERSION, MSG_INPUT_BATCH, 0,
+                                   start + len(indices), 0, len(payload)) + payload)
+    return packets
+
+
+def measure(packets):
+    core = make_core()
+    start = time.perf_counter()
+    for packet in packets:
+        core.handle_datagram(packet, ADDRESS)
+    return (time.perf_counter() - start) / CLAIMS * 1e6
+
+
+if __name__ == "__main__":
+    rng = random.Random(1)
+    cells = [rng.randrange(GRID_SIZE * GRID_SIZE) for _ in range(CLAIMS)]
+    print(f"{'format':>16} {'datagrams':>10} {'bytes':>9} {'us/claim':>9}")
+    for name, packets in [('DATA per claim', data_packets(cells))] + \
+            [(f'INPUT_BATCH x{size}', batch_packets(cells, size)) for size in (1, 8, 32, 140)]:
+        print(f"{name:>16} {len(packets):>10} {sum(map(len, packets)):>9} {measure(packets):>9.2f}")
@@ -0,0 +1,104 @@
+"""Receive path: recvfrom + slicing versus DatagramReceiver (recvfrom_into).
+
+Bursts of INPUT_BATCH and ACK_BITS datagrams are queued on a local socket
+and then drained with the sender idle, so only the receive side is timed;
+each step parses the header and decodes the ack like the server does.
+Allocations per datagram are counted with tracemalloc by keeping everything
+one receive step produces alive until the end of the run.
+"""
+import os
+import socket
+import struct
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol import (HEADER_FORMAT, HEADER_SIZE, RECV_BUFFER, PROTOCOL_VERSION,
+                      MSG_ACK_BITS, MSG_INPUT_BATCH, decode_ack, encode_ack, encode_input_batch)
+from receiver import DatagramReceiver
+
+BURSTS = 200  # timed drains per variant, interleaved so both see the same machine noise
+BURST = 2000  # datagrams queued before each timed drain; fits the 4 MB SO_RCVBUF
+ALLOC_DATAGRAMS = 2000
+
+
+def datagrams():
+    batch = encode_input_batch(40, 0xffff, list(range(100, 108)), list(range(1, 9)))
+    ack = encode_ack(40, 0xffff)
+    return [struct.pack(HEADER_FORMAT, b'GCLP', PROTOCOL_VERSION, MSG_INPUT_BATCH, 0, 8, 0, len(batch)) + batch,
+            struct.pack(HEADER_FORMAT, b'GCLP', PROTOCOL_VERSION, MSG_ACK_BITS, 0, 8, 0, len(ack)) + ack]
+
+
+def copying_step(sock):
+    data, address = sock.recvfrom(RECV_BUFFER)
+    header = struct.unpack(HEADER_FORMAT, data[:HEADER_SIZE])
+    payload = data[HEADER_SIZE:HEADER_SIZE + header[6]]
+    return header, payload, address, decode_ack(payload)
+
+
+def zero_copy_step(receiver):
+    header, payload, address = receiver.receive()
+    return header, payload, address, decode_ack(payload)
+
+
+def make_socket():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+    sock.bind(('127.0.0.1', 0))
+    sock.settimeout(1.0)
+    return sock
+
+
+def fill(sock, sender, packets, count):
+    for i in range(count):
+        sender.sendto(packets[i % 2], sock.getsockname())
+
+
+def receive_rates(names):
+    """Drain alternating bursts with each variant; return the median datagrams/s per variant"""
+    sock = make_socket()
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    packets = datagrams()
+    steps = {'recvfrom': (copying_step, sock), 'recvfrom_into': (zero_copy_step, DatagramReceiver(sock))}
+    rates = {name: [] for name in names}
+    for _ in range(BURSTS):
+        for name in names:
+            step, arg = steps[name]
+            fill(sock, sender, packets, BURST)
+            start = time.perf_counter()
+            for _ in range(BURST):
+                step(arg)
+            rates[name].append(BURST / (time.perf_counter() - start))
+    sender.close()
+    sock.close()
+    return {name: sorted(values)[len(values) // 2] for name, values in rates.items()}
+
+
+def allocations(name):
+    sock = make_socket()
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    packets = datagrams()
+    step, arg = (zero_copy_step, DatagramReceiver(sock)) if name == 'recvfrom_into' else (copying_step, sock)
+    fill(sock, sender, packets, 1)
+    step(arg)
+    fill(sock, sender, packets, ALLOC_DATAGRAMS)
+    kept = [None] * ALLOC_DATAGRAMS
+    tracemalloc.start()
+    before = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    for i in range(ALLOC_DATAGRAMS):
+        kept[i] = step(arg)
+    after = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    tracemalloc.stop()
+    sender.close()
+    sock.close()
+    return (after - before) / ALLOC_DATAGRAMS
+
+
+if __name__ == "__main__":
+    print(f"{'receive step':>14} {'datagrams/s':>12} {'allocs/datagram':>16}")
+    names = ('recvfrom', 'recvfrom_into')
+    rates = receive_rates(names)
+    for name in names:
+        print(f"{name:>14} {rates[name]:>12.0f} {allocations(name):>16.1f}")
@@ -0,0 +1,104 @@
+"""Clients served at the target tick rate versus server_sharded.py worker count.
+
+Client sockets are spread over several load processes so the load side is
+not the bottleneck. Each client acknowledges every snapshot it receives;
+a client counts as served when it receives at least 95% of the expected
+snapshots during the measurement window.
+"""
+import multiprocessing as mp
+import os
+import random
+import selectors
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from protocol import HEADER_FORMAT, HEADER_SIZE, PROTOCOL_VERSION
+
+PORT = 12500
+FREQUENCY = 20
+GRID_SIZE = 100
+WARMUP = 1.0
+DURATION = 3.0
+LOAD_PROCESSES = 4
+
+
+def load_process(client_count, results):
+    address = ('127.0.0.1', PORT)
+    selector = selectors.DefaultSelector()
+    counts = {}
+    for _ in range(client_count):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        sock.sendto(struct.pack(HEADER_FORMAT, b'GCLP', PROTOCOL_VERSION, 0, 0, 0,
+                                int(time.time() * 1000), 0), address)
+        selector.register(sock, selectors.EVENT_READ)
+        counts[sock] = 0
+
+    rng = random.Random(os.getpid())
+    claimer = next(iter(counts))
+    start = time.monotonic()
+    measure_from = start + WARMUP
+    end = measure_from + DURATION
+    next_claim = start
+    while True:
+        now = time.monotonic()
+        if now >= end:
+            break
+        if now >= next_claim:
+            # A little churn so deltas are not empty
+            next_claim += 0.01
+            event = f"ACQUIRE {rng.randrange(GRID_SIZE)}_{rng.randrange(GRID_SIZE)} 1".encode()
+            claimer.sendto(struct.pack(HEADER_FORMAT, b'GCLP', 1, 1, 0, 0, 0, len(event)) + event, address)
+        for key, _ in selector.select(timeout=0.005):
+            sock = key.fileobj
+            try:
+                while True:
+                    data = sock.recv(65535)
+                    header = struct.unpack(HEADER_FORMAT, data[:HEADER_SIZE])
+                    if header[2] in (3, 5):
+                        if now >= measure_from:
+                            counts[sock] += 1
+                        ack = f"ACK {header[3]}".encode()
+                        sock.sendto(struct.pack(HEADER_FORMAT, b'GCLP', 1, 4, header[3], 0, 0,
+                                                len(ack)) + ack, address)
+            except BlockingIOError:
+                pass
+    results.put(list(counts.values()))
+
+
+def measure(workers, clients):
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'server_sharded.py'),
+                               '--workers', str(workers), '--port', str(PORT), '--quiet',
+                               '--grid-size', str(GRID_SIZE), '--frequency', str(FREQUENCY)])
+    time.sleep(1.0)
+    try:
+        results = mp.Queue()
+        per_process = clients // LOAD_PROCESSES
+        processes = [mp.Process(target=load_process, args=(per_process, results))
+                     for _ in range(LOAD_PROCESSES)]
+        for process in processes:
+            process.start()
+        counts = []
+        for _ in processes:
+            counts.extend(results.get())
+        for process in processes:
+            process.join()
+    finally:
+        server.terminate()
+        server.wait()
+    expected = FREQUENCY * DURATION
+    return sum(1 for count in counts if count >= expected * 0.95), len(counts)
+
+
+if __name__ == "__main__":
+    print(f"{'workers':>8} {'clients':>8} {'served at rate':>15}", flush=True)
+    for workers in (1, 2, 4):
+        for clients in (200, 800, 2000):
+            served, total = measure(workers, clients)
+            print(f"{workers:>8} {total:>8} {served:>15}", flush=True)
@@ -0,0 +1,209 @@
+"""Microbenchmark suite for the protocol hot paths.
+
+Runs every case across grid sizes, churn rates and client counts, writes the
+results as JSON and, given a previous results file, flags cases that got
+slower by more than the threshold (exit code 1).
+
+    python benchmarks/run_suite.py --output before.json
+    python benchmarks/run_suite.py --output after.json --compare before.json --threshold 0.10
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import struct
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from protocol import (HEADER_FORMAT, HEADER_SIZE, encode_delta, decode_delta,
+                      encode_text_delta, decode_text_delta)
+from gridclash_core import GridClashCore
+
+GRID_SIZES = (10, 100, 1000)
+CHURN_RATES = (0.001, 0.01)  # fraction of cells changed per tick
+CLIENT_COUNTS = (1, 50, 200)
+
+
+class NullEngine:
+    """Stands in for the network engine so broadcast cost excludes the kernel"""
+
+    def sendto(self, data, address):
+        pass
+
+
+def measure(func, min_time=0.2, repeat=3, setup=None):
+    """Best-of-`repeat` time per call in microseconds
+
+    setup, if given, runs untimed before every call (each call is then timed on its own).
+    """
+    def run(calls):
+        if setup is None:
+            start = time.perf_counter()
+            for _ in range(calls):
+                func()
+            return time.perf_counter() - start
+        elapsed = 0.0
+        for _ in range(calls):
+            setup()
+            start = time.perf_counter()
+            func()
+            elapsed += time.perf_counter() - start
+        return elapsed
+
+    calls = 1
+    while True:
+        elapsed = run(calls)
+        if elapsed >= min_time / 10:
+            break
+        calls *= 4
+    calls = max(1, int(calls * (min_time / 10) / max(elapsed, 1e-9)))
+    best = None
+    for _ in range(repeat):
+        per_call = run(calls) / calls
+        best = per_call if best is None else min(best, per_call)
+    return best * 1e6
+
+
+def make_core(grid_size, clients=0, version=2):
+    # No timeout: the simulated clients never send anything
+    core = GridClashCore(port=0, grid_size=grid_size, client_timeout=0)
+    core.engine = NullEngine()
+    core.running = True
+    core.next_stats_log = float('inf')
+    for i in range(clients):
+        core.add_client(('10.0.0.1', 20000 + i), version)
+    return core
+
+
+def churn_tick(core, rng, changes):
+    """Apply `changes` random claims, as the receive path would between two ticks"""
+    cells = core.grid_size * core.grid_size
+    for _ in range(changes):
+        core.grid.set(rng.randrange(cells), rng.randint(1, 4))
+
+
+def bench_header(results):
+    timestamp = int(time.time() * 1000)
+    packet = struct.pack(HEADER_FORMAT, b'GCLP', 1, 3, 1, 1, timestamp, 0)
+    results['header_pack'] = measure(
+        lambda: struct.pack(HEADER_FORMAT, b'GCLP', 1, 3, 1, 1, timestamp, 0))
+    results['header_unpack'] = measure(
+        lambda: struct.unpack(HEADER_FORMAT, packet[:HEADER_SIZE]))
+
+
+def bench_deltas(results):
+    for grid_size in GRID_SIZES:
+        cells = grid_size * grid_size
+        for churn in CHURN_RATES:
+            changes = max(1, int(cells * churn))
+            tag = f"grid={grid_size},churn={churn}"
+            rng = random.Random(1)
+            core = make_core(grid_size)
+            churn_tick(core, rng, cells // 2)
+            core.advance_snapshot()
+
+            # Timed apart: publishing a tick's claims, then the delta against the previous tick
+            results[f"commit[{tag}]"] = measure(core.advance_snapshot, setup=lambda: churn_tick(core, rng, changes))
+
+            def next_tick():
+                churn_tick(core, rng, changes)
+                core.advance_snapshot()
+            results[f"compute_delta[{tag}]"] = measure(lambda: core.compute_delta(core.snapshot_id - 1),
+                                                       setup=next_tick)
+
+            indices = rng.sample(range(cells), changes)
+            owners = [rng.randint(1, 4) for _ in indices]
+            text = encode_text_delta(indices, owners, grid_size)
+            binary = encode_delta(indices, owners, grid_size)
+            results[f"text_delta_encode[{tag}]"] = measure(
+                lambda: encode_text_delta(indices, owners, grid_size))
+            results[f"text_delta_decode[{tag}]"] = measure(
+                lambda: decode_text_delta(text.decode(), grid_size))
+            results[f"binary_delta_encode[{tag}]"] = measure(
+                lambda: encode_delta(indices, owners, grid_size))
+            results[f"binary_delta_decode[{tag}]"] = measure(lambda: decode_delta(binary))
+
+
+def bench_broadcast(results):
+    for clients in CLIENT_COUNTS:
+        for version in (1, 2):
+            rng = random.Random(1)
+            core = make_core(100, clients, version)
+            churn_tick(core, rng, 5000)
+
+            def broadcast():
+                churn_tick(core, rng, 10)
+                core.broadcast_delta_snapshot()
+                # Every client acknowledges right away, as on a clean network
+                for address in core.clients:
+                    core.client_last_ack[address] = core.snapshot_id
+            results[f"broadcast_tick[grid=100,clients={clients},version={version}]"] = measure(broadcast)
+
+
+def bench_json(results):
+    """The Aser_GUI full-state path: json.dumps(grid) on the server, json.loads on the client"""
+    for grid_size in GRID_SIZES[:2]:
+        rng = random.Random(1)
+        grid = [[rng.randint(0, 4) for _ in range(grid_size)] for _ in range(grid_size)]
+        payload = json.dumps(grid).encode()
+        results[f"json_dumps[grid={grid_size}]"] = measure(lambda: json.dumps(grid).encode())
+        results[f"json_loads[grid={grid_size}]"] = measure(lambda: json.loads(payload.decode()))
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ''
+
+
+def compare(results, baseline, threshold):
+    """Print the change of every case present in both runs; return the regressed cases"""
+    regressions = []
+    for name, value in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        change = value / before - 1
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:<60} {before:>12.2f} {value:>12.2f} {change * 100:>+8.1f}%{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GridClash hot path microbenchmarks")
+    parser.add_argument('--output', default=os.path.join(ROOT, 'benchmarks', 'results', 'latest.json'))
+    parser.add_argument('--compare', help="results file of an earlier run")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    results = {}
+    for bench in (bench_header, bench_deltas, bench_broadcast, bench_json):
+        bench(results)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump({'revision': git_revision(), 'python': platform.python_version(),
+                   'unit': 'us_per_call', 'results': results}, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"{'case':<60} {'before us':>12} {'after us':>12} {'change':>9}")
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print(f"{len(regressions)} case(s) slower by more than {args.threshold:.0%}")
+            sys.exit(1)
+    else:
+        for name, value in results.items():
+            print(f"{name:<60} {value:>12.2f} us")
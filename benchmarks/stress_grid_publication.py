@@ -0,0 +1,135 @@
+"""Stress test: a writer thread setting cells while readers use published snapshots.
+
+The writer calls grid.set() as fast as it can, a publisher thread commits at
+--frequency, and reader threads keep a replica of the grid up to date from
+changes_since() and check it against full_state() of the same published
+snapshot, plus the invariants of each snapshot (versions never go back,
+log entries in order and within the history). At the end one more commit
+must publish exactly the writer's back buffer, which catches updates the
+commits lost or reordered. The thread switch interval is shortened so the
+threads interleave far more often than they would in the server. Exits
+with status 1 on any inconsistency.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grid_store import create_grid
+
+
+def writer(grid, cells, seed, stop, counts):
+    rng = random.Random(seed)
+    count = 0
+    while not stop.is_set():
+        for _ in range(1000):
+            grid.set(rng.randrange(cells), rng.randint(1, 4))
+        count += 1000
+    counts.append(count)
+
+
+def publisher(grid, frequency, stop, counts):
+    snapshot_id = 0
+    interval = 1.0 / frequency
+    while not stop.is_set():
+        snapshot_id += 1
+        grid.commit(snapshot_id)
+        time.sleep(interval)
+    counts.append(snapshot_id)
+
+
+def as_dict(state):
+    indices, owners = state
+    return {int(index): int(owner) for index, owner in zip(indices, owners)}
+
+
+def check_log(snapshot):
+    """Invariants of a dict engine snapshot's change log"""
+    change_log = getattr(snapshot, 'change_log', ())
+    ids = [entry[0] for entry in change_log]
+    if ids != sorted(set(ids)):
+        return "change log out of order"
+    if ids and (ids[0] <= snapshot.floor or ids[-1] > snapshot.version):
+        return "change log outside (floor, version]"
+    return None
+
+
+def reader(grid, stop, results, view):
+    replica = None
+    base = 0
+    checks = deltas = resyncs = 0
+    errors = []
+    while not stop.is_set() and len(errors) < 5:
+        snapshot = grid.published  # every read below comes from this one version
+        if snapshot.version < base:
+            errors.append(f"version went back from {base} to {snapshot.version}")
+        problem = check_log(snapshot)
+        if problem:
+            errors.append(problem)
+
+        changes = snapshot.changes_since(base, view) if replica is not None else None
+        if changes is None:
+            replica = as_dict(snapshot.full_state(view))
+            resyncs += 1
+        else:
+            for index, owner in zip(*changes):
+                replica[int(index)] = int(owner)
+            deltas += 1
+        base = snapshot.version
+
+        if replica != as_dict(snapshot.full_state(view)):
+            errors.append(f"replica differs from full state at version {snapshot.version}")
+        checks += 1
+    results.append((checks, deltas, resyncs, errors))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--engine', choices=('dict', 'array'), default='dict')
+    parser.add_argument('--grid-size', type=int, default=200)
+    parser.add_argument('--writers', type=int, default=1,
+                        help="the grid supports one writer, as in the server; with more the final check can fail")
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--frequency', type=float, default=100, help="commits per second")
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--view', help="row,col,height,width: readers follow this viewport only")
+    args = parser.parse_args()
+
+    sys.setswitchinterval(1e-5)
+    grid = create_grid(args.grid_size, args.engine)
+    cells = args.grid_size * args.grid_size
+    view = tuple(int(v) for v in args.view.split(',')) if args.view else None
+    stop = threading.Event()
+    write_counts, commit_counts, results = [], [], []
+    threads = [threading.Thread(target=writer, args=(grid, cells, seed, stop, write_counts))
+               for seed in range(args.writers)]
+    threads.append(threading.Thread(target=publisher, args=(grid, args.frequency, stop, commit_counts)))
+    threads += [threading.Thread(target=reader, args=(grid, stop, results, view)) for _ in range(args.readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    # With the writer stopped, one more commit must publish exactly its back buffer
+    grid.commit(commit_counts[0] + 1)
+    final_errors = []
+    back = grid.cells if args.engine == 'array' else b''.join(grid.chunks)
+    expected = {index: owner for index, owner in enumerate(bytes(back)) if owner}
+    if as_dict(grid.published.full_state()) != expected:
+        final_errors.append("final snapshot != back buffer")
+
+    errors = [error for result in results for error in result[3]] + final_errors
+    print(f"{args.engine} {args.grid_size}x{args.grid_size}: {sum(write_counts)} sets by {args.writers} writers, "
+          f"{commit_counts[0]} commits, {sum(r[0] for r in results)} reader checks "
+          f"({sum(r[1] for r in results)} deltas, {sum(r[2] for r in results)} full resyncs) "
+          f"in {args.duration:g} s")
+    for error in errors:
+        print("FAIL:", error)
+    print("OK" if not errors else f"{len(errors)} inconsistencies")
+    sys.exit(1 if errors else 0)
@@ -126,6 +126,9 @@ class GridClashClient:
                 
                 if msg_type == 2:  # ACK
                     payload = data[HEADER_SIZE:HEADER_SIZE + payload_len].decode()
+                    if payload.startswith('REJECTED:'):
+                        self.message_queue.put(('error', f"Server refused the connection: {payload[9:]}"))
+                        continue
                     self.player_id = int(payload.split(':')[1])
                     self.message_queue.put(('connected', self.player_id))
                 
@@ -1,3 +1,4 @@
+import argparse
 import socket
 import struct
 import time
@@ -5,31 +6,88 @@ import tkinter as tk
 from tkinter import ttk
 import threading
 import queue
+from protocol import (HEADER_FORMAT, HEADER_SIZE, PROTOCOL_VERSION, MSG_ACK_BITS, MSG_FRAGMENT, MSG_SUBSCRIBE,
+                      MSG_INPUT_BATCH, MSG_RESET, MAX_INPUT_BATCH, decode_delta, decode_text_delta, encode_ack,
+                      echo_timestamp, encode_input_batch, encode_subscribe, merge_ack)
+from fragmentation import Reassembler
+from receiver import DatagramReceiver
+from grid_canvas import GridCanvas, FRAME_MS
+from metrics import MetricsRegistry, MetricsServer, DURATION_BUCKETS, latency_summary
 
 serverName = 'localhost'
 serverPort = 12000
-HEADER_FORMAT = '!4s B B I I Q H'
-HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+LOG_INTERVAL = 1.0  # seconds between activity log summaries of snapshot traffic
+ACK_INTERVAL = 0.1  # a standalone ack goes out only if nothing else carried one for this long
+KEEPALIVE_INTERVAL = 2.0  # with nothing to ack, the last ack is repeated this often (server timeout: 10 s)
+RESET_RETRY = 1.0  # seconds between INITs sent in answer to RESET
+METRICS_LOG_INTERVAL = 10.0  # seconds between latency summary lines
+PREDICTION_TIMEOUT = 1.0  # seconds before a claim the server never confirmed is rolled back
 
 class GridClashClient:
-    def __init__(self, root):
+    def __init__(self, root, grid_size=10, view=None, metrics_port=0):
         self.root = root
         self.root.title("GridClash - Client")
         self.root.geometry("800x900")
         self.root.configure(bg="#1a1a2e")
         
         self.clientSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # Room for a burst of fragments from a large full-state snapshot
+        self.clientSocket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        self.reassembler = Reassembler()
         self.player_id = None
-        self.grid_size = 10
-        self.cells = {}
-        self.cell_owners = {}
+        self.grid_size = grid_size
+        self.view = view  # (row, col, height, width) to receive deltas for, None = whole map
         self.message_queue = queue.Queue()
         self.running = True
         
         # Delta encoding state
-        self.last_acknowledged_snapshot = 0
+        self.ack_state = (0, 0)  # (latest snapshot received, bitfield of the 32 before it)
+        self.echo = (0, 0.0)  # (server timestamp, local arrival) of the newest snapshot, echoed in acks
+        self.ack_pending = False  # snapshots received since the last ack went out
+        self.last_ack_sent = 0.0
+        self.last_init_sent = 0.0
+        self.pending_inputs = []  # (cell index, seq) clicked this frame, sent as one batch
         self.current_snapshot_id = 0
-        self.sequence_number = 0
+        self.sequence_number = 0  # taken through next_sequence(): clicks and acks come from two threads
+        self.sequence_lock = threading.Lock()
+        
+        # Deltas merged by the network thread, applied once per UI frame
+        self.pending_lock = threading.Lock()
+        self.pending_cells = {}  # cell index -> latest owner
+        self.pending_header = None  # (snapshot_id, seq_num, timestamp) of the newest merged snapshot
+        self.merged_snapshots = 0
+        self.discarded_snapshots = 0
+        self.next_log = 0.0
+        
+        # Client-side prediction: own claims are shown at once and settled against snapshots
+        self.predictions = {}  # cell index -> (input seq, monotonic click time), not yet settled
+        self.server_owners = {}  # cell index -> owner according to the server
+        self.acked_input_seq = 0  # highest input seq the server reports as applied
+        self.confirmed_claims = 0
+        self.rolled_back_claims = 0
+        
+        # Latency and traffic metrics, served in the Prometheus text format on metrics_port (0 = off)
+        self.metrics = MetricsRegistry()
+        self.age_hist = self.metrics.histogram(
+            'gridclash_client_snapshot_age_seconds',
+            "Server timestamp to UI apply time of the newest snapshot (assumes synced clocks)")
+        self.jitter_hist = self.metrics.histogram(
+            'gridclash_client_jitter_seconds', "Change in one-way transit time between consecutive snapshots")
+        self.claim_hist = self.metrics.histogram(
+            'gridclash_client_claim_latency_seconds', "Click to the server confirming the claim")
+        self.apply_hist = self.metrics.histogram(
+            'gridclash_client_apply_duration_seconds', "Time to apply one frame of deltas", DURATION_BUCKETS)
+        self.rx_packets = self.metrics.counter('gridclash_client_received_packets_total', "Datagrams received",
+                                               'msg_type')
+        self.rx_bytes = self.metrics.counter('gridclash_client_received_bytes_total', "Bytes received", 'msg_type')
+        self.tx_packets = self.metrics.counter('gridclash_client_sent_packets_total', "Datagrams sent", 'msg_type')
+        self.tx_bytes = self.metrics.counter('gridclash_client_sent_bytes_total', "Bytes sent", 'msg_type')
+        self.last_transit = None  # ms between server timestamp and arrival of the previous snapshot
+        self.next_metrics_log = time.monotonic() + METRICS_LOG_INTERVAL
+        self.metrics_server = None
+        if metrics_port:
+            self.metrics_server = MetricsServer(self.metrics, metrics_port)
+            self.metrics_server.start()
         
         # Player colors (1-4)
         self.colors = {
@@ -73,17 +131,10 @@ class GridClashClient:
         grid_frame = tk.Frame(self.root, bg="#0f0f1e", bd=5, relief=tk.RAISED)
         grid_frame.pack(pady=20, padx=50)
         
-        # Create 10x10 grid
-        for row in range(self.grid_size):
-            for col in range(self.grid_size):
-                cell = tk.Button(grid_frame, text="", width=6, height=3,
-                               bg=self.colors['empty'], fg="#ffffff",
-                               font=("Arial", 10, "bold"),
-                               activebackground="#2c3e50",
-                               command=lambda r=row, c=col: self.click_cell(r, c))
-                cell.grid(row=row, column=col, padx=2, pady=2)
-                self.cells[(row, col)] = cell
-                self.cell_owners[(row, col)] = None
+        # One canvas for the whole grid; only changed cells are redrawn
+        self.board = GridCanvas(grid_frame, self.grid_size, self.colors, self.colors['empty'],
+                                on_click=self.click_cell, bg="#0f0f1e")
+        self.board.pack()
         
         # Status log
         log_label = tk.Label(self.root, text="Activity Log", font=("Arial", 12, "bold"),
@@ -103,81 +154,184 @@ class GridClashClient:
         
     def connect_to_server(self):
         try:
-            init_packet = struct.pack(HEADER_FORMAT, b'GCLP', 1, 0, 0, 0,
-                                     int(time.time() * 1000), 0)
-            self.clientSocket.sendto(init_packet, (serverName, serverPort))
+            self.send_init()
             self.log("Connecting to server...")
         except Exception as e:
             self.log(f"Connection error: {e}")
     
+    def send_init(self):
+        # Announce binary delta support through the header version
+        init_packet = struct.pack(HEADER_FORMAT, b'GCLP', PROTOCOL_VERSION, 0, 0, 0,
+                                 int(time.time() * 1000), 0)
+        self.send_packet(init_packet)
+        self.last_init_sent = time.monotonic()
+    
     def click_cell(self, row, col):
         if self.player_id is None:
             return
         
-        cell_id = f"{row}_{col}"
-        self.sequence_number += 1
-        
-        # Include last acknowledged snapshot ID for delta encoding
-        game_event = f"ACQUIRE {cell_id} {self.player_id} ACK_SNAP:{self.last_acknowledged_snapshot}".encode()
-        
+        seq = self.next_sequence()
+        index = row * self.grid_size + col
+        if self.board.owner(index) != self.player_id:
+            # Predict: show the cell as ours now, settle it once the server has seen this seq
+            self.predictions[index] = (seq, time.monotonic())
+            self.board.set_owner(index, self.player_id)
+        # Sent with the other clicks of this frame by flush_inputs()
+        self.pending_inputs.append((index, seq))
+        self.log(f"Attempting to acquire cell ({row}, {col}) [Seq: {seq}]")
+
+    def next_sequence(self):
+        """Sequence number of the next datagram sent (the UI and network threads both send)"""
+        with self.sequence_lock:
+            self.sequence_number += 1
+            return self.sequence_number
+    
+    def flush_inputs(self):
+        """Send this frame's clicks as INPUT_BATCH datagrams carrying the binary ack"""
+        while self.pending_inputs:
+            batch = self.pending_inputs[:MAX_INPUT_BATCH]
+            del self.pending_inputs[:MAX_INPUT_BATCH]
+            latest, bits = self.ack_state
+            payload = encode_input_batch(latest, bits, [index for index, _ in batch],
+                                         [seq for _, seq in batch])
+            try:
+                data_packet = struct.pack(HEADER_FORMAT, b'GCLP', PROTOCOL_VERSION, MSG_INPUT_BATCH,
+                                         latest,  # Include last ack'd snapshot
+                                         batch[-1][1],
+                                         self.echo_timestamp(), len(payload))
+                self.send_packet(data_packet + payload)
+                # The piggybacked ack replaces a standalone one
+                self.ack_pending = False
+                self.last_ack_sent = time.monotonic()
+            except Exception as e:
+                self.log(f"Send error: {e}")
+    
+    def subscribe(self, row, col, height, width):
+        """Ask the server for deltas of this viewport only; call again when it scrolls"""
+        self.view = (row, col, height, width)
         try:
-            data_packet = struct.pack(HEADER_FORMAT, b'GCLP', 1, 1, 
-                                     self.last_acknowledged_snapshot,  # Include last ack'd snapshot
-                                     self.sequence_number,
-                                     int(time.time() * 1000), len(game_event))
-            self.clientSocket.sendto(data_packet + game_event, (serverName, serverPort))
-            self.log(f"Attempting to acquire cell ({row}, {col}) [Seq: {self.sequence_number}]")
+            payload = encode_subscribe(row, col, height, width)
+            packet = struct.pack(HEADER_FORMAT, b'GCLP', PROTOCOL_VERSION, MSG_SUBSCRIBE, 0,
+                                 self.next_sequence(), int(time.time() * 1000), len(payload))
+            self.send_packet(packet + payload)
         except Exception as e:
-            self.log(f"Send error: {e}")
+            self.message_queue.put(('error', f"Subscribe error: {e}"))
     
-    def send_ack(self, snapshot_id):
-        """Send acknowledgment of received snapshot"""
+    def send_ack(self):
+        """Send a standalone cumulative ack if none went out with recent traffic
+
+        With nothing new to ack, the ack is still repeated every KEEPALIVE_INTERVAL:
+        a server that sends us nothing (rate control holding back, a quiet view)
+        must keep hearing from us or it drops the session.
+        """
+        since = time.monotonic() - self.last_ack_sent
+        if since < (ACK_INTERVAL if self.ack_pending else KEEPALIVE_INTERVAL) or self.player_id is None:
+            return
         try:
-            self.sequence_number += 1
-            ack_payload = f"ACK {snapshot_id}".encode()
-            ack_packet = struct.pack(HEADER_FORMAT, b'GCLP', 1, 4,  # msg_type 4 = ACK
-                                    snapshot_id,
-                                    self.sequence_number,
-                                    int(time.time() * 1000), len(ack_payload))
-            self.clientSocket.sendto(ack_packet + ack_payload, (serverName, serverPort))
+            latest, bits = self.ack_state
+            ack_payload = encode_ack(latest, bits)
+            ack_packet = struct.pack(HEADER_FORMAT, b'GCLP', PROTOCOL_VERSION, MSG_ACK_BITS,
+                                    latest,
+                                    self.next_sequence(),
+                                    self.echo_timestamp(), len(ack_payload))
+            self.send_packet(ack_packet + ack_payload)
+            self.ack_pending = False
+            self.last_ack_sent = time.monotonic()
         except Exception as e:
-            self.log(f"ACK send error: {e}")
+            self.message_queue.put(('error', f"ACK send error: {e}"))
+    
+    def send_packet(self, packet):
+        """Send one datagram to the server, counted by msg_type"""
+        self.tx_packets.inc(packet[5])
+        self.tx_bytes.inc(packet[5], len(packet))
+        self.clientSocket.sendto(packet, (serverName, serverPort))
+    
+    def echo_timestamp(self):
+        """Ack header timestamp: the newest snapshot's, so the server can measure RTT"""
+        timestamp, received = self.echo
+        return echo_timestamp(timestamp, time.monotonic() - received)
     
     def network_loop(self):
+        receiver = DatagramReceiver(self.clientSocket)
+        self.clientSocket.settimeout(0.1)
         while self.running:
             try:
-                self.clientSocket.settimeout(0.1)
-                data, _ = self.clientSocket.recvfrom(2048)
-                header = struct.unpack(HEADER_FORMAT, data[:HEADER_SIZE])
+                # payload is a view of the receive buffer, valid until the next receive
+                header, payload, _ = receiver.receive()
                 protocol_id, version, msg_type, snapshot_id, seq_num, timestamp, payload_len = header
+                self.rx_packets.inc(msg_type)
+                self.rx_bytes.inc(msg_type, HEADER_SIZE + payload_len)
+                
+                if msg_type == MSG_FRAGMENT:
+                    if snapshot_id < self.current_snapshot_id:
+                        continue
+                    # Carry on with the reassembled snapshot once the last fragment is in
+                    complete = self.reassembler.add(snapshot_id, payload)
+                    if complete is None:
+                        continue
+                    msg_type, payload = complete
+                
+                if msg_type == MSG_RESET:
+                    self.reset_session()
                 
-                if msg_type == 2:  # ACK (connection acknowledgment)
-                    payload = data[HEADER_SIZE:HEADER_SIZE + payload_len].decode()
-                    self.player_id = int(payload.split(':')[1])
+                elif msg_type == 2:  # ACK (connection acknowledgment)
+                    self.player_id = int(bytes(payload).decode().split(':')[1])
                     self.message_queue.put(('connected', self.player_id))
+                    if self.view:
+                        self.subscribe(*self.view)
                 
-                elif msg_type == 3:  # SNAPSHOT (delta update)
+                elif msg_type in (3, 5):  # SNAPSHOT (text delta) / BINARY_DELTA
                     # Discard outdated updates
                     if snapshot_id < self.current_snapshot_id:
-                        self.log(f"Discarded outdated snapshot {snapshot_id} (current: {self.current_snapshot_id})")
+                        with self.pending_lock:
+                            self.discarded_snapshots += 1
                         continue
                     
-                    snapshot_data = data[HEADER_SIZE:HEADER_SIZE + payload_len].decode()
+                    if msg_type == 5:
+                        _, _, indices, owners = decode_delta(payload)
+                    else:
+                        indices, owners = decode_text_delta(bytes(payload).decode(), self.grid_size)
                     self.current_snapshot_id = snapshot_id
+                    self.echo = (timestamp, time.monotonic())
+                    
+                    # Jitter from the transit time difference, which cancels any clock offset
+                    transit = time.time() * 1000 - timestamp
+                    if self.last_transit is not None:
+                        self.jitter_hist.observe(abs(transit - self.last_transit) / 1000)
+                    self.last_transit = transit
                     
-                    # Process the delta update
-                    self.message_queue.put(('snapshot', (snapshot_id, seq_num, timestamp, snapshot_data)))
+                    # Merge into the pending update; later snapshots overwrite earlier owners
+                    with self.pending_lock:
+                        self.pending_cells.update(zip(indices, owners))
+                        self.pending_header = (snapshot_id, seq_num, timestamp)
+                        self.merged_snapshots += 1
                     
-                    # Send acknowledgment
-                    self.last_acknowledged_snapshot = snapshot_id
-                    self.send_ack(snapshot_id)
+                    # Acknowledge (cumulatively, and only when no DATA carried it)
+                    self.ack_state = merge_ack(*self.ack_state, snapshot_id)
+                    self.ack_pending = True
+                    self.send_ack()
                     
             except socket.timeout:
+                self.send_ack()
                 continue
             except Exception as e:
                 if self.running:
                     self.message_queue.put(('error', str(e)))
     
+    def reset_session(self):
+        """The server has no session for us: start over with an INIT (network thread)"""
+        # Every datagram in flight is answered with a RESET; one INIT per RESET_RETRY is enough
+        if time.monotonic() - self.last_init_sent < RESET_RETRY:
+            return
+        self.player_id = None
+        # A restarted server counts snapshots from 1 again
+        self.current_snapshot_id = 0
+        self.ack_state = (0, 0)
+        self.ack_pending = False
+        self.reassembler = Reassembler()
+        self.message_queue.put(('reset', None))
+        self.send_init()
+    
     def update_ui(self):
         try:
             while not self.message_queue.empty():
@@ -188,39 +342,107 @@ class GridClashClient:
                                            fg=self.colors[data])
                     self.log(f"Connected as Player {data}")
                 
-                elif msg_type == 'snapshot':
-                    snapshot_id, seq_num, timestamp, snapshot_data = data
-                    self.process_snapshot(snapshot_data)
-                    self.stats_label.config(text=f"Snapshot: {snapshot_id} | Seq: {seq_num} | Time: {timestamp}")
-                    self.log(f"Applied delta update (Snapshot {snapshot_id})")
+                elif msg_type == 'reset':
+                    self.player_label.config(text="Reconnecting...", fg="#ffffff")
+                    # Unsettled claims died with the old session
+                    for index in self.predictions:
+                        self.board.set_owner(index, self.server_owners.get(index))
+                    self.predictions.clear()
+                    self.pending_inputs.clear()
+                    self.log("Server dropped our session, reconnecting")
                 
                 elif msg_type == 'error':
                     self.log(f"Error: {data}")
+            
+            self.flush_inputs()
+            self.apply_pending()
+            if self.predictions:
+                self.reconcile()
         except:
             pass
         
         if self.running:
-            self.root.after(50, self.update_ui)
+            self.root.after(FRAME_MS, self.update_ui)
     
-    def process_snapshot(self, snapshot_data):
-        """Process delta-encoded snapshot data"""
-        if not snapshot_data.strip():
-            return
-            
-        lines = snapshot_data.split('|')
-        for line in lines:
-            line = line.strip()
-            if 'DELTA' in line and 'CELL' in line:
-                # Delta format: "DELTA CELL cell_id owner"
-                parts = line.split()
-                if len(parts) >= 4:
-                    cell_id = parts[2]
-                    owner = int(parts[3])
-                    row, col = map(int, cell_id.split('_'))
-                    
-                    if (row, col) in self.cells:
-                        self.cells[(row, col)].config(bg=self.colors[owner])
-                        self.cell_owners[(row, col)] = owner
+    def apply_pending(self):
+        """Apply everything merged since the last frame as one update"""
+        with self.pending_lock:
+            header = self.pending_header
+            if header is None:
+                return
+            changes, self.pending_cells = self.pending_cells, {}
+            self.pending_header = None
+        
+        snapshot_id, seq_num, timestamp = header
+        # Version 3 servers put our highest applied input seq in the snapshot seq_num
+        self.acked_input_seq = max(self.acked_input_seq, seq_num)
+        start = time.perf_counter()
+        self.process_delta(changes.items())
+        self.apply_hist.observe(time.perf_counter() - start)
+        age = time.time() - timestamp / 1000
+        self.age_hist.observe(age)
+        self.stats_label.config(text=f"Snapshot: {snapshot_id} | Seq: {seq_num} | Age: {age * 1000:.0f} ms")
+        
+        now = time.monotonic()
+        if now >= self.next_metrics_log:
+            self.next_metrics_log = now + METRICS_LOG_INTERVAL
+            self.log(self.metrics_summary())
+        if now >= self.next_log:
+            self.next_log = now + LOG_INTERVAL
+            with self.pending_lock:
+                merged, self.merged_snapshots = self.merged_snapshots, 0
+                discarded, self.discarded_snapshots = self.discarded_snapshots, 0
+            self.log(f"Applied {merged} snapshot(s) up to {snapshot_id}"
+                     + (f", discarded {discarded} outdated" if discarded else ""))
+    
+    def process_delta(self, changes):
+        """Apply decoded delta records (cell_index, owner)"""
+        cells = self.grid_size * self.grid_size
+        predictions = self.predictions
+        server_owners = self.server_owners
+        for index, owner in changes:
+            if index < cells:
+                server_owners[index] = owner
+                # A predicted cell keeps showing the prediction until reconcile() settles it
+                if index not in predictions:
+                    self.board.set_owner(index, owner)
+    
+    def in_view(self, index):
+        """True if the server sends us the changes of this cell"""
+        if self.view is None:
+            return True
+        row, col = divmod(index, self.grid_size)
+        view_row, view_col, height, width = self.view
+        return view_row <= row < view_row + height and view_col <= col < view_col + width
+    
+    def reconcile(self):
+        """Confirm or roll back the predictions the server has seen or that timed out"""
+        now = time.monotonic()
+        for index, (seq, clicked) in list(self.predictions.items()):
+            if seq > self.acked_input_seq and now - clicked < PREDICTION_TIMEOUT:
+                continue
+            if not self.in_view(index):
+                # No snapshot carries this cell's owner, so never roll it back to a guess: keep
+                # the prediction shown, and stop tracking it once the server applied the input
+                if seq <= self.acked_input_seq:
+                    del self.predictions[index]
+                continue
+            del self.predictions[index]
+            owner = self.server_owners.get(index)
+            if owner == self.player_id:
+                self.confirmed_claims += 1
+                self.claim_hist.observe(now - clicked)
+            else:
+                # Someone else got the cell first, or the input was lost
+                self.rolled_back_claims += 1
+                self.board.set_owner(index, owner)
+    
+    def metrics_summary(self):
+        return (f"{latency_summary('Snapshot age', self.age_hist)} | "
+                f"{latency_summary('jitter', self.jitter_hist)} | "
+                f"{latency_summary('claim', self.claim_hist)} | "
+                f"predictions {self.confirmed_claims} confirmed {self.rolled_back_claims} rolled back | "
+                f"rx {self.rx_packets.total()} pkts {self.rx_bytes.total() / 1000:.1f} kB")
     
     def log(self, message):
         self.log_text.insert(tk.END, f"[{time.strftime('%H:%M:%S')}] {message}\n")
@@ -228,11 +450,25 @@ class GridClashClient:
     
     def on_closing(self):
         self.running = False
+        if self.metrics_server:
+            self.metrics_server.stop()
         self.clientSocket.close()
         self.root.destroy()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GridClash client")
+    parser.add_argument('--host', default=serverName)
+    parser.add_argument('--port', type=int, default=serverPort,
+                        help="server port (or the port of netem_proxy.py)")
+    parser.add_argument('--grid-size', type=int, default=10, help="must match the server's --grid-size")
+    parser.add_argument('--view', help="row,col,height,width: only receive deltas for this area")
+    parser.add_argument('--metrics-port', type=int, default=0,
+                        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics (0 = off)")
+    args = parser.parse_args()
+    serverName, serverPort = args.host, args.port
+    
     root = tk.Tk()
-    app = GridClashClient(root)
+    view = tuple(int(v) for v in args.view.split(',')) if args.view else None
+    app = GridClashClient(root, args.grid_size, view, args.metrics_port)
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
     root.mainloop()
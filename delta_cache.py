@@ -0,0 +1,38 @@
+class DeltaCache:
+    """Per-tick cache of encoded snapshot datagrams keyed by delta baseline.
+
+    Most clients acknowledge the same previous snapshot, so within one tick
+    the delta for a given (baseline, format) pair is computed and encoded
+    once and the resulting bytes are shared by every client on it.
+    """
+
+    def __init__(self):
+        self.snapshot_id = None
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def begin_tick(self, snapshot_id):
+        """Drop the previous tick's payloads"""
+        self.snapshot_id = snapshot_id
+        self.entries.clear()
+
+    def get(self, key, build):
+        """Return the cached datagram for key, calling build() on a miss"""
+        datagram = self.entries.get(key)
+        if datagram is None:
+            self.misses += 1
+            datagram = build()
+            self.entries[key] = datagram
+        else:
+            self.hits += 1
+        return datagram
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'distinct_baselines': len(self.entries),
+        }
@@ -0,0 +1,83 @@
+import struct
+import time
+from protocol import HEADER_FORMAT, HEADER_SIZE, MSG_FRAGMENT
+
+# Snapshots larger than one datagram are sent as MSG_FRAGMENT datagrams instead of
+# relying on IP fragmentation (one lost IP fragment loses the whole datagram, and
+# payload_len is only 16 bits). Each fragment carries the snapshot's own header
+# fields (snapshot_id, seq, timestamp) plus '!H H B' = fragment index, fragment
+# count, msg_type of the reassembled payload.
+MTU = 1200  # bytes per datagram, header included; safe on every common path
+FRAGMENT_HEADER_FORMAT = '!H H B'
+FRAGMENT_HEADER_SIZE = struct.calcsize(FRAGMENT_HEADER_FORMAT)
+MAX_PAYLOAD = MTU - HEADER_SIZE
+FRAGMENT_PAYLOAD = MTU - HEADER_SIZE - FRAGMENT_HEADER_SIZE
+
+
+def pack_datagrams(msg_type, snapshot_id, seq, timestamp, payload, version=1):
+    """Return the datagrams carrying payload: one plain datagram if it fits, fragments otherwise"""
+    if len(payload) <= MAX_PAYLOAD:
+        return [struct.pack(HEADER_FORMAT, b'GCLP', version, msg_type, snapshot_id, seq,
+                            timestamp, len(payload)) + payload]
+    count = -(-len(payload) // FRAGMENT_PAYLOAD)
+    datagrams = []
+    for index in range(count):
+        chunk = payload[index * FRAGMENT_PAYLOAD:(index + 1) * FRAGMENT_PAYLOAD]
+        datagrams.append(struct.pack(HEADER_FORMAT, b'GCLP', version, MSG_FRAGMENT, snapshot_id, seq,
+                                     timestamp, FRAGMENT_HEADER_SIZE + len(chunk))
+                         + struct.pack(FRAGMENT_HEADER_FORMAT, index, count, msg_type) + chunk)
+    return datagrams
+
+
+class Reassembler:
+    """Collects MSG_FRAGMENT payloads until a snapshot is complete.
+
+    Partial snapshots are dropped once they are older than `timeout` or
+    once a newer snapshot has been completed, so a lost fragment costs
+    one snapshot and a bounded amount of memory. A fragment whose index
+    is out of range, or whose count or msg_type disagrees with the earlier
+    fragments of its snapshot, is rejected.
+    """
+
+    def __init__(self, timeout=1.0, clock=time.monotonic):
+        self.timeout = timeout
+        self.clock = clock
+        self.partial = {}  # snapshot_id -> [first_seen, count, msg_type, {index: chunk}]
+        self.newest_complete = 0
+        self.completed = 0
+        self.superseded = 0
+        self.timed_out = 0
+        self.rejected = 0
+
+    def add(self, snapshot_id, payload):
+        """Add one fragment payload; return (msg_type, payload) when its snapshot is complete"""
+        if snapshot_id <= self.newest_complete:
+            return None
+        index, count, msg_type = struct.unpack_from(FRAGMENT_HEADER_FORMAT, payload, 0)
+        now = self.clock()
+        self.expire(now)
+
+        entry = self.partial.get(snapshot_id)
+        if index >= count or (entry is not None and (count != entry[1] or msg_type != entry[2])):
+            self.rejected += 1
+            return None
+        if entry is None:
+            entry = self.partial[snapshot_id] = [now, count, msg_type, {}]
+        chunks = entry[3]
+        # Copy: the payload may be a view of a reused receive buffer
+        chunks[index] = bytes(payload[FRAGMENT_HEADER_SIZE:])
+        if len(chunks) < entry[1]:
+            return None
+
+        del self.partial[snapshot_id]
+        self.completed += 1
+        self.newest_complete = snapshot_id
+        for older in [sid for sid in self.partial if sid < snapshot_id]:
+            del self.partial[older]
+            self.superseded += 1
+        return msg_type, b''.join(chunks[i] for i in range(entry[1]))
+
+    def expire(self, now):
+        for snapshot_id in [sid for sid, entry in self.partial.items() if now - entry[0] > self.timeout]:
+            del self.partial[snapshot_id]
+            self.timed_out += 1
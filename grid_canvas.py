@@ -0,0 +1,85 @@
+import tkinter as tk
+
+FRAME_MS = 16  # ~60 redraws per second at most
+
+
+class GridCanvas:
+    """Grid board drawn on a single tk.Canvas.
+
+    Every cell is a rectangle item created once up front. set_owner() only
+    records the change in a dirty set; the rectangles whose owner really
+    changed are recoloured together at most once per display frame, so the
+    cost per snapshot follows the number of changes, not the grid area.
+    """
+
+    def __init__(self, master, grid_size, colors, default_color, initial_owner=None,
+                 cell_px=None, gap=2, on_click=None, **canvas_options):
+        self.grid_size = grid_size
+        self.colors = colors
+        self.default_color = default_color
+        self.on_click = on_click
+        self.cell_px = cell_px or max(3, 600 // grid_size)
+        self.gap = gap if self.cell_px > 8 else 0
+        side = grid_size * self.cell_px
+
+        self.canvas = tk.Canvas(master, width=side, height=side, highlightthickness=0,
+                                **canvas_options)
+        self.owners = [initial_owner] * (grid_size * grid_size)
+        self.drawn = [self.fill(initial_owner)] * (grid_size * grid_size)
+        self.items = []
+        for index in range(grid_size * grid_size):
+            row, col = divmod(index, grid_size)
+            x, y = col * self.cell_px, row * self.cell_px
+            self.items.append(self.canvas.create_rectangle(
+                x + self.gap, y + self.gap, x + self.cell_px, y + self.cell_px,
+                fill=self.drawn[index], width=0))
+
+        self.dirty = set()
+        self.flush_pending = False
+        self.redraws = 0
+        self.canvas.bind('<Button-1>', self.clicked)
+
+    def pack(self, **options):
+        self.canvas.pack(**options)
+
+    def grid(self, **options):
+        self.canvas.grid(**options)
+
+    def fill(self, owner):
+        return self.colors.get(owner, self.default_color)
+
+    def owner(self, index):
+        return self.owners[index]
+
+    def set_owner(self, index, owner):
+        """Record a new owner; the cell is redrawn on the next frame if it changed"""
+        if self.owners[index] == owner:
+            return
+        self.owners[index] = owner
+        self.dirty.add(index)
+        if not self.flush_pending:
+            self.flush_pending = True
+            self.canvas.after(FRAME_MS, self.flush)
+
+    def set_all(self, owners):
+        """Replace the whole board from a flat sequence of owners"""
+        for index, owner in enumerate(owners):
+            self.set_owner(index, owner)
+
+    def flush(self):
+        """Recolour the dirty cells whose fill differs from what is on screen"""
+        self.flush_pending = False
+        dirty, self.dirty = self.dirty, set()
+        for index in dirty:
+            color = self.fill(self.owners[index])
+            if color != self.drawn[index]:
+                self.canvas.itemconfigure(self.items[index], fill=color)
+                self.drawn[index] = color
+                self.redraws += 1
+
+    def clicked(self, event):
+        if self.on_click is None:
+            return
+        row, col = event.y // self.cell_px, event.x // self.cell_px
+        if 0 <= row < self.grid_size and 0 <= col < self.grid_size:
+            self.on_click(row, col)
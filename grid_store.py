@@ -0,0 +1,222 @@
+from collections import deque
+
+# Owners are kept in bytearray chunks of this many cells (0 = empty); a commit
+# copies only the chunks that changed since the previous one
+CHUNK_BITS = 12
+CHUNK_SIZE = 1 << CHUNK_BITS
+CHUNK_MASK = CHUNK_SIZE - 1
+
+
+class GridSnapshot:
+    """Immutable view of a VersionedGrid as of one commit.
+
+    Owners are a tuple of bytes chunks, shared with the previous snapshot
+    wherever nothing changed, and the change log is a tuple of
+    (snapshot_id, (cell indices), {region: [cell indices]}) entries. Nothing
+    in it is modified after publication, so any thread may read it without
+    a lock; take the snapshot once when several reads must agree.
+    """
+
+    __slots__ = ('grid', 'version', 'floor', 'chunks', 'change_log')
+
+    def __init__(self, grid, version, floor, chunks, change_log):
+        self.grid = grid  # only its fixed layout (grid_size, regions) is read
+        self.version = version
+        self.floor = floor  # oldest snapshot id still usable as a delta baseline
+        self.chunks = chunks
+        self.change_log = change_log
+
+    def get(self, index):
+        return self.chunks[index >> CHUNK_BITS][index & CHUNK_MASK] or None
+
+    def items(self):
+        indices, owners = self.full_state()
+        return zip(indices, owners)
+
+    def full_state(self, rect=None):
+        """Return (indices, owners) for every owned cell, or every owned cell inside rect"""
+        indices = []
+        owners = []
+        if rect is None:
+            for number, chunk in enumerate(self.chunks):
+                if chunk.count(0) == len(chunk):
+                    continue
+                base = number << CHUNK_BITS
+                for offset, owner in enumerate(chunk):
+                    if owner:
+                        indices.append(base + offset)
+                        owners.append(owner)
+            return indices, owners
+        row, col, height, width = rect
+        grid_size = self.grid.grid_size
+        chunks = self.chunks
+        for r in range(row, row + height):
+            start = r * grid_size + col
+            for index in range(start, start + width):
+                owner = chunks[index >> CHUNK_BITS][index & CHUNK_MASK]
+                if owner:
+                    indices.append(index)
+                    owners.append(owner)
+        return indices, owners
+
+    def changes_since(self, snapshot_id, rect=None):
+        """Return (indices, owners) changed after snapshot_id, or None if it is too old
+
+        With rect = (row, col, height, width) only cells inside it are returned.
+        """
+        if snapshot_id <= 0 or snapshot_id < self.floor or snapshot_id > self.version:
+            return None
+
+        newer = []
+        for entry in reversed(self.change_log):
+            if entry[0] <= snapshot_id:
+                break
+            newer.append(entry)
+        # A cell is reported once, from the newest entry holding it; one entry has no duplicates
+        seen = set() if len(newer) > 1 else None
+
+        indices = []
+        owners = []
+        chunks = self.chunks
+        if rect is None:
+            for _, changed, _ in newer:
+                for index in changed:
+                    if seen is not None:
+                        if index in seen:
+                            continue
+                        seen.add(index)
+                    indices.append(index)
+                    owners.append(chunks[index >> CHUNK_BITS][index & CHUNK_MASK])
+            return indices, owners
+
+        row, col, height, width = rect
+        grid_size = self.grid.grid_size
+        regions = self.grid.regions_in(rect)
+        for _, _, buckets in newer:
+            for region in (buckets.keys() & regions if len(buckets) < len(regions) else regions):
+                for index in buckets.get(region, ()):
+                    r, c = divmod(index, grid_size)
+                    if row <= r < row + height and col <= c < col + width:
+                        if seen is not None:
+                            if index in seen:
+                                continue
+                            seen.add(index)
+                        indices.append(index)
+                        owners.append(chunks[index >> CHUNK_BITS][index & CHUNK_MASK])
+        return indices, owners
+
+
+class VersionedGrid:
+    """Authoritative grid state with a per-tick change log, published as immutable snapshots.
+
+    Cells are addressed by flat index (row * grid_size + col). set() is the
+    only writer: it updates its back buffer and queues (cell, owner) on a
+    deque. commit() drains what was queued so far, applies it to copies of
+    the previous snapshot's chunks, logs it under the snapshot id, and
+    publishes a new GridSnapshot with a single reference assignment. The
+    broadcaster (or a GUI thread) reading `published` therefore sees one
+    consistent version, whose owners are exactly its log applied, without
+    taking a lock while the writer keeps going. A cell set during a commit
+    is picked up by the next one.
+
+    Each log entry also buckets its cells by square region, so the changes
+    inside a rectangle (a client's viewport) are found by visiting only the
+    regions it overlaps.
+
+    There are no per-cell change stamps (snapshot id of each cell's last
+    change): the change log already answers "changed since N" by scanning
+    only the entries after N, and a stamp per cell would have to be copied
+    into every published snapshot along with the chunks it changed, or be
+    written under the readers' feet, for no query the log cannot answer.
+    """
+
+    def __init__(self, grid_size, history=100, region_size=32):
+        self.grid_size = grid_size
+        self.region_size = region_size
+        self.regions_per_row = -(-grid_size // region_size)
+        self.history = history
+        cells = grid_size * grid_size
+        # Back buffer: the writer's own view of the owners, read and written only by set()
+        self.chunks = [bytearray(min(CHUNK_SIZE, cells - start)) for start in range(0, cells, CHUNK_SIZE)]
+        self.pending = deque()  # (cell, owner) set since the last commit; deque appends and pops are thread-safe
+        self.published = GridSnapshot(self, 0, 0, tuple(bytes(chunk) for chunk in self.chunks), ())
+
+    @property
+    def version(self):
+        return self.published.version
+
+    def set(self, index, owner):
+        chunk = self.chunks[index >> CHUNK_BITS]
+        if chunk[index & CHUNK_MASK] == owner:
+            return
+        chunk[index & CHUNK_MASK] = owner
+        self.pending.append((index, owner))
+
+    def get(self, index):
+        return self.published.get(index)
+
+    def items(self):
+        return self.published.items()
+
+    def commit(self, snapshot_id):
+        """Publish the cells set so far as the snapshot for snapshot_id"""
+        front = self.published
+        pending = self.pending
+        # Only what was queued when the commit started; later sets wait for the next one
+        owners = dict(pending.popleft() for _ in range(len(pending)))
+        changed = tuple(owners)
+        chunks = front.chunks
+        change_log = front.change_log
+        if changed:
+            touched = {}
+            for index, owner in owners.items():
+                number = index >> CHUNK_BITS
+                chunk = touched.get(number)
+                if chunk is None:
+                    chunk = touched[number] = bytearray(chunks[number])
+                chunk[index & CHUNK_MASK] = owner
+            chunks = list(chunks)
+            for number, chunk in touched.items():
+                chunks[number] = bytes(chunk)
+            chunks = tuple(chunks)
+            buckets = {}
+            for index in changed:
+                buckets.setdefault(self.region_of(index), []).append(index)
+            change_log += ((snapshot_id, changed, buckets),)
+
+        # Keep the log bounded to the last `history` snapshots
+        floor = max(front.floor, snapshot_id - self.history)
+        if change_log and change_log[0][0] <= floor:
+            change_log = tuple(entry for entry in change_log if entry[0] > floor)
+
+        # One reference assignment: readers see the old snapshot or the new one, never a mix
+        self.published = GridSnapshot(self, snapshot_id, floor, chunks, change_log)
+
+    def region_of(self, index):
+        row, col = divmod(index, self.grid_size)
+        return (row // self.region_size) * self.regions_per_row + col // self.region_size
+
+    def regions_in(self, rect):
+        """Region ids overlapping rect = (row, col, height, width)"""
+        row, col, height, width = rect
+        size = self.region_size
+        return {region_row * self.regions_per_row + region_col
+                for region_row in range(row // size, (row + height - 1) // size + 1)
+                for region_col in range(col // size, (col + width - 1) // size + 1)}
+
+    def full_state(self, rect=None):
+        """Return (indices, owners) for every owned cell of the published snapshot"""
+        return self.published.full_state(rect)
+
+    def changes_since(self, snapshot_id, rect=None):
+        """Return (indices, owners) changed after snapshot_id in the published snapshot, or None"""
+        return self.published.changes_since(snapshot_id, rect)
+
+
+def create_grid(grid_size, engine='dict', history=100):
+    """Create the grid store for the requested engine ('dict' or 'array')"""
+    if engine == 'array':
+        # NumPy is only needed for the array engine
+        from grid_array import ArrayGrid
+        return ArrayGrid(grid_size, history=min(history, 32))
+    return VersionedGrid(grid_size, history=history)
@@ -0,0 +1,640 @@
+import time
+import struct
+from collections import deque
+from protocol import (HEADER_FORMAT, HEADER_SIZE, HEADER_STRUCT, MSG_SNAPSHOT, MSG_BINARY_DELTA,
+                      MSG_ACK_BITS, MSG_SUBSCRIBE, MSG_INPUT_BATCH, MSG_RESET, FLAG_FULL_STATE, FLAG_COMPRESSED,
+                      DELTA_HEADER_SIZE, DELTA_RECORD_SIZE, ACK_SIZE, MAX_TEXT_SNAPSHOT, encode_delta,
+                      encode_text_delta, text_full_state_size, decode_ack, merge_ack, decode_subscribe,
+                      decode_input_batch, with_seq)
+from grid_store import create_grid
+from delta_cache import DeltaCache
+from fragmentation import pack_datagrams
+from server_engine import create_engine
+from ring_logger import RingLogger
+from tick_scheduler import TickScheduler
+from rate_control import RateController
+from metrics import MetricsRegistry, MetricsServer, DURATION_BUCKETS, latency_summary
+from recorder import InputRecorder
+from timer_wheel import TimerWheel
+
+serverPort = 12000
+
+
+class CoreObserver:
+    """Receives notifications from GridClashCore; override the events you need.
+
+    Callbacks run on the network thread, so observers should only record
+    what changed and do any real work (such as redrawing) on their own
+    schedule.
+    """
+
+    def client_connected(self, client_addr, player_id):
+        pass
+
+    def client_disconnected(self, client_addr, player_id):
+        pass
+
+    def grid_changed(self):
+        pass
+
+    def snapshot_broadcast(self, snapshot_id):
+        pass
+
+
+class GridClashCore:
+    """Game state and network handling of the GridClash server, without any UI"""
+
+    def __init__(self, port=serverPort, grid_size=10, frequency=20,
+                 engine='asyncio', grid_engine='dict', catch_up=False, reuse_port=False,
+                 compress=False, rate_control=False, min_rate=2.0, min_budget=4000, max_budget=250000,
+                 metrics_port=0, record=None, clock=time.time, client_timeout=10.0, monotonic=time.monotonic):
+        self.port = port
+        self.clients = {}
+        self.snapshot_id = 0
+        self.sequence_number = 0
+        self.grid_size = grid_size
+        # 'dict' for small boards, 'array' (NumPy) for 1000x1000 and up
+        self.grid_engine = grid_engine
+        # cell index -> player_id, with a per-tick change log for delta encoding
+        self.grid = create_grid(self.grid_size, self.grid_engine, history=100)
+        self.next_player_id = 1
+        self.running = False
+        # Version 1 clients get unfragmented text snapshots: only small grids can serve them
+        self.text_snapshots_fit = text_full_state_size(grid_size) <= MAX_TEXT_SNAPSHOT
+
+        # Delta encoding: last snapshot each client acknowledged
+        self.client_last_ack = {}  # client_addr -> last_acknowledged_snapshot_id
+        self.client_ack_bits = {}  # client_addr -> bitfield of the 32 snapshots before it
+        self.delta_cache = DeltaCache()  # one encoded delta per distinct baseline per tick
+
+        # Deflate binary snapshots when it makes them smaller (FLAG_COMPRESSED)
+        self.compress = compress
+        self.compression_stats = {'snapshots': 0, 'compressed': 0, 'raw_bytes': 0,
+                                  'sent_bytes': 0, 'seconds': 0.0}
+
+        # Per-client snapshot rate and byte budget (bytes/s) adapted to RTT and loss;
+        # the broadcast frequency is then the fastest any client is sent snapshots
+        self.rate_control = rate_control
+        self.rate_bounds = (min(min_rate, frequency), frequency, min_budget, max_budget)
+        self.egress_bytes = 0
+        self.skipped_sends = 0
+
+        # Broadcast frequency (Hz)
+        self.broadcast_frequency = frequency
+        self.broadcast_interval = 1.0 / self.broadcast_frequency
+        self.scheduler = TickScheduler(frequency, catch_up=catch_up)
+        self.stats_interval = 10.0  # seconds between tick summary log lines
+        self.next_stats_log = time.monotonic() + self.stats_interval
+
+        # Latency and traffic metrics, served in the Prometheus text format on metrics_port (0 = off)
+        self.metrics = MetricsRegistry()
+        self.rtt_hist = self.metrics.histogram(
+            'gridclash_rtt_seconds', "RTT measured from snapshot timestamps echoed in client acks")
+        self.jitter_hist = self.metrics.histogram(
+            'gridclash_rtt_jitter_seconds', "Change between consecutive RTT samples of a client")
+        self.tick_hist = self.metrics.histogram(
+            'gridclash_tick_duration_seconds', "Time to build and send one tick of snapshots", DURATION_BUCKETS)
+        self.rx_packets = self.metrics.counter('gridclash_received_packets_total', "Datagrams received", 'msg_type')
+        self.rx_bytes = self.metrics.counter('gridclash_received_bytes_total', "Bytes received", 'msg_type')
+        self.tx_packets = self.metrics.counter('gridclash_sent_packets_total', "Datagrams sent", 'msg_type')
+        self.tx_bytes = self.metrics.counter('gridclash_sent_bytes_total', "Bytes sent", 'msg_type')
+        self.metrics.gauge('gridclash_clients', "Connected clients", lambda: len(self.clients))
+        self.metrics.counter(
+            'gridclash_delta_cache_lookups_total', "Per-tick delta cache lookups, one per client sent a snapshot",
+            'result', lambda: {'hit': self.delta_cache.hits, 'miss': self.delta_cache.misses})
+        self.metrics.gauge('gridclash_delta_cache_baselines', "Distinct deltas encoded in the last tick",
+                           lambda: len(self.delta_cache.entries))
+        self.evictions = self.metrics.counter(
+            'gridclash_evicted_clients_total', "Clients dropped for not sending anything", 'reason')
+        self.metrics_port = metrics_port
+        self.metrics_server = None
+
+        # Two clocks, each read once per datagram and per tick, so a replay can supply them.
+        # clock is wall time, only for the header timestamps (INIT, snapshots) and the RTT
+        # from an echoed one; every interval (rate control, liveness) is measured on
+        # monotonic, which a wall-clock step cannot stretch or run backwards
+        self.clock = clock
+        self.monotonic = monotonic
+
+        # Clients not heard from for client_timeout seconds are dropped (0 = never). Each
+        # datagram only stamps last_heard; the wheel looks at a client about once per timeout
+        # and re-arms it if it was heard from since, so a tick costs O(expired), not O(clients)
+        self.client_timeout = client_timeout
+        started = monotonic()
+        self.liveness = TimerWheel(resolution=0.1, slots=512, now=started)  # used by the tick only
+        self.joined = deque()  # addresses of new clients, armed on the wheel by the next tick
+
+        # Inbound datagrams and ticks appended to a binary file for replay.py (None = off)
+        self.recorder = None
+        if record:
+            self.recorder = InputRecorder(record, {
+                'grid_size': grid_size, 'frequency': frequency, 'grid_engine': grid_engine,
+                'compress': compress, 'rate_control': rate_control, 'min_rate': min_rate,
+                'min_budget': min_budget, 'max_budget': max_budget, 'client_timeout': client_timeout,
+                'started': started}, clock, monotonic)
+
+        self.observers = []
+        self.logger = RingLogger()
+        self.engine_type = engine
+        self.engine = create_engine(self, self.port, engine, reuse_port=reuse_port)
+
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    def log(self, message):
+        self.logger.log(message)
+
+    def start(self):
+        """Start the network engine in the background (for hosts with their own main loop)"""
+        self.running = True
+        self.logger.start()
+        self.start_metrics()
+        self.engine.start()
+        self.log_startup()
+
+    def run(self):
+        """Run the network engine in the calling thread until stop() is called"""
+        self.running = True
+        self.logger.start()
+        self.start_metrics()
+        self.log_startup()
+        try:
+            self.engine.run()
+        finally:
+            self.stop_metrics()
+            if self.recorder:
+                self.recorder.close()
+            self.logger.stop()
+
+    def log_startup(self):
+        self.log(f"Server started on port {self.port} ({self.engine_type} engine)")
+        self.log(f"Broadcast frequency: {self.broadcast_frequency} Hz")
+        self.log("Delta encoding: ENABLED")
+        if self.compress:
+            self.log("Snapshot compression: ENABLED")
+        if self.rate_control:
+            min_rate, max_rate, min_budget, max_budget = self.rate_bounds
+            self.log(f"Rate control: {min_rate:g}-{max_rate:g} Hz, {min_budget}-{max_budget} bytes/s per client")
+        if self.metrics_server:
+            self.log(f"Metrics: http://127.0.0.1:{self.metrics_port}/metrics")
+        if self.recorder:
+            self.log(f"Recording inputs to {self.recorder.path}")
+        if self.client_timeout:
+            self.log(f"Client timeout: {self.client_timeout:g} s")
+
+    def start_metrics(self):
+        if self.metrics_port and self.metrics_server is None:
+            self.metrics_server = MetricsServer(self.metrics, self.metrics_port)
+            self.metrics_server.start()
+
+    def stop_metrics(self):
+        if self.metrics_server:
+            self.metrics_server.stop()
+            self.metrics_server = None
+
+    def stop(self):
+        self.running = False
+        self.engine.stop()
+        self.stop_metrics()
+        if self.recorder:
+            self.recorder.close()
+        self.logger.stop()
+
+    def handle_datagram(self, data, clientAddress):
+        """Handle one complete datagram (bytes)"""
+        if len(data) < HEADER_SIZE:
+            return
+        header = HEADER_STRUCT.unpack_from(data, 0)
+        self.handle_packet(header, memoryview(data)[HEADER_SIZE:HEADER_SIZE + header[6]], clientAddress)
+
+    def handle_packet(self, header, payload, clientAddress):
+        """Handle one datagram delivered by the network engine as (header, payload view)
+
+        The payload may be a view of the engine's receive buffer: decode it,
+        never keep it.
+        """
+        if not self.running:
+            return
+        now = self.monotonic()
+        wall = self.clock()
+        if self.recorder:
+            self.recorder.datagram(HEADER_STRUCT.pack(*header) + payload, clientAddress, now, wall)
+        try:
+            protocol_id, version, msg_type, snap_id, seq, timestamp, payload_len = header
+            self.rx_packets.inc(msg_type)
+            self.rx_bytes.inc(msg_type, HEADER_SIZE + payload_len)
+            client = self.clients.get(clientAddress)
+            if client is not None:
+                client['last_heard'] = now
+
+            if msg_type == 0:  # INIT
+                if version < 2 and not self.text_snapshots_fit:
+                    self.log(f"Rejected version 1 client {clientAddress}: a {self.grid_size}x{self.grid_size} "
+                             f"text snapshot does not fit one datagram")
+                    ack_payload = b"REJECTED:grid too large for version 1 clients"
+                    response = struct.pack(HEADER_FORMAT, b'GCLP', 1, 2, 0, 0,
+                                         int(wall * 1000), len(ack_payload))
+                    self.send(response + ack_payload, clientAddress)
+                    return
+
+                player_id = self.add_client(clientAddress, version, now)
+                self.log(f"Player {player_id} connected from {clientAddress}")
+                for observer in self.observers:
+                    observer.client_connected(clientAddress, player_id)
+
+                # Send ACK with player ID
+                ack_payload = f"PLAYER:{player_id}".encode()
+                response = struct.pack(HEADER_FORMAT, b'GCLP', 1, 2, 0, 0,
+                                     int(wall * 1000), len(ack_payload))
+                self.send(response + ack_payload, clientAddress)
+
+            elif client is None:
+                # No session for this address (dropped for silence, or the server restarted):
+                # ignore the datagram and tell the sender to start over with an INIT
+                response = struct.pack(HEADER_FORMAT, b'GCLP', 1, MSG_RESET, 0, seq, int(wall * 1000), 0)
+                self.send(response, clientAddress)
+
+            elif msg_type == 1:  # DATA (cell acquisition)
+                if version >= 2:
+                    # Version 2 piggybacks its binary ack in front of the event
+                    self.record_ack(clientAddress, *decode_ack(payload), echoed=timestamp, now=now, wall=wall)
+                    payload = bytes(payload[ACK_SIZE:]).decode()
+                else:
+                    payload = bytes(payload).decode()
+
+                    # Extract last acknowledged snapshot from payload
+                    if 'ACK_SNAP:' in payload:
+                        ack_snap = int(payload.split('ACK_SNAP:')[1])
+                        self.record_ack(clientAddress, ack_snap)
+
+                if 'ACQUIRE' in payload:
+                    parts = payload.split()
+                    cell_id = parts[1]
+                    player_id = int(parts[2])
+                    row, col = (int(part) for part in cell_id.split('_'))
+                    if not (0 <= row < self.grid_size and 0 <= col < self.grid_size):
+                        self.log(f"Player {player_id} claimed cell {cell_id} outside the grid [Seq: {seq}]")
+                        return
+
+                    # Update grid state
+                    self.apply_claim(row * self.grid_size + col, player_id)
+                    self.input_applied(client, seq)
+
+                    self.log(f"Player {player_id} acquired cell {cell_id} [Seq: {seq}]")
+
+            elif msg_type == 4:  # ACK (snapshot acknowledgment)
+                payload = bytes(payload).decode()
+                if 'ACK' in payload:
+                    ack_snapshot_id = int(payload.split()[1])
+                    self.record_ack(clientAddress, ack_snapshot_id)
+
+            elif msg_type == MSG_ACK_BITS:  # binary cumulative ack, sent only when idle
+                self.record_ack(clientAddress, *decode_ack(payload), echoed=timestamp, now=now, wall=wall)
+
+            elif msg_type == MSG_INPUT_BATCH:  # many claims in one datagram
+                latest, bits, indices, seqs = decode_input_batch(payload)
+                self.record_ack(clientAddress, latest, bits, echoed=timestamp, now=now, wall=wall)
+                if indices:
+                    self.apply_claims(indices, client['player_id'])
+                    self.input_applied(client, max(seqs))
+                    self.log(f"Player {client['player_id']} acquired {len(indices)} cells [Seq: {seq}]")
+
+            elif msg_type == MSG_SUBSCRIBE:  # area of interest
+                self.set_view(clientAddress, decode_subscribe(payload, self.grid_size))
+
+        except Exception as e:
+            self.log(f"Error: {e}")
+
+    def add_client(self, client_addr, version, now=None):
+        """Start a session for client_addr (what INIT does) and return its player id"""
+        if now is None:
+            now = self.monotonic()
+        player_id = self.allocate_player_id()
+        self.clients[client_addr] = {
+            'seq': 0,
+            'last_snapshot': 0,
+            'player_id': player_id,
+            'version': version,  # >= 2 understands binary deltas
+            'view': None,  # (row, col, height, width) the client subscribed to, None = whole map
+            'ack_floor': 0,  # acks up to here predate the current view
+            'last_input_seq': 0,  # highest client seq of an applied input, echoed to version 3
+            'last_rtt': None,
+            'rate': RateController(*self.rate_bounds, now=now) if self.rate_control else None,
+            'last_heard': now
+        }
+        self.client_last_ack[client_addr] = 0
+        self.client_ack_bits[client_addr] = 0
+        if self.client_timeout:
+            self.joined.append(client_addr)
+        return player_id
+
+    def record_ack(self, client_addr, latest, bits=0, echoed=0, now=None, wall=None):
+        """Merge an ack into what the client is known to hold; the newest snapshot is the delta baseline
+
+        echoed is the header timestamp of the ack, an echoed snapshot timestamp
+        (version 3 clients) that gives the rate controller an RTT sample. now and
+        wall are the arrival time of the ack on the core's monotonic and wall
+        clocks (default: read them).
+        """
+        client = self.clients.get(client_addr)
+        if client is None:
+            return
+        if now is None:
+            now = self.monotonic()
+        rtt = None
+        if echoed and client['version'] >= 3:
+            if wall is None:
+                wall = self.clock()
+            rtt = (wall * 1000 - echoed) / 1000
+            if 0 <= rtt < 10:
+                self.rtt_hist.observe(rtt)
+                if client['last_rtt'] is not None:
+                    self.jitter_hist.observe(abs(rtt - client['last_rtt']))
+                client['last_rtt'] = rtt
+            else:
+                rtt = None  # clock step or a bogus echo
+        if client['rate'] is not None:
+            client['rate'].on_ack(latest, bits, rtt, now)
+        if latest <= client['ack_floor']:
+            return
+        self.client_last_ack[client_addr], self.client_ack_bits[client_addr] = merge_ack(
+            self.client_last_ack.get(client_addr, 0), self.client_ack_bits.get(client_addr, 0),
+            latest, bits)
+
+    def set_view(self, client_addr, view):
+        """Change a client's viewport; its next snapshot is the full state of the new view"""
+        client = self.clients.get(client_addr)
+        if client is None or client['view'] == view:
+            return
+        client['view'] = view
+        # Snapshots built for the old view are no baseline for cells that just came into view
+        client['ack_floor'] = self.snapshot_id
+        self.client_last_ack[client_addr] = 0
+        self.client_ack_bits[client_addr] = 0
+
+    def apply_claim(self, index, player_id):
+        """Give a cell to a player"""
+        self.grid.set(index, player_id)
+        for observer in self.observers:
+            observer.grid_changed()
+
+    def apply_claims(self, indices, player_id):
+        """Give a batch of cells to a player, notifying observers once"""
+        cells = self.grid_size * self.grid_size
+        for index in indices:
+            if index < cells:
+                self.grid.set(index, player_id)
+        for observer in self.observers:
+            observer.grid_changed()
+
+    def expire_clients(self, now):
+        """Drop the clients whose timer fired without a datagram since; re-arm the others"""
+        liveness = self.liveness
+        joined = self.joined
+        for _ in range(len(joined)):
+            client_addr = joined.popleft()
+            client = self.clients.get(client_addr)
+            if client is not None:
+                liveness.schedule(client_addr, client['last_heard'] + self.client_timeout)
+        for client_addr in liveness.advance(now):
+            client = self.clients.get(client_addr)
+            if client is None:
+                continue
+            deadline = client['last_heard'] + self.client_timeout
+            if deadline > now:
+                liveness.schedule(client_addr, deadline)
+            else:
+                self.evict_client(client_addr, 'timeout')
+
+    def evict_client(self, client_addr, reason):
+        """Forget a client: no more snapshots, and its ack state and rate history are released"""
+        client = self.clients.pop(client_addr, None)
+        self.client_last_ack.pop(client_addr, None)
+        self.client_ack_bits.pop(client_addr, None)
+        self.liveness.cancel(client_addr)
+        if client is None:
+            return
+        self.evictions.inc(reason)
+        self.log(f"Player {client['player_id']} at {client_addr} dropped ({reason}), "
+                 f"{len(self.clients)} clients left")
+        for observer in self.observers:
+            observer.client_disconnected(client_addr, client['player_id'])
+
+    def allocate_player_id(self):
+        player_id = ((self.next_player_id - 1) % 4) + 1
+        self.next_player_id += 1
+        return player_id
+
+    def broadcast_delta_snapshot(self):
+        """Broadcast delta-encoded snapshot to all clients"""
+        if self.running and time.monotonic() >= self.next_stats_log:
+            self.next_stats_log += self.stats_interval
+            self.log(self.scheduler.summary())
+            if self.compress:
+                self.log(self.compression_summary())
+            if self.rate_control:
+                self.log(self.rate_summary())
+            self.log(self.metrics_summary())
+        if not self.running:
+            return
+        now = self.monotonic()
+        wall = self.clock()
+        if self.recorder:
+            self.recorder.tick(now, wall)
+        if self.client_timeout:
+            self.expire_clients(now)
+        if not self.clients:
+            return
+
+        tick_start = time.perf_counter()
+        input_seqs = self.advance_snapshot()
+        self.delta_cache.begin_tick(self.snapshot_id)
+        timestamp = int(wall * 1000)
+
+        # Send delta updates to each client; clients sharing a baseline share the same datagrams
+        for client_addr in list(self.clients.keys()):
+            try:
+                last_ack = self.client_last_ack.get(client_addr, 0)
+                client = self.clients[client_addr]
+                rate = client['rate']
+                if rate is not None and not rate.due(now):
+                    # Its next delta starts at the same baseline and covers this tick too
+                    self.skipped_sends += 1
+                    continue
+                binary = client['version'] >= 2
+                echo_input = client['version'] >= 3
+                view = client['view']
+                # Version 3 datagrams are built with seq_num 0 and restamped with the
+                # client's own input seq; the payload stays shared
+                datagrams = self.delta_cache.get(
+                    (last_ack, binary, view, echo_input),
+                    lambda: self.build_snapshot(last_ack, binary, timestamp, view, 0 if echo_input else None))
+                input_seq = input_seqs.get(client_addr, 0)
+                if echo_input and input_seq:
+                    datagrams = [with_seq(datagram, input_seq) for datagram in datagrams]
+                nbytes = 0
+                for datagram in datagrams:
+                    self.send(datagram, client_addr)
+                    nbytes += len(datagram)
+                self.egress_bytes += nbytes
+                if rate is not None:
+                    rate.sent(self.snapshot_id, nbytes, now)
+
+            except Exception as e:
+                self.log(f"Broadcast error to {client_addr}: {e}")
+
+        self.tick_hist.observe(time.perf_counter() - tick_start)
+        for observer in self.observers:
+            observer.snapshot_broadcast(self.snapshot_id)
+
+    def send(self, datagram, client_addr):
+        """Send one datagram through the engine, counted by msg_type"""
+        msg_type = datagram[5]
+        self.tx_packets.inc(msg_type)
+        self.tx_bytes.inc(msg_type, len(datagram))
+        self.engine.sendto(datagram, client_addr)
+
+    def input_applied(self, client, seq):
+        """The claims of client input seq are in the grid; snapshots from the next commit report it"""
+        client['last_input_seq'] = max(client['last_input_seq'], seq)
+
+    def advance_snapshot(self):
+        """Start a new snapshot: bump the ids and stamp this tick's changes
+
+        Returns {client address: highest applied input seq}, all covered by
+        the new snapshot.
+        """
+        # Read before the commit: every input these seqs cover is part of this snapshot
+        # (a copy: under the threaded engine an INIT can add a client meanwhile)
+        input_seqs = {addr: client['last_input_seq'] for addr, client in list(self.clients.items())}
+        self.snapshot_id += 1
+        self.sequence_number += 1
+
+        # The store keeps the last 100 snapshots of changes
+        self.grid.commit(self.snapshot_id)
+        return input_seqs
+
+    def build_snapshot(self, last_ack, binary, timestamp, view=None, seq=None):
+        """Encode the delta since last_ack as the list of datagrams carrying the snapshot
+
+        seq is the header seq_num, the server sequence number by default.
+        """
+        if seq is None:
+            seq = self.sequence_number
+        # Compute delta: changes since last acknowledged snapshot (inside the client's view)
+        indices, owners, full_state = self.compute_delta(last_ack, view)
+
+        # Binary delta for new clients, text delta for version 1 clients
+        if binary:
+            msg_type = MSG_BINARY_DELTA
+            flags = FLAG_FULL_STATE if full_state else 0
+            if self.compress:
+                start = time.perf_counter()
+                snapshot_data = encode_delta(indices, owners, self.grid_size, flags, compress=True)
+                self.record_compression(len(indices), snapshot_data, time.perf_counter() - start)
+            else:
+                snapshot_data = encode_delta(indices, owners, self.grid_size, flags)
+        else:
+            msg_type = MSG_SNAPSHOT
+            snapshot_data = encode_text_delta(indices, owners, self.grid_size)
+
+            # Version 1 clients cannot reassemble fragments: send one (IP-fragmented) datagram
+            response = struct.pack(HEADER_FORMAT, b'GCLP', 1, msg_type,
+                                 self.snapshot_id,
+                                 seq,
+                                 timestamp,
+                                 len(snapshot_data))
+            return [response + snapshot_data]
+
+        # Larger binary snapshots are split into MTU-sized fragments
+        return pack_datagrams(msg_type, self.snapshot_id, seq, timestamp, snapshot_data)
+
+    def record_compression(self, count, snapshot_data, seconds):
+        stats = self.compression_stats
+        stats['snapshots'] += 1
+        stats['raw_bytes'] += DELTA_HEADER_SIZE + count * DELTA_RECORD_SIZE
+        stats['sent_bytes'] += len(snapshot_data)
+        stats['seconds'] += seconds
+        if snapshot_data[2] & FLAG_COMPRESSED:
+            stats['compressed'] += 1
+
+    def compression_summary(self):
+        """One log line: compression ratio and encode cost per built snapshot"""
+        stats = self.compression_stats
+        built = stats['snapshots']
+        ratio = stats['sent_bytes'] / stats['raw_bytes'] if stats['raw_bytes'] else 1.0
+        cost = stats['seconds'] / built * 1e6 if built else 0.0
+        return (f"Compression: {stats['compressed']}/{built} snapshots compressed, "
+                f"{stats['raw_bytes']} -> {stats['sent_bytes']} bytes (ratio {ratio:.2f}), "
+                f"{cost:.0f} us/snapshot")
+
+    def rate_summary(self):
+        """One log line: spread of per-client rates, RTT and loss, and egress since the last line"""
+        # A copy: under the threaded engine an INIT can add a client while this runs
+        controllers = [client['rate'] for client in list(self.clients.values()) if client['rate'] is not None]
+        egress = self.egress_bytes / self.stats_interval / 1000
+        skipped = self.skipped_sends
+        self.egress_bytes = self.skipped_sends = 0
+        if not controllers:
+            return f"Rate control: no clients | egress {egress:.1f} kB/s"
+        rates = sorted(controller.rate for controller in controllers)
+        rtts = sorted(controller.srtt for controller in controllers if controller.srtt is not None)
+        rtt = f"{rtts[len(rtts) // 2] * 1000:.1f} ms" if rtts else "n/a"
+        loss = sum(controller.loss for controller in controllers) / len(controllers)
+        return (f"Rate control: {len(controllers)} clients | rate min {rates[0]:.1f} "
+                f"median {rates[len(rates) // 2]:.1f} max {rates[-1]:.1f} Hz | srtt median {rtt} | "
+                f"loss mean {loss:.1%} | egress {egress:.1f} kB/s | held back {skipped} sends")
+
+    def metrics_summary(self):
+        """One log line: latency percentiles, delta cache and traffic totals since start"""
+        cache = self.delta_cache.stats()
+        return (f"Metrics: {latency_summary('rtt', self.rtt_hist)} | "
+                f"{latency_summary('rtt jitter', self.jitter_hist)} | "
+                f"{latency_summary('tick', self.tick_hist)} | "
+                f"delta cache {cache['hits']} hits {cache['misses']} misses ({cache['hit_rate']:.1%}) | "
+                f"rx {self.rx_packets.total()} pkts {self.rx_bytes.total() / 1000:.1f} kB | "
+                f"tx {self.tx_packets.total()} pkts {self.tx_bytes.total() / 1000:.1f} kB | "
+                f"clients {len(self.clients)} active {self.evictions.total()} evicted")
+
+    def compute_delta(self, last_snapshot_id, view=None):
+        """Compute changes since last acknowledged snapshot as (indices, owners, full_state)"""
+        # Both reads from one published snapshot, whatever the receive side is writing
+        snapshot = self.grid.published
+        changes = snapshot.changes_since(last_snapshot_id, view)
+        if changes is None:
+            # Send full state if no history or first snapshot
+            return snapshot.full_state(view) + (True,)
+        return changes + (False,)
+
+
+def add_server_arguments(parser):
+    """Command line options shared by the headless and GUI server entry points"""
+    parser.add_argument('--port', type=int, default=serverPort)
+    parser.add_argument('--grid-size', type=int, default=10)
+    parser.add_argument('--frequency', type=float, default=20, help="broadcast rate in Hz (e.g. 20, 60, 120)")
+    parser.add_argument('--catch-up', action='store_true',
+                        help="run missed ticks back to back instead of skipping them")
+    parser.add_argument('--engine', choices=('asyncio', 'threaded'), default='asyncio')
+    parser.add_argument('--grid-engine', choices=('dict', 'array'), default='dict')
+    parser.add_argument('--compress', action='store_true',
+                        help="deflate binary snapshots when that makes them smaller")
+    parser.add_argument('--rate-control', action='store_true',
+                        help="adapt each client's snapshot rate (up to --frequency) and byte budget to its RTT and loss")
+    parser.add_argument('--min-rate', type=float, default=2.0, help="slowest per-client snapshot rate in Hz")
+    parser.add_argument('--min-budget', type=int, default=4000, help="smallest per-client budget in bytes/s")
+    parser.add_argument('--max-budget', type=int, default=250000, help="largest per-client budget in bytes/s")
+    parser.add_argument('--metrics-port', type=int, default=0,
+                        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics (0 = off)")
+    parser.add_argument('--client-timeout', type=float, default=10.0,
+                        help="drop clients not heard from for this many seconds (0 = never)")
+    parser.add_argument('--record', metavar='PATH',
+                        help="append every inbound datagram and tick to PATH for replay.py")
+    return parser
+
+
+def create_core(args):
+    return GridClashCore(port=args.port, grid_size=args.grid_size, frequency=args.frequency,
+                         engine=args.engine, grid_engine=args.grid_engine, catch_up=args.catch_up,
+                         compress=args.compress, rate_control=args.rate_control, min_rate=args.min_rate,
+                         min_budget=args.min_budget, max_budget=args.max_budget, metrics_port=args.metrics_port,
+                         record=args.record, client_timeout=args.client_timeout)
@@ -0,0 +1,341 @@
+import argparse
+import asyncio
+import multiprocessing as mp
+import random
+import struct
+import time
+from protocol import (HEADER_FORMAT, HEADER_SIZE, HEADER_STRUCT, PROTOCOL_VERSION,
+                      MSG_CONNECT_ACK, MSG_SNAPSHOT, MSG_BINARY_DELTA, MSG_ACK_BITS, MSG_FRAGMENT,
+                      MSG_SUBSCRIBE, MSG_INPUT_BATCH, MSG_RESET, MAX_INPUT_BATCH, decode_delta, encode_ack,
+                      echo_timestamp, encode_input_batch, encode_subscribe, merge_ack)
+from fragmentation import Reassembler
+
+# Headless bot swarm for load testing a GridClash server.
+# Every bot is a full client: INIT handshake, ACQUIRE events and acks the way
+# client_Decode.py sends them (binary acks piggybacked on DATA, standalone ones only
+# when idle; --acks legacy sends one text ACK per snapshot instead). Bots run on
+# asyncio, optionally split over several processes, and report handshake time,
+# snapshot jitter, claim-to-visible latency, snapshot loss and upstream packet rate.
+# Example: python loadgen.py --bots 1000 --processes 4 --duration 20
+#          python loadgen.py --sweep 100,200,400,800 --duration 10
+ACK_INTERVAL = 0.1  # same as client_Decode.py
+FRAME = 1 / 60  # --batch: claims made within one frame go out in one INPUT_BATCH
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Bot(asyncio.DatagramProtocol):
+    """One headless GridClash client"""
+
+    def __init__(self, server, grid_size, claim_rate, pattern, rng, legacy_acks=False, view_size=0,
+                 batch=False):
+        self.server = server
+        self.grid_size = grid_size
+        self.claim_interval = 1.0 / claim_rate if claim_rate > 0 else None
+        self.pattern = pattern  # list of cell indices to claim in order, or None for random
+        self.rng = rng
+        self.transport = None
+
+        self.player_id = None
+        self.sequence_number = 0
+        self.legacy_acks = legacy_acks
+        self.ack_state = (0, 0)
+        self.echo = (0, 0.0)  # (server timestamp, local arrival) of the newest snapshot
+        self.ack_pending = False
+        self.last_ack_sent = 0.0
+        self.packets_sent = 0
+        self.reassembler = Reassembler()
+        self.view = None
+        if view_size:
+            size = min(view_size, grid_size)
+            self.view = (rng.randrange(grid_size - size + 1), rng.randrange(grid_size - size + 1),
+                         size, size)
+        self.bytes_received = 0
+        self.batch = batch
+        self.pending_inputs = []  # (cell index, input seq) waiting for the next frame
+        self.input_seq = 0
+        self.init_sent = None
+        self.handshake_time = None
+
+        self.first_snapshot = None
+        self.last_snapshot = 0
+        self.snapshots = 0
+        self.last_arrival = None
+        self.inter_arrivals = []
+        self.owners = {}  # cell index -> owner, as seen in binary deltas
+        self.pending_claims = {}  # cell index -> time the claim was sent
+        self.claim_latencies = []
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.init_sent = time.perf_counter()
+        self.send(0, 0, b'', PROTOCOL_VERSION)
+
+    def send(self, msg_type, snapshot_id, payload, version=1):
+        self.sequence_number += 1
+        self.packets_sent += 1
+        if version >= 3:
+            # Echo the newest snapshot timestamp so the server can measure RTT
+            timestamp = echo_timestamp(self.echo[0], time.perf_counter() - self.echo[1])
+        else:
+            timestamp = int(time.time() * 1000)
+        header = struct.pack(HEADER_FORMAT, b'GCLP', version, msg_type, snapshot_id,
+                             self.sequence_number, timestamp, len(payload))
+        self.transport.sendto(header + payload, self.server)
+
+    def subscribe(self):
+        self.send(MSG_SUBSCRIBE, 0, encode_subscribe(*self.view), PROTOCOL_VERSION)
+
+    def scroll(self):
+        """Move the viewport by a few cells, staying on the map"""
+        row, col, height, width = self.view
+        row = min(max(0, row + self.rng.randint(-4, 4)), self.grid_size - height)
+        col = min(max(0, col + self.rng.randint(-4, 4)), self.grid_size - width)
+        self.view = (row, col, height, width)
+        self.subscribe()
+
+    def claim(self, step):
+        if self.player_id is None:
+            return
+        if self.pattern:
+            index = self.pattern[step % len(self.pattern)]
+        elif self.view:
+            # Players claim what they can see
+            row, col, height, width = self.view
+            index = (row + self.rng.randrange(height)) * self.grid_size + col + self.rng.randrange(width)
+        else:
+            index = self.rng.randrange(self.grid_size * self.grid_size)
+        row, col = divmod(index, self.grid_size)
+        if self.owners.get(index) != self.player_id:
+            # Only claims that will change the cell can become visible
+            self.pending_claims[index] = time.perf_counter()
+        latest, bits = self.ack_state
+        if self.batch:
+            self.input_seq += 1
+            self.pending_inputs.append((index, self.input_seq))
+            return
+        if self.legacy_acks:
+            self.send(1, latest, f"ACQUIRE {row}_{col} {self.player_id} ACK_SNAP:{latest}".encode())
+            return
+        self.send(1, latest, encode_ack(latest, bits) + f"ACQUIRE {row}_{col} {self.player_id}".encode(),
+                  PROTOCOL_VERSION)
+        self.ack_pending = False
+        self.last_ack_sent = time.perf_counter()
+
+    def flush_inputs(self):
+        """Send the claims of the past frame as INPUT_BATCH datagrams"""
+        while self.pending_inputs:
+            batch = self.pending_inputs[:MAX_INPUT_BATCH]
+            del self.pending_inputs[:MAX_INPUT_BATCH]
+            latest, bits = self.ack_state
+            self.send(MSG_INPUT_BATCH, latest,
+                      encode_input_batch(latest, bits, [index for index, _ in batch], [seq for _, seq in batch]),
+                      PROTOCOL_VERSION)
+            self.ack_pending = False
+            self.last_ack_sent = time.perf_counter()
+
+    def datagram_received(self, data, address):
+        now = time.perf_counter()
+        self.bytes_received += len(data)
+        header = HEADER_STRUCT.unpack_from(data, 0)
+        msg_type, snapshot_id, payload_len = header[2], header[3], header[6]
+        payload = data[HEADER_SIZE:HEADER_SIZE + payload_len]
+
+        if msg_type == MSG_FRAGMENT:
+            complete = self.reassembler.add(snapshot_id, payload)
+            if complete is None:
+                return
+            msg_type, payload = complete
+
+        if msg_type == MSG_CONNECT_ACK:
+            if self.player_id is None:
+                self.player_id = int(payload.decode().split(':')[1])
+                if self.handshake_time is None:
+                    self.handshake_time = now - self.init_sent
+                if self.view:
+                    self.subscribe()
+
+        elif msg_type == MSG_RESET:
+            # Dropped by the server: join again, once a second at most (every datagram in
+            # flight gets a RESET)
+            if self.player_id is not None or now - self.init_sent > 1.0:
+                self.init_sent = now
+                self.player_id = None
+                self.last_snapshot = 0
+                self.ack_state = (0, 0)
+                self.reassembler = Reassembler()
+                self.send(0, 0, b'', PROTOCOL_VERSION)
+
+        elif msg_type in (MSG_SNAPSHOT, MSG_BINARY_DELTA):
+            if snapshot_id <= self.last_snapshot:
+                return
+            if self.first_snapshot is None:
+                self.first_snapshot = snapshot_id
+            if self.last_arrival is not None:
+                self.inter_arrivals.append(now - self.last_arrival)
+            self.last_arrival = now
+            self.last_snapshot = snapshot_id
+            self.snapshots += 1
+            self.echo = (header[5], now)
+
+            if msg_type == MSG_BINARY_DELTA:
+                _, _, indices, owners = decode_delta(payload)
+                for index, owner in zip(indices, owners):
+                    self.owners[index] = owner
+                    sent = self.pending_claims.pop(index, None)
+                    # A different owner means another player won the cell: no sample
+                    if sent is not None and owner == self.player_id:
+                        self.claim_latencies.append(now - sent)
+
+            self.ack_state = merge_ack(*self.ack_state, snapshot_id)
+            if self.legacy_acks:
+                self.send(4, snapshot_id, f"ACK {snapshot_id}".encode())
+                return
+            self.ack_pending = True
+            if now - self.last_ack_sent >= ACK_INTERVAL:
+                latest, bits = self.ack_state
+                self.send(MSG_ACK_BITS, latest, encode_ack(latest, bits), PROTOCOL_VERSION)
+                self.ack_pending = False
+                self.last_ack_sent = now
+
+    def results(self):
+        expected = self.last_snapshot - self.first_snapshot + 1 if self.first_snapshot else 0
+        return {
+            'connected': self.player_id is not None,
+            'handshake': self.handshake_time,
+            'snapshots': self.snapshots,
+            'lost': expected - self.snapshots,
+            'expected': expected,
+            'inter_arrivals': self.inter_arrivals,
+            'claim_latencies': self.claim_latencies,
+            'packets_sent': self.packets_sent,
+            'bytes_received': self.bytes_received,
+        }
+
+
+async def run_bots(args, count, seed):
+    loop = asyncio.get_running_loop()
+    pattern = None
+    if args.pattern:
+        with open(args.pattern) as f:
+            pattern = [int(row) * args.grid_size + int(col)
+                       for row, col in (line.split() for line in f if line.strip())]
+
+    bots = []
+    for i in range(count):
+        bot = Bot((args.host, args.port), args.grid_size, args.claim_rate, pattern,
+                  random.Random(seed * 100003 + i), args.acks == 'legacy', args.view_size,
+                  args.batch)
+        await loop.create_datagram_endpoint(lambda bot=bot: bot, remote_addr=(args.host, args.port))
+        bots.append(bot)
+        if args.connect_rate:
+            await asyncio.sleep(1.0 / args.connect_rate)
+
+    async def claim_loop(bot):
+        step = 0
+        await asyncio.sleep(bot.rng.random() * bot.claim_interval)
+        while True:
+            bot.claim(step)
+            step += 1
+            await asyncio.sleep(bot.claim_interval)
+
+    async def scroll_loop(bot):
+        await asyncio.sleep(bot.rng.random() * args.scroll)
+        while True:
+            if bot.player_id is not None:
+                bot.scroll()
+            await asyncio.sleep(args.scroll)
+
+    async def flush_loop():
+        while True:
+            for bot in bots:
+                bot.flush_inputs()
+            await asyncio.sleep(FRAME)
+
+    tasks = [asyncio.create_task(claim_loop(bot)) for bot in bots if bot.claim_interval]
+    if args.batch:
+        tasks.append(asyncio.create_task(flush_loop()))
+    if args.view_size and args.scroll:
+        tasks += [asyncio.create_task(scroll_loop(bot)) for bot in bots]
+    await asyncio.sleep(args.duration)
+    for task in tasks:
+        task.cancel()
+    for bot in bots:
+        bot.transport.close()
+    return [bot.results() for bot in bots]
+
+
+def worker(args, count, seed, results):
+    results.put(asyncio.run(run_bots(args, count, seed)))
+
+
+def run_swarm(args, bots):
+    """Run `bots` bots over args.processes processes and return every bot's results"""
+    processes = max(1, min(args.processes, bots))
+    results = mp.Queue()
+    workers = []
+    for i in range(processes):
+        count = bots // processes + (1 if i < bots % processes else 0)
+        process = mp.Process(target=worker, args=(args, count, args.seed + i, results))
+        process.start()
+        workers.append(process)
+    collected = []
+    for _ in workers:
+        collected.extend(results.get())
+    for process in workers:
+        process.join()
+    return collected
+
+
+def report(bots, results, duration):
+    connected = [r for r in results if r['connected']]
+    handshakes = [r['handshake'] for r in connected]
+    inter_arrivals = [gap for r in results for gap in r['inter_arrivals']]
+    latencies = [lat for r in results for lat in r['claim_latencies']]
+    loss = [r['lost'] / r['expected'] for r in results if r['expected']]
+    rates = [r['snapshots'] / duration for r in results]
+    upstream = [r['packets_sent'] / duration for r in results]
+    downstream = [r['bytes_received'] / duration / 1000 for r in results]
+    mean_gap = sum(inter_arrivals) / len(inter_arrivals) if inter_arrivals else 0.0
+    jitter = (sum((gap - mean_gap) ** 2 for gap in inter_arrivals) / len(inter_arrivals)) ** 0.5 \
+        if inter_arrivals else 0.0
+    return (f"bots {bots:>5} | connected {len(connected):>5} | "
+            f"handshake p50 {percentile(handshakes, 0.5) * 1000:6.1f} ms p99 {percentile(handshakes, 0.99) * 1000:6.1f} ms | "
+            f"snapshots/s mean {sum(rates) / len(rates) if rates else 0:5.1f} | "
+            f"upstream pkts/s mean {sum(upstream) / len(upstream) if upstream else 0:5.1f} | "
+            f"downstream kB/s mean {sum(downstream) / len(downstream) if downstream else 0:7.1f} | "
+            f"gap {mean_gap * 1000:5.1f} ms jitter {jitter * 1000:5.1f} ms | "
+            f"claim->visible p50 {percentile(latencies, 0.5) * 1000:6.1f} ms p99 {percentile(latencies, 0.99) * 1000:6.1f} ms | "
+            f"loss mean {100 * sum(loss) / len(loss) if loss else 0:5.2f}% max {100 * max(loss, default=0):5.2f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GridClash bot swarm load generator")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=12000)
+    parser.add_argument('--bots', type=int, default=100)
+    parser.add_argument('--sweep', help="comma separated bot counts to run one after another")
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds per run")
+    parser.add_argument('--grid-size', type=int, default=10)
+    parser.add_argument('--claim-rate', type=float, default=1.0, help="ACQUIREs per second per bot")
+    parser.add_argument('--pattern', help="file of 'row col' lines claimed in order instead of random cells")
+    parser.add_argument('--connect-rate', type=float, default=0, help="INITs per second per process (0 = all at once)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--view-size', type=int, default=0,
+                        help="subscribe each bot to a random square viewport of this size (0 = whole map)")
+    parser.add_argument('--scroll', type=float, default=0, help="seconds between viewport moves (0 = never)")
+    parser.add_argument('--batch', action='store_true',
+                        help="send each frame's claims as one INPUT_BATCH datagram")
+    parser.add_argument('--acks', choices=('bits', 'legacy'), default='bits',
+                        help="binary cumulative acks, or one text ACK per snapshot")
+    args = parser.parse_args()
+
+    counts = [int(n) for n in args.sweep.split(',')] if args.sweep else [args.bots]
+    for bots in counts:
+        print(report(bots, run_swarm(args, bots), args.duration), flush=True)
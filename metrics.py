@@ -0,0 +1,180 @@
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Bucket upper bounds in seconds, shared by every latency histogram
+LATENCY_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0)
+DURATION_BUCKETS = (0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1)
+
+
+class Histogram:
+    """Fixed-bucket histogram: observe() is one bisect and two additions under a lock.
+
+    The scrape runs on the HTTP server's thread: it copies the buckets,
+    sum and count under the same lock, so they always agree.
+    """
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot = above the largest bound
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        """(counts, sum, count) as of one moment"""
+        with self.lock:
+            return list(self.counts), self.sum, self.count
+
+    def quantile(self, fraction):
+        """Estimate a quantile by interpolating inside its bucket, like histogram_quantile()"""
+        counts, _, total = self.snapshot()
+        if not total:
+            return 0.0
+        rank = fraction * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if seen + count >= rank and count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def render(self):
+        counts, total_sum, total = self.snapshot()
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{bound:g}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {total}')
+        lines.append(f"{self.name}_sum {total_sum:.6f}")
+        lines.append(f"{self.name}_count {total}")
+        return lines
+
+
+class Counter:
+    """Counter split by one label (e.g. msg_type)
+
+    With read, the counts are kept elsewhere and read as {label value: count}
+    at scrape time, like a Gauge. inc() and the copy a scrape renders take
+    the same lock: a new label value must not resize the dict mid-render.
+    """
+
+    def __init__(self, name, help, label, read=None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.values = {}
+        self.read = read
+        self.lock = threading.Lock()
+
+    def inc(self, label_value, amount=1):
+        with self.lock:
+            self.values[label_value] = self.values.get(label_value, 0) + amount
+
+    def current(self):
+        """{label value: count}, a copy"""
+        if self.read:
+            return self.read()
+        with self.lock:
+            return dict(self.values)
+
+    def total(self):
+        return sum(self.current().values())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_value, value in sorted(self.current().items()):
+            lines.append(f'{self.name}{{{self.label}="{label_value}"}} {value}')
+        return lines
+
+
+class Gauge:
+    """Single value read through a callable at scrape time"""
+
+    def __init__(self, name, help, read):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge",
+                f"{self.name} {self.read()}"]
+
+
+class MetricsRegistry:
+    """The metrics of one process, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        return self.add(Histogram(name, help, buckets))
+
+    def counter(self, name, help, label, read=None):
+        return self.add(Counter(name, help, label, read))
+
+    def gauge(self, name, help, read):
+        return self.add(Gauge(name, help, read))
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in list(self.metrics):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def latency_summary(label, histogram):
+    """'label p50 x ms p99 y ms' for a summary line, or 'label n/a' before any sample"""
+    if not histogram.count:
+        return f"{label} n/a"
+    return f"{label} p50 {histogram.quantile(0.5) * 1000:.1f} ms p99 {histogram.quantile(0.99) * 1000:.1f} ms"
+
+
+class MetricsServer:
+    """Serves a registry at http://host:port/metrics from a daemon thread"""
+
+    def __init__(self, registry, port, host='127.0.0.1'):
+        self.registry = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path not in ('/', '/metrics'):
+                    handler.send_error(404)
+                    return
+                body = registry.render().encode()
+                handler.send_response(200)
+                handler.send_header('Content-Type', 'text/plain; version=0.0.4')
+                handler.send_header('Content-Length', str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, format, *args):
+                pass  # scrapes would flood the game log
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
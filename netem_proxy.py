@@ -0,0 +1,206 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+# User-space UDP impairment proxy for reproducible network experiments (no root, no tc netem).
+# Clients talk to the proxy, the proxy talks to the server with one upstream socket per
+# client, and each direction gets its own loss / latency / jitter / reordering /
+# duplication / bandwidth settings and its own seeded RNG. A client silent for
+# --session-timeout seconds loses its upstream socket; it gets a new one (a new source
+# port, as after a NAT rebinding) when it speaks again.
+# Example: python netem_proxy.py --scenario scenarios/loss_10.json --listen-port 12001 --server-port 12000
+#          (then point the clients at port 12001)
+
+DEFAULT_IMPAIRMENT = {
+    'loss': 0.0,            # probability a datagram is dropped
+    'latency_ms': 0.0,      # fixed one-way delay
+    'jitter_ms': 0.0,       # uniform +/- variation added to the delay
+    'reorder': 0.0,         # probability a datagram is held back by reorder_ms
+    'reorder_ms': 20.0,
+    'duplicate': 0.0,       # probability a datagram is delivered twice
+    'bandwidth_kbps': 0.0,  # serialization rate, 0 = unlimited
+    'queue_ms': 1000.0,     # bandwidth queue limit: drop when the backlog exceeds this, 0 = unlimited
+}
+
+
+def load_scenario(path):
+    """Read a scenario file: {"seed": n, "upstream": {...}, "downstream": {...}}
+
+    A "both" section applies to the two directions before their own sections.
+    """
+    with open(path) as f:
+        scenario = json.load(f)
+    both = scenario.get('both', {})
+    return {
+        'seed': scenario.get('seed', 1),
+        'upstream': {**DEFAULT_IMPAIRMENT, **both, **scenario.get('upstream', {})},
+        'downstream': {**DEFAULT_IMPAIRMENT, **both, **scenario.get('downstream', {})},
+    }
+
+
+class ImpairedLink:
+    """One direction of the proxy: decides the fate and delivery time of each datagram"""
+
+    def __init__(self, name, settings, seed):
+        self.name = name
+        self.settings = settings
+        self.rng = random.Random(seed)
+        self.link_free_at = 0.0  # when the bandwidth-limited link finishes its current datagram
+
+        self.packets_in = 0
+        self.packets_out = 0
+        self.bytes_out = 0
+        self.dropped = 0
+        self.overflowed = 0  # tail drops of a full bandwidth queue (not counted in dropped)
+        self.duplicated = 0
+        self.reordered = 0
+
+    def schedule(self, size, now):
+        """Return the delays (seconds from now) at which copies of this datagram are delivered"""
+        settings = self.settings
+        self.packets_in += 1
+        if self.rng.random() < settings['loss']:
+            self.dropped += 1
+            return []
+
+        copies = 1
+        if self.rng.random() < settings['duplicate']:
+            self.duplicated += 1
+            copies = 2
+
+        delays = []
+        for _ in range(copies):
+            if settings['bandwidth_kbps'] and settings['queue_ms']:
+                # Tail drop, as tbf does past its latency limit: the queue never grows past queue_ms
+                if self.link_free_at - now > settings['queue_ms'] / 1000.0:
+                    self.overflowed += 1
+                    continue
+            delay = settings['latency_ms'] / 1000.0
+            if settings['jitter_ms']:
+                delay += self.rng.uniform(-settings['jitter_ms'], settings['jitter_ms']) / 1000.0
+            if self.rng.random() < settings['reorder']:
+                self.reordered += 1
+                delay += settings['reorder_ms'] / 1000.0
+            if settings['bandwidth_kbps']:
+                start = max(now, self.link_free_at)
+                self.link_free_at = start + size * 8 / (settings['bandwidth_kbps'] * 1000.0)
+                delay += self.link_free_at - now
+            delays.append(max(0.0, delay))
+        self.packets_out += len(delays)
+        self.bytes_out += size * len(delays)
+        return delays
+
+    def stats_line(self, interval):
+        line = (f"{self.name:>10}: in {self.packets_in:>6} out {self.packets_out:>6} "
+                f"drop {self.dropped:>5} qdrop {self.overflowed:>5} dup {self.duplicated:>4} reorder {self.reordered:>4} "
+                f"{self.bytes_out * 8 / interval / 1000:8.1f} kbit/s")
+        self.packets_in = self.packets_out = self.bytes_out = 0
+        self.dropped = self.overflowed = self.duplicated = self.reordered = 0
+        return line
+
+
+class _Downstream(asyncio.DatagramProtocol):
+    """Upstream socket of one client: server replies come back through here"""
+
+    def __init__(self, proxy, client_address):
+        self.proxy = proxy
+        self.client_address = client_address
+        self.transport = None
+        self.backlog = []  # client datagrams received while the upstream socket was opening
+        self.last_active = time.monotonic()  # last datagram in either direction
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, address):
+        self.last_active = time.monotonic()
+        self.proxy.forward(self.proxy.downstream, data,
+                           lambda: self.proxy.listen_transport.sendto(data, self.client_address))
+
+
+class UdpImpairmentProxy(asyncio.DatagramProtocol):
+    def __init__(self, server_address, scenario):
+        self.server_address = server_address
+        self.upstream = ImpairedLink('upstream', scenario['upstream'], scenario['seed'])
+        self.downstream = ImpairedLink('downstream', scenario['downstream'], scenario['seed'] + 1)
+        self.sessions = {}  # client address -> _Downstream
+        self.listen_transport = None
+        self.loop = None
+
+    def connection_made(self, transport):
+        self.listen_transport = transport
+        self.loop = asyncio.get_running_loop()
+
+    def datagram_received(self, data, address):
+        session = self.sessions.get(address)
+        if session is None:
+            session = _Downstream(self, address)
+            self.sessions[address] = session
+            self.loop.create_task(self.open_session(session))
+        session.last_active = time.monotonic()
+        if session.transport is None:
+            session.backlog.append(data)
+            return
+        self.forward(self.upstream, data, lambda: session.transport.sendto(data))
+
+    async def open_session(self, session):
+        await self.loop.create_datagram_endpoint(lambda: session, remote_addr=self.server_address)
+        for data in session.backlog:
+            self.forward(self.upstream, data, lambda data=data: session.transport.sendto(data))
+        session.backlog = []
+
+    def expire_sessions(self, timeout, now):
+        """Close the upstream sockets of clients idle for timeout seconds; return how many"""
+        idle = [address for address, session in self.sessions.items()
+                if session.transport is not None and now - session.last_active > timeout]
+        for address in idle:
+            # Deliveries still scheduled for it are dropped by the closed transport
+            self.sessions.pop(address).transport.close()
+        return len(idle)
+
+    def forward(self, link, data, deliver):
+        for delay in link.schedule(len(data), time.monotonic()):
+            if delay:
+                self.loop.call_later(delay, deliver)
+            else:
+                deliver()
+
+
+async def main(args):
+    scenario = load_scenario(args.scenario) if args.scenario else {
+        'seed': 1, 'upstream': dict(DEFAULT_IMPAIRMENT), 'downstream': dict(DEFAULT_IMPAIRMENT)}
+    if args.seed is not None:
+        scenario['seed'] = args.seed
+
+    loop = asyncio.get_running_loop()
+    proxy = UdpImpairmentProxy((args.server_host, args.server_port), scenario)
+    await loop.create_datagram_endpoint(lambda: proxy, local_addr=('0.0.0.0', args.listen_port))
+    print(f"Proxy :{args.listen_port} -> {args.server_host}:{args.server_port} (seed {scenario['seed']})")
+    print(f"  upstream   {scenario['upstream']}")
+    print(f"  downstream {scenario['downstream']}", flush=True)
+
+    while True:
+        await asyncio.sleep(args.stats_interval)
+        expired = proxy.expire_sessions(args.session_timeout, time.monotonic()) if args.session_timeout else 0
+        print(f"[{time.strftime('%H:%M:%S')}] {len(proxy.sessions)} sessions ({expired} expired)")
+        print("  " + proxy.upstream.stats_line(args.stats_interval))
+        print("  " + proxy.downstream.stats_line(args.stats_interval), flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="UDP network impairment proxy")
+    parser.add_argument('--scenario', help="JSON scenario file (see scenarios/)")
+    parser.add_argument('--seed', type=int, help="override the scenario seed")
+    parser.add_argument('--listen-port', type=int, default=12001)
+    parser.add_argument('--server-host', default='127.0.0.1')
+    parser.add_argument('--server-port', type=int, default=12000)
+    parser.add_argument('--stats-interval', type=float, default=5.0)
+    parser.add_argument('--session-timeout', type=float, default=60.0,
+                        help="close a client's upstream socket after this many idle seconds, 0 = never "
+                             "(checked every stats interval)")
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
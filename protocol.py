@@ -0,0 +1,257 @@
+import itertools
+import struct
+import zlib
+
+# '!4s B B I I Q H' = protocol_id, version, msg_type, snapshot_id, seq_num, timestamp, payload_len
+HEADER_FORMAT = '!4s B B I I Q H'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+HEADER_STRUCT = struct.Struct(HEADER_FORMAT)  # precompiled: no format lookup per packet
+
+PROTOCOL_ID = b'GCLP'
+
+# Version 1 clients only understand the text snapshot (msg_type 3).
+# Version 2 clients announce themselves in the INIT header and receive binary deltas.
+# Version 3 clients also echo snapshot timestamps in the headers of their acks (see
+# echo_timestamp), which gives the server an RTT sample per ack for rate control, and
+# find in the seq_num of every snapshot header the highest input seq (INPUT_BATCH seq
+# or DATA header seq) the server applied before that snapshot, for reconciling
+# predicted claims.
+PROTOCOL_VERSION = 3
+SEQ_OFFSET = 10  # byte offset of seq_num in the header
+SEQ_STRUCT = struct.Struct('!I')
+
+# msg_type: INIT=0, DATA=1, CONNECT_ACK=2, SNAPSHOT=3, ACK=4, BINARY_DELTA=5, ACK_BITS=6,
+# FRAGMENT=7 (see fragmentation.py), SUBSCRIBE=8, INPUT_BATCH=9, RESET=10
+MSG_INIT = 0
+MSG_DATA = 1
+MSG_CONNECT_ACK = 2
+MSG_SNAPSHOT = 3
+MSG_ACK = 4
+MSG_BINARY_DELTA = 5
+MSG_ACK_BITS = 6
+MSG_FRAGMENT = 7
+MSG_SUBSCRIBE = 8
+MSG_INPUT_BATCH = 9
+# Server to client, no payload: the server has no session for the sender's address (it
+# was dropped for silence, or the server restarted) and ignored its datagram. The client
+# starts over with an INIT; snapshot ids may restart too.
+MSG_RESET = 10
+
+# Receive buffer for every GridClash socket: never smaller than the largest datagram
+RECV_BUFFER = 65535
+
+# Version 1 clients cannot reassemble fragments, so their text snapshot must fit one
+# UDP datagram. The server answers the INIT of a version 1 client with a CONNECT_ACK
+# payload of "REJECTED:<reason>" instead of "PLAYER:<id>" when a full state of its
+# grid would not (see text_full_state_size).
+MAX_TEXT_SNAPSHOT = 65507 - HEADER_SIZE
+
+# Binary delta payload: '!H B' = grid_size, flags, followed by
+# N big-endian uint32 cell indices (row * grid_size + col) and N uint8 owners.
+# Indices and owners are stored as two packed columns rather than interleaved
+# records so both sides can pack/unpack them with a single struct call.
+DELTA_HEADER_FORMAT = '!H B'
+DELTA_HEADER_SIZE = struct.calcsize(DELTA_HEADER_FORMAT)
+DELTA_RECORD_SIZE = 5
+
+FLAG_FULL_STATE = 0x01
+# The body after the sub-header is raw deflate (DELTA_ZDICT preset dictionary) of the
+# same two columns, with each index stored as the gap from the previous one
+# (mod 2**32) so runs of neighbouring cells become runs of small numbers.
+FLAG_COMPRESSED = 0x02
+
+# Bodies smaller than this never shrink enough to be worth the CPU
+COMPRESS_MIN_SIZE = 64
+COMPRESS_LEVEL = 6
+# Preset dictionaries: the most common strings go last (closest to the data)
+DELTA_ZDICT = bytes([1, 2, 3, 4, 4, 3, 2, 1, 1, 1, 2, 2, 3, 3, 4, 4]) + \
+    b'\x00\x00\x00\x02\x00\x00\x00\x03' + b'\x00\x00\x00\x01' * 32
+JSON_ZDICT = b'[[0, 0, 0, 0, 0, 0, 0, 0, 0, 0], [1, 2, 3, 4, ' + b'0, ' * 32
+
+# Binary ack: '!I I' = latest snapshot id received, bitfield of the 32 before it
+# (bit i set = snapshot latest - 1 - i received). Version 2 clients send it as the
+# payload of ACK_BITS (msg_type 6) and prefix it to the payload of DATA packets,
+# so a client that is sending events needs no separate ack datagrams.
+ACK_FORMAT = '!I I'
+ACK_SIZE = struct.calcsize(ACK_FORMAT)
+ACK_WINDOW = 32
+ACK_MASK = (1 << ACK_WINDOW) - 1
+
+# Area of interest: '!H H H H' = row, col, height, width of the viewport a client
+# wants deltas for (SUBSCRIBE, version 2 clients). Height or width 0 = whole map.
+SUBSCRIBE_FORMAT = '!H H H H'
+
+# Batched input (INPUT_BATCH, version 2 clients): the binary ack, then N uint32 cell
+# indices and N uint32 client input sequence numbers, columnar like the deltas.
+# The player is the one the server assigned to the sending address.
+INPUT_RECORD_SIZE = 8
+MAX_INPUT_BATCH = 140  # records that fit in one 1200 byte datagram
+
+
+def cell_index(cell_id, grid_size):
+    """Convert a "row_col" cell id to a flat cell index"""
+    row, col = cell_id.split('_')
+    return int(row) * grid_size + int(col)
+
+
+def cell_id(index, grid_size):
+    """Convert a flat cell index back to a "row_col" cell id"""
+    row, col = divmod(index, grid_size)
+    return f"{row}_{col}"
+
+
+def compress_payload(data, zdict):
+    """Raw deflate with a preset dictionary (no zlib header: the flag says what it is)"""
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15, zdict=zdict)
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress_payload(data, zdict):
+    decompressor = zlib.decompressobj(-15, zdict=zdict)
+    return decompressor.decompress(data) + decompressor.flush()
+
+
+def encode_delta(indices, owners, grid_size, flags=0, compress=False):
+    """Pack parallel cell index / owner sequences into a binary delta payload
+
+    With compress=True the body is deflated (FLAG_COMPRESSED) only when that
+    makes the payload smaller.
+    """
+    count = len(indices)
+    if hasattr(indices, 'astype'):
+        # NumPy arrays from the array grid engine: encode without a Python loop
+        body = indices.astype('>u4').tobytes() + owners.astype('u1').tobytes()
+    else:
+        body = struct.pack(f'!{count}I', *indices) + bytes(owners)
+
+    if compress and len(body) >= COMPRESS_MIN_SIZE:
+        if hasattr(indices, 'astype'):
+            gaps = (indices.astype('i8') - indices.astype('i8').take(range(-1, count - 1))) & 0xFFFFFFFF
+            gaps[0] = indices[0]
+            columns = gaps.astype('>u4').tobytes() + owners.astype('u1').tobytes()
+        else:
+            gaps = [(index - previous) & 0xFFFFFFFF
+                    for index, previous in zip(indices, itertools.chain((0,), indices))]
+            columns = struct.pack(f'!{count}I', *gaps) + bytes(owners)
+        compressed = compress_payload(columns, DELTA_ZDICT)
+        if len(compressed) < len(body):
+            return struct.pack(DELTA_HEADER_FORMAT, grid_size, flags | FLAG_COMPRESSED) + compressed
+
+    return struct.pack(DELTA_HEADER_FORMAT, grid_size, flags) + body
+
+
+def decode_delta(payload):
+    """Unpack a binary delta payload into (grid_size, flags, indices, owners)"""
+    grid_size, flags = struct.unpack_from(DELTA_HEADER_FORMAT, payload, 0)
+    if flags & FLAG_COMPRESSED:
+        body = decompress_payload(payload[DELTA_HEADER_SIZE:], DELTA_ZDICT)
+        count = len(body) // DELTA_RECORD_SIZE
+        gaps = struct.unpack_from(f'!{count}I', body, 0)
+        indices = [total & 0xFFFFFFFF for total in itertools.accumulate(gaps)]
+        return grid_size, flags, indices, body[4 * count:5 * count]
+    count = (len(payload) - DELTA_HEADER_SIZE) // DELTA_RECORD_SIZE
+    indices = struct.unpack_from(f'!{count}I', payload, DELTA_HEADER_SIZE)
+    owners_start = DELTA_HEADER_SIZE + 4 * count
+    owners = payload[owners_start:owners_start + count]
+    return grid_size, flags, indices, owners
+
+
+def encode_text_delta(indices, owners, grid_size):
+    """Build the legacy "DELTA CELL r_c owner | ..." payload for version 1 clients"""
+    if not indices:
+        return "NO_CHANGES".encode()
+    return " | ".join(f"DELTA CELL {cell_id(index, grid_size)} {owner}"
+                      for index, owner in zip(indices, owners)).encode()
+
+
+def text_full_state_size(grid_size):
+    """Bytes of the text snapshot of a grid whose every cell is owned: the largest one"""
+    # Digits of all row (or column) numbers, each written grid_size times
+    digits = sum(len(str(number)) for number in range(grid_size))
+    cells = grid_size * grid_size
+    # "DELTA CELL " + "r_c" + " o", joined by " | "
+    return cells * (len("DELTA CELL _ 1")) + 2 * grid_size * digits + 3 * (cells - 1)
+
+
+def decode_text_delta(snapshot_data, grid_size):
+    """Parse a legacy "DELTA CELL r_c owner | ..." payload into (indices, owners)"""
+    indices = []
+    owners = []
+    for line in snapshot_data.split('|'):
+        line = line.strip()
+        if 'DELTA' in line and 'CELL' in line:
+            # Delta format: "DELTA CELL cell_id owner"
+            parts = line.split()
+            if len(parts) >= 4:
+                indices.append(cell_index(parts[2], grid_size))
+                owners.append(int(parts[3]))
+    return indices, owners
+
+
+def encode_ack(latest, bits):
+    return struct.pack(ACK_FORMAT, latest, bits)
+
+
+def decode_ack(payload):
+    """Unpack the binary ack at the start of payload into (latest, bits)"""
+    return struct.unpack_from(ACK_FORMAT, payload, 0)
+
+
+def merge_ack(latest, bits, other_latest, other_bits=0):
+    """Combine two ack windows; acks that arrive out of order never move latest back"""
+    if other_latest > latest:
+        latest, bits, other_latest, other_bits = other_latest, other_bits, latest, bits
+    if other_latest == 0:
+        return latest, bits
+    shift = latest - other_latest
+    if shift == 0:
+        return latest, bits | other_bits
+    return latest, (bits | (other_bits << shift) | (1 << (shift - 1))) & ACK_MASK
+
+
+def with_seq(datagram, seq):
+    """Copy of a datagram with another header seq_num"""
+    return datagram[:SEQ_OFFSET] + SEQ_STRUCT.pack(seq) + datagram[SEQ_OFFSET + 4:]
+
+
+def echo_timestamp(timestamp, held):
+    """Header timestamp for an ack from a version 3 client
+
+    The newest snapshot's server timestamp plus the seconds the client held
+    it before acking, so the server's RTT sample excludes the ack delay.
+    """
+    return timestamp + int(held * 1000) if timestamp else 0
+
+
+def ack_contains(latest, bits, snapshot_id):
+    """True if the ack window reports snapshot_id as received"""
+    if snapshot_id == latest:
+        return latest > 0
+    shift = latest - snapshot_id
+    return 0 < shift <= ACK_WINDOW and bool(bits & (1 << (shift - 1)))
+
+
+def encode_subscribe(row, col, height, width):
+    return struct.pack(SUBSCRIBE_FORMAT, row, col, height, width)
+
+
+def decode_subscribe(payload, grid_size):
+    """Unpack a SUBSCRIBE payload into a rect clipped to the grid, or None for the whole map"""
+    row, col, height, width = struct.unpack_from(SUBSCRIBE_FORMAT, payload, 0)
+    row, col = min(row, grid_size - 1), min(col, grid_size - 1)
+    height, width = min(height, grid_size - row), min(width, grid_size - col)
+    if height == 0 or width == 0 or (height, width) == (grid_size, grid_size):
+        return None
+    return row, col, height, width
+
+
+def encode_input_batch(latest, bits, indices, seqs):
+    count = len(indices)
+    return struct.pack(f'!II{count}I{count}I', latest, bits, *indices, *seqs)
+
+
+def decode_input_batch(payload):
+    """Unpack an INPUT_BATCH payload into (latest, bits, indices, seqs)"""
+    count = (len(payload) - ACK_SIZE) // INPUT_RECORD_SIZE
+    values = struct.unpack_from(f'!II{2 * count}I', payload, 0)
+    return values[0], values[1], values[2:2 + count], values[2 + count:]
@@ -0,0 +1,94 @@
+import collections
+from protocol import ACK_WINDOW, ack_contains
+
+# Additive increase per second without congestion, multiplicative decrease on congestion
+RATE_INCREASE = 5.0  # Hz per second
+BUDGET_INCREASE = 0.1  # fraction of max_budget per second
+DELAY_DECREASE = 0.85
+# Smoothed loss below LOSS_LOW allows increases, above LOSS_HIGH cuts by (1 - loss / 2);
+# in between the rate holds, so steady random loss does not drive it to the minimum
+LOSS_LOW = 0.02
+LOSS_HIGH = 0.10
+QUEUE_DELAY = 0.05  # seconds of RTT above the path minimum that count as a queue building up
+ACK_TIMEOUT = 1.0  # seconds without any ack (while snapshots are in flight) count as congestion
+BURST_SECONDS = 0.25  # the byte budget may be saved up for this long
+
+
+class RateController:
+    """Snapshot rate and byte budget of one client, adapted from its RTT and loss.
+
+    Version 3 clients echo the newest snapshot timestamp (plus the time they
+    held it) in their ack headers, which gives one RTT sample per ack; the
+    ack bitfield tells which of the snapshots sent to the client arrived.
+    The rate and the budget grow additively while the path looks clean and
+    are cut multiplicatively, at most once per RTT, when heavy loss or
+    queueing delay shows up. A client that is sent fewer snapshots simply gets
+    deltas covering a longer interval, since deltas start at its last ack.
+    """
+
+    def __init__(self, min_rate, max_rate, min_budget, max_budget, now=0.0):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.min_budget = min_budget
+        self.max_budget = max_budget
+        self.rate = max(min_rate, min(max_rate, 20.0))  # Hz, starts at the old fixed rate
+        self.budget = max(min_budget, max_budget / 2)  # bytes per second
+
+        self.next_send = now
+        self.tokens = self.budget * BURST_SECONDS
+        self.last_refill = now
+        self.last_adjust = now
+        self.last_decrease = now
+        self.last_ack = now
+
+        self.srtt = None  # seconds
+        self.min_rtt = None
+        self.loss = 0.0
+        self.in_flight = collections.deque()  # snapshot ids sent and not yet covered by an ack
+
+    def due(self, now):
+        """True if the client should get this tick's snapshot"""
+        self.tokens = min(self.budget * BURST_SECONDS, self.tokens + (now - self.last_refill) * self.budget)
+        self.last_refill = now
+        if self.in_flight and now - self.last_ack > max(ACK_TIMEOUT, 4 * (self.srtt or 0)):
+            self.decrease(now, 0.5)
+            self.last_ack = now
+        return now >= self.next_send and self.tokens > 0
+
+    def sent(self, snapshot_id, nbytes, now):
+        """Charge a snapshot of nbytes sent at now"""
+        self.tokens -= nbytes  # may go negative: a large snapshot delays the next ones
+        self.next_send = max(self.next_send + 1.0 / self.rate, now)
+        self.in_flight.append(snapshot_id)
+        if len(self.in_flight) > 4 * ACK_WINDOW:
+            self.in_flight.popleft()
+
+    def on_ack(self, latest, bits, rtt, now):
+        """Account for an ack (latest, bits); rtt is the echoed sample in seconds or None"""
+        self.last_ack = now
+        if rtt is not None:
+            self.srtt = rtt if self.srtt is None else self.srtt + (rtt - self.srtt) / 8
+            self.min_rtt = rtt if self.min_rtt is None else min(self.min_rtt, rtt)
+
+        in_flight = self.in_flight
+        while in_flight and in_flight[0] <= latest:
+            lost = 0.0 if ack_contains(latest, bits, in_flight.popleft()) else 1.0
+            self.loss += (lost - self.loss) / 16
+
+        if self.srtt is not None and self.srtt > self.min_rtt + max(QUEUE_DELAY, self.min_rtt):
+            self.decrease(now, DELAY_DECREASE)
+        elif self.loss > LOSS_HIGH:
+            self.decrease(now, 1 - self.loss / 2)
+        elif self.loss < LOSS_LOW:
+            elapsed = now - self.last_adjust
+            self.rate = min(self.max_rate, self.rate + RATE_INCREASE * elapsed)
+            self.budget = min(self.max_budget, self.budget + BUDGET_INCREASE * self.max_budget * elapsed)
+        self.last_adjust = now
+
+    def decrease(self, now, factor):
+        """Multiplicative decrease, at most once per smoothed RTT"""
+        if now - self.last_decrease < (self.srtt or 0.1):
+            return
+        self.last_decrease = now
+        self.rate = max(self.min_rate, self.rate * factor)
+        self.budget = max(self.min_budget, self.budget * factor)
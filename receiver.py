@@ -0,0 +1,34 @@
+from protocol import HEADER_SIZE, HEADER_STRUCT, RECV_BUFFER
+
+
+class DatagramReceiver:
+    """Shared receive layer: one preallocated buffer per socket, no per-packet copies.
+
+    recvfrom_into() writes each datagram into the same bytearray, the header
+    is parsed in place with a precompiled Struct and the payload is handed
+    out as a memoryview of the buffer. The view is only valid until the next
+    receive(), so handlers must decode or copy whatever they keep.
+    """
+
+    def __init__(self, sock, size=RECV_BUFFER):
+        self.sock = sock
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.received = 0
+        self.malformed = 0
+
+    def receive(self):
+        """Wait for the next datagram and return (header, payload view, address)
+
+        Datagrams too short for a header are counted and skipped. Socket
+        errors (timeouts, BlockingIOError on non-blocking sockets) propagate.
+        """
+        view = self.view
+        nbytes, address = self.sock.recvfrom_into(view)
+        while nbytes < HEADER_SIZE:
+            self.malformed += 1
+            nbytes, address = self.sock.recvfrom_into(view)
+        self.received += 1
+        header = HEADER_STRUCT.unpack_from(view, 0)
+        end = HEADER_SIZE + header[6]
+        return header, view[HEADER_SIZE:end if end < nbytes else nbytes], address
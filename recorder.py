@@ -0,0 +1,104 @@
+import json
+import struct
+import time
+
+# Recording file: MAGIC, '!B I' = format version, length of the JSON config that
+# follows (what the server was started with), then records until the end of the file:
+# '!B d d H H' = kind, monotonic time, wall-clock time (both in seconds), source id,
+# length, followed by length bytes. Format version 1 records, '!B d H H', carry one
+# time that stood for both.
+MAGIC = b'GCRC'
+FORMAT_VERSION = 2
+FILE_HEADER = struct.Struct('!B I')
+RECORD_HEADER = struct.Struct('!B d d H H')
+RECORD_HEADER_V1 = struct.Struct('!B d H H')
+
+KIND_DATAGRAM = 1  # bytes = the datagram exactly as received from the source
+KIND_TICK = 2  # a broadcast tick ran at this time (no bytes)
+KIND_SOURCE = 3  # bytes = "host:port" of the next unused source id
+
+
+class InputRecorder:
+    """Append-only binary log of every inbound datagram and every broadcast tick.
+
+    Each record is written with a single write() on a buffered file, which
+    CPython serializes, so the receive and broadcast threads can both
+    record; the file is flushed once per tick. Sources are numbered the
+    first time they are seen, keeping a datagram record at 21 bytes plus
+    the datagram.
+    """
+
+    def __init__(self, path, config=None, clock=time.time, monotonic=time.monotonic):
+        self.path = path
+        self.clock = clock
+        self.monotonic = monotonic
+        self.sources = {}  # address -> source id
+        self.records = 0
+        self.file = open(path, 'wb')
+        header = json.dumps(config or {}).encode()
+        self.file.write(MAGIC + FILE_HEADER.pack(FORMAT_VERSION, len(header)) + header)
+
+    def datagram(self, data, address, now=None, wall=None):
+        """Record one inbound datagram; now and wall default to the recorder's clocks"""
+        source = self.sources.get(address)
+        if source is None:
+            source = self.sources[address] = len(self.sources) + 1
+            name = f"{address[0]}:{address[1]}".encode()
+            self.file.write(RECORD_HEADER.pack(KIND_SOURCE, 0.0, 0.0, source, len(name)) + name)
+        self.file.write(RECORD_HEADER.pack(KIND_DATAGRAM, self.monotonic() if now is None else now,
+                                           self.clock() if wall is None else wall, source, len(data)) + data)
+        self.records += 1
+
+    def tick(self, now=None, wall=None):
+        self.file.write(RECORD_HEADER.pack(KIND_TICK, self.monotonic() if now is None else now,
+                                           self.clock() if wall is None else wall, 0, 0))
+        self.records += 1
+        # A killed server loses at most the datagrams of its last tick
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+def read_recording(path):
+    """Return (config, records) where records yields (kind, monotonic time, wall time, address, data)
+
+    Source records are resolved into the address of each datagram record.
+    """
+    with open(path, 'rb') as f:
+        content = f.read()
+    if content[:4] != MAGIC:
+        raise ValueError(f"{path} is not a GridClash recording")
+    version, config_len = FILE_HEADER.unpack_from(content, 4)
+    if version not in (1, FORMAT_VERSION):
+        raise ValueError(f"unsupported recording format version {version}")
+    offset = 4 + FILE_HEADER.size
+    config = json.loads(content[offset:offset + config_len])
+    offset += config_len
+
+    def records():
+        sources = {}
+        position = offset
+        end = len(content)
+        header = RECORD_HEADER if version == FORMAT_VERSION else RECORD_HEADER_V1
+        while position + header.size <= end:
+            if version == FORMAT_VERSION:
+                kind, stamp, wall, source, length = header.unpack_from(content, position)
+            else:
+                kind, stamp, source, length = header.unpack_from(content, position)
+                wall = stamp
+            position += header.size
+            data = content[position:position + length]
+            position += length
+            if len(data) < length:
+                break  # torn last record of a server that was killed
+            if kind == KIND_SOURCE:
+                host, port = data.decode().rsplit(':', 1)
+                sources[source] = (host, int(port))
+            elif kind == KIND_DATAGRAM:
+                yield kind, stamp, wall, sources.get(source), data
+            elif kind == KIND_TICK:
+                yield kind, stamp, wall, None, b''
+
+    return config, records()
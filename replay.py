@@ -0,0 +1,159 @@
+import argparse
+import hashlib
+import itertools
+import sys
+import time
+from collections import Counter
+from gridclash_core import GridClashCore
+from metrics import latency_summary
+from protocol import HEADER_SIZE, MSG_SNAPSHOT, MSG_BINARY_DELTA, MSG_FRAGMENT
+from recorder import KIND_DATAGRAM, KIND_TICK, read_recording
+
+# Feeds a recording made with --record back into GridClashCore without sockets.
+# The core's two clocks return the recorded monotonic and wall times of each datagram
+# and tick, so the snapshots it builds are the ones the live server sent. Every datagram the core
+# sends goes into a SHA-256 digest with its destination: replays of the same
+# recording, in real time or at full speed, must print the same digest.
+# At --speed max the run is the offline throughput benchmark of the decode,
+# delta and encode pipeline.
+# Example: python server_headless.py --record game.rec
+#          python replay.py game.rec --speed max
+#          python replay.py game.rec --speed max --expect <digest of an earlier run>
+SNAPSHOT_TYPES = (MSG_SNAPSHOT, MSG_BINARY_DELTA, MSG_FRAGMENT)
+
+
+class CaptureEngine:
+    """Stands in for the network engine: digests every datagram instead of sending it"""
+
+    def __init__(self):
+        self.digest = hashlib.sha256()
+        self.datagrams = 0
+        self.snapshot_datagrams = 0
+        self.bytes = 0
+
+    def sendto(self, data, address):
+        self.digest.update(b'%s:%d %d ' % (address[0].encode(), address[1], len(data)))
+        self.digest.update(data)
+        self.datagrams += 1
+        self.bytes += len(data)
+        if data[5] in SNAPSHOT_TYPES:
+            self.snapshot_datagrams += 1
+
+    def stop(self):
+        pass
+
+
+class ReplayClock:
+    """One of the core's clocks during a replay: its recorded time of the current record"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def create_replay_core(config, clock, monotonic):
+    if config.get('server') == 'aser':
+        raise ValueError("recordings of Aser_GUI/server.py can only be inspected with --info")
+    core = GridClashCore(port=0, grid_size=config['grid_size'], frequency=config['frequency'],
+                         grid_engine=config['grid_engine'], compress=config['compress'],
+                         rate_control=config['rate_control'], min_rate=config['min_rate'],
+                         min_budget=config['min_budget'], max_budget=config['max_budget'], clock=clock,
+                         client_timeout=config.get('client_timeout', 0), monotonic=monotonic)
+    core.engine = CaptureEngine()
+    core.running = True
+    core.next_stats_log = float('inf')  # the summary lines would only fill the ring
+    return core
+
+
+def replay(path, speed=None):
+    """Replay a recording; speed None = as fast as possible, else a multiple of real time"""
+    config, records = read_recording(path)
+    clock = ReplayClock()
+    monotonic = ReplayClock()
+    # The core starts its liveness wheel at the time the live server did (recordings
+    # without it: the first record), so timers land in the same ticks
+    first_record = next(records, None)
+    if first_record is not None:
+        monotonic.now = config.get('started', first_record[1])
+        clock.now = first_record[2]
+        records = itertools.chain([first_record], records)
+    core = create_replay_core(config, clock, monotonic)
+    handle_datagram = core.handle_datagram
+    broadcast = core.broadcast_delta_snapshot
+    datagrams = ticks = 0
+    first = last = None
+    start = time.perf_counter()
+    for kind, stamp, wall, address, data in records:
+        if first is None:
+            first = stamp
+        last = stamp
+        if speed is not None:
+            delay = (stamp - first) / speed - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+        monotonic.now = stamp
+        clock.now = wall
+        if kind == KIND_DATAGRAM:
+            handle_datagram(data, address)
+            datagrams += 1
+        elif kind == KIND_TICK:
+            broadcast()
+            ticks += 1
+    elapsed = time.perf_counter() - start
+    recorded = (last - first) if first is not None else 0.0
+    return core, datagrams, ticks, recorded, elapsed
+
+
+def print_info(path):
+    config, records = read_recording(path)
+    types = Counter()
+    sources = set()
+    ticks = 0
+    first = last = None
+    for kind, stamp, _, address, data in records:
+        first = stamp if first is None else first
+        last = stamp
+        if kind == KIND_DATAGRAM:
+            types[data[5] if len(data) >= HEADER_SIZE else 'short'] += 1
+            sources.add(address)
+        elif kind == KIND_TICK:
+            ticks += 1
+    print(f"{path}: {config}")
+    print(f"  {sum(types.values())} datagrams from {len(sources)} sources, {ticks} ticks, "
+          f"{(last - first) if first is not None else 0:.1f} s")
+    print("  by msg_type: " + ", ".join(f"{msg_type}: {count}" for msg_type, count in sorted(types.items(), key=str)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a GridClash input recording without sockets")
+    parser.add_argument('recording')
+    parser.add_argument('--speed', default='1',
+                        help="'max' = as fast as possible, or a multiple of real time (default 1)")
+    parser.add_argument('--info', action='store_true', help="only summarize the recording")
+    parser.add_argument('--expect', metavar='DIGEST', help="exit with status 1 unless the digest matches")
+    args = parser.parse_args()
+
+    try:
+        if args.info:
+            print_info(args.recording)
+            sys.exit(0)
+        speed = None if args.speed == 'max' else float(args.speed)
+        core, datagrams, ticks, recorded, elapsed = replay(args.recording, speed)
+    except ValueError as e:
+        parser.error(str(e))
+
+    engine = core.engine
+    print(f"Replayed {datagrams} datagrams and {ticks} ticks ({recorded:.1f} s recorded) in {elapsed:.2f} s"
+          f" = {recorded / elapsed if elapsed else 0:.1f}x real time")
+    print(f"  throughput: {datagrams / elapsed if elapsed else 0:.0f} datagrams/s in, "
+          f"{ticks / elapsed if elapsed else 0:.0f} ticks/s, {core.tick_hist.sum * 1000 / max(ticks, 1):.2f} ms per tick, "
+          f"{latency_summary('tick', core.tick_hist)}")
+    print(f"  sent: {engine.datagrams} datagrams ({engine.snapshot_datagrams} snapshot), {engine.bytes} bytes, "
+          f"{len(core.clients)} clients, last snapshot {core.snapshot_id}")
+    digest = engine.digest.hexdigest()
+    print(f"  digest: {digest}")
+    if args.expect and args.expect != digest:
+        print(f"MISMATCH: expected {args.expect}")
+        sys.exit(1)
@@ -0,0 +1,61 @@
+import collections
+import sys
+import threading
+import time
+
+
+class RingLogger:
+    """Non-blocking logger for the network hot path.
+
+    log() only appends to a bounded ring buffer; a background thread
+    formats the entries and hands them to the sinks. When the writer
+    falls behind, the oldest entries are dropped and counted instead of
+    slowing the caller down.
+    """
+
+    def __init__(self, capacity=4096, flush_interval=0.1):
+        self.ring = collections.deque(maxlen=capacity)
+        self.flush_interval = flush_interval
+        self.sinks = []
+        self.dropped = 0
+        self.running = False
+        self.thread = None
+
+    def add_sink(self, sink):
+        """Register a callable receiving each formatted line"""
+        self.sinks.append(sink)
+
+    def log(self, message):
+        if len(self.ring) == self.ring.maxlen:
+            self.dropped += 1
+        self.ring.append((time.time(), message))
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.drain_loop, daemon=True)
+        self.thread.start()
+
+    def drain_loop(self):
+        while self.running:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        ring = self.ring
+        while ring:
+            try:
+                stamp, message = ring.popleft()
+            except IndexError:
+                break
+            line = f"[{time.strftime('%H:%M:%S', time.localtime(stamp))}] {message}"
+            for sink in self.sinks:
+                sink(line)
+
+    def stop(self):
+        self.running = False
+        self.flush()
+
+
+def stdout_sink(line):
+    sys.stdout.write(line + "\n")
+    sys.stdout.flush()
@@ -1,39 +1,27 @@
-import socket
-import time
-import struct
+import argparse
+import queue
 import tkinter as tk
 from tkinter import ttk
-import threading
+from gridclash_core import CoreObserver, add_server_arguments, create_core
 
-serverPort = 12000
-HEADER_FORMAT = '!4s B B I I Q H'
-HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
-
-class GridClashServer:
-    def __init__(self, root):
+class GridClashServer(CoreObserver):
+    """Tk window observing a GridClashCore; redraws on its own timer, off the packet path"""
+    
+    def __init__(self, root, core):
         self.root = root
         self.root.title("GridClash - Server")
         self.root.geometry("900x800")
         self.root.configure(bg="#1a1a2e")
         
-        self.serverSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.serverSocket.bind(('', serverPort))
-        
-        self.clients = {}
-        self.snapshot_id = 0
-        self.sequence_number = 0
-        self.grid_state = {}  # cell_id -> player_id
-        self.grid_size = 10
-        self.next_player_id = 1
+        self.core = core
+        self.grid_size = core.grid_size
+        self.broadcast_frequency = core.broadcast_frequency
         self.running = True
         
-        # Delta encoding: track changes since last snapshot
-        self.snapshot_history = {}  # snapshot_id -> grid_state
-        self.client_last_ack = {}  # client_addr -> last_acknowledged_snapshot_id
-        
-        # Broadcast frequency (Hz)
-        self.broadcast_frequency = 20  # 20 Hz
-        self.broadcast_interval = 1.0 / self.broadcast_frequency
+        # Set by observer callbacks on the network thread, consumed by refresh()
+        self.grid_dirty = False
+        self.stats_dirty = False
+        self.log_lines = queue.SimpleQueue()
         
         # Player colors (1-4)
         self.colors = {
@@ -46,17 +34,9 @@ class GridClashServer:
         
         self.setup_ui()
         
-        # Start server thread
-        self.server_thread = threading.Thread(target=self.server_loop, daemon=True)
-        self.server_thread.start()
-        
-        # Start broadcast thread
-        self.broadcast_thread = threading.Thread(target=self.broadcast_loop, daemon=True)
-        self.broadcast_thread.start()
-        
-        self.log(f"Server started on port {serverPort}")
-        self.log(f"Broadcast frequency: {self.broadcast_frequency} Hz")
-        self.log("Delta encoding: ENABLED")
+        core.add_observer(self)
+        core.logger.add_sink(self.log_lines.put)
+        self.refresh()
     
     def setup_ui(self):
         # Title
@@ -83,6 +63,10 @@ class GridClashServer:
                                        font=("Arial", 12), bg="#16213e", fg="#ffffff")
         self.frequency_label.grid(row=0, column=2, padx=20)
         
+        self.cache_label = tk.Label(stats_inner, text="Delta cache: 0 hits / 0 misses",
+                                   font=("Arial", 12), bg="#16213e", fg="#ffffff")
+        self.cache_label.grid(row=1, column=0, columnspan=3, pady=(5, 0))
+        
         # Grid display
         grid_label = tk.Label(self.root, text="Game Grid (Delta Encoding)", 
                             font=("Arial", 14, "bold"),
@@ -116,158 +100,68 @@ class GridClashServer:
         self.log_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.config(command=self.log_text.yview)
     
-    def server_loop(self):
-        while self.running:
-            try:
-                self.serverSocket.settimeout(0.1)
-                data, clientAddress = self.serverSocket.recvfrom(2048)
-                
-                header = struct.unpack(HEADER_FORMAT, data[:HEADER_SIZE])
-                protocol_id, version, msg_type, snap_id, seq, timestamp, payload_len = header
-                
-                if msg_type == 0:  # INIT
-                    player_id = ((self.next_player_id - 1) % 4) + 1
-                    self.clients[clientAddress] = {
-                        'seq': 0,
-                        'last_snapshot': 0,
-                        'player_id': player_id
-                    }
-                    self.client_last_ack[clientAddress] = 0
-                    self.next_player_id += 1
-                    
-                    self.root.after(0, self.log, f"Player {player_id} connected from {clientAddress}")
-                    self.root.after(0, self.update_client_count)
-                    
-                    # Send ACK with player ID
-                    ack_payload = f"PLAYER:{player_id}".encode()
-                    response = struct.pack(HEADER_FORMAT, b'GCLP', 1, 2, 0, 0,
-                                         int(time.time() * 1000), len(ack_payload))
-                    self.serverSocket.sendto(response + ack_payload, clientAddress)
-                
-                elif msg_type == 1:  # DATA (cell acquisition)
-                    payload = data[HEADER_SIZE:HEADER_SIZE + payload_len].decode()
-                    
-                    # Extract last acknowledged snapshot from payload
-                    if 'ACK_SNAP:' in payload:
-                        ack_snap = int(payload.split('ACK_SNAP:')[1])
-                        self.client_last_ack[clientAddress] = ack_snap
-                    
-                    if 'ACQUIRE' in payload:
-                        parts = payload.split()
-                        cell_id = parts[1]
-                        player_id = int(parts[2])
-                        
-                        # Update grid state
-                        self.grid_state[cell_id] = player_id
-                        
-                        self.root.after(0, self.log, 
-                                      f"Player {player_id} acquired cell {cell_id} [Seq: {seq}]")
-                        self.root.after(0, self.update_grid_display)
-                
-                elif msg_type == 4:  # ACK (snapshot acknowledgment)
-                    payload = data[HEADER_SIZE:HEADER_SIZE + payload_len].decode()
-                    if 'ACK' in payload:
-                        ack_snapshot_id = int(payload.split()[1])
-                        self.client_last_ack[clientAddress] = ack_snapshot_id
-                        
-            except socket.timeout:
-                continue
-            except Exception as e:
-                if self.running:
-                    self.root.after(0, self.log, f"Error: {e}")
+    def client_connected(self, client_addr, player_id):
+        self.stats_dirty = True
     
-    def broadcast_loop(self):
-        """Broadcast state snapshots at configured frequency"""
-        while self.running:
-            time.sleep(self.broadcast_interval)
-            self.broadcast_delta_snapshot()
+    def client_disconnected(self, client_addr, player_id):
+        self.stats_dirty = True
     
-    def broadcast_delta_snapshot(self):
-        """Broadcast delta-encoded snapshot to all clients"""
-        if not self.clients:
-            return
-        
-        self.snapshot_id += 1
-        self.sequence_number += 1
-        
-        # Save current state in history
-        self.snapshot_history[self.snapshot_id] = self.grid_state.copy()
-        
-        # Clean old history (keep last 100 snapshots)
-        if len(self.snapshot_history) > 100:
-            oldest = min(self.snapshot_history.keys())
-            del self.snapshot_history[oldest]
-        
-        # Send delta updates to each client
-        for client_addr in list(self.clients.keys()):
-            try:
-                last_ack = self.client_last_ack.get(client_addr, 0)
-                
-                # Compute delta: changes since last acknowledged snapshot
-                delta_changes = self.compute_delta(last_ack)
-                
-                # Build delta snapshot data
-                snapshot_parts = []
-                for cell_id, owner in delta_changes.items():
-                    snapshot_parts.append(f"DELTA CELL {cell_id} {owner}")
-                
-                if not snapshot_parts:
-                    # No changes, send empty delta
-                    snapshot_data = "NO_CHANGES".encode()
-                else:
-                    snapshot_data = " | ".join(snapshot_parts).encode()
-                
-                response = struct.pack(HEADER_FORMAT, b'GCLP', 1, 3, 
-                                     self.snapshot_id,
-                                     self.sequence_number,
-                                     int(time.time() * 1000), 
-                                     len(snapshot_data))
-                self.serverSocket.sendto(response + snapshot_data, client_addr)
-                
-            except Exception as e:
-                self.root.after(0, self.log, f"Broadcast error to {client_addr}: {e}")
-        
-        self.root.after(0, self.update_snapshot_label)
+    def grid_changed(self):
+        self.grid_dirty = True
     
-    def compute_delta(self, last_snapshot_id):
-        """Compute changes since last acknowledged snapshot"""
-        if last_snapshot_id == 0 or last_snapshot_id not in self.snapshot_history:
-            # Send full state if no history or first snapshot
-            return self.grid_state.copy()
-        
-        last_state = self.snapshot_history[last_snapshot_id]
-        delta = {}
-        
-        # Find changed cells
-        for cell_id, owner in self.grid_state.items():
-            if cell_id not in last_state or last_state[cell_id] != owner:
-                delta[cell_id] = owner
-        
-        return delta
+    def snapshot_broadcast(self, snapshot_id):
+        self.stats_dirty = True
+    
+    def refresh(self):
+        """Apply whatever changed in the core since the last frame"""
+        if self.grid_dirty:
+            self.grid_dirty = False
+            self.update_grid_display()
+        if self.stats_dirty:
+            self.stats_dirty = False
+            self.update_client_count()
+            self.update_snapshot_label()
+            self.update_frequency_label()
+        while not self.log_lines.empty():
+            self.log(self.log_lines.get())
+        
+        if self.running:
+            self.root.after(100, self.refresh)
     
     def update_grid_display(self):
-        for cell_id, owner in self.grid_state.items():
-            row, col = map(int, cell_id.split('_'))
+        for index, owner in list(self.core.grid.items()):
+            row, col = divmod(index, self.grid_size)
             if (row, col) in self.grid_cells:
                 self.grid_cells[(row, col)].config(bg=self.colors[owner])
     
     def update_client_count(self):
-        self.clients_label.config(text=f"Connected Players: {len(self.clients)}")
+        self.clients_label.config(text=f"Connected Players: {len(self.core.clients)}")
     
     def update_snapshot_label(self):
-        self.snapshot_label.config(text=f"Snapshot ID: {self.snapshot_id}")
+        self.snapshot_label.config(text=f"Snapshot ID: {self.core.snapshot_id}")
+        stats = self.core.delta_cache.stats()
+        self.cache_label.config(text=f"Delta cache: {stats['hits']} hits / {stats['misses']} misses")
+    
+    def update_frequency_label(self):
+        stats = self.core.scheduler.stats()
+        self.frequency_label.config(
+            text=f"Frequency: {stats['actual_hz']:.1f}/{self.broadcast_frequency:g} Hz "
+                 f"(p99 {stats['p99_ms']:.1f} ms, overruns {stats['overruns']})")
     
-    def log(self, message):
-        self.log_text.insert(tk.END, f"[{time.strftime('%H:%M:%S')}] {message}\n")
+    def log(self, line):
+        self.log_text.insert(tk.END, f"{line}\n")
         self.log_text.see(tk.END)
     
     def on_closing(self):
         self.running = False
-        self.serverSocket.close()
+        self.core.stop()
         self.root.destroy()
 
 if __name__ == "__main__":
+    parser = add_server_arguments(argparse.ArgumentParser(description="GridClash server with GUI"))
+    core = create_core(parser.parse_args())
     root = tk.Tk()
-    server = GridClashServer(root)
+    server = GridClashServer(root, core)
+    core.start()
     root.protocol("WM_DELETE_WINDOW", server.on_closing)
     root.mainloop()
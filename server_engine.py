@@ -0,0 +1,198 @@
+import asyncio
+import socket
+import threading
+import time
+from receiver import DatagramReceiver
+
+DRAIN_BATCH = 64  # datagrams handled per readiness callback before the loop gets a turn
+
+
+def run_tick(server, scheduler):
+    """Run one scheduled broadcast; a tick that raises is logged and the next one still runs"""
+    try:
+        scheduler.tick(server.broadcast_delta_snapshot)
+    except Exception as e:
+        server.log(f"Broadcast tick failed: {e!r}")
+
+
+class ThreadedServerEngine:
+    """The original engine: a polling receive thread plus a broadcast thread.
+
+    Kept for comparison with AsyncServerEngine; both threads call into the
+    server without any locking.
+    """
+
+    def __init__(self, server, port, reuse_port=False):
+        self.server = server
+        self.port = port
+        self.reuse_port = reuse_port
+        self.running = False
+        self.sock = None
+
+    def start(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if self.reuse_port:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.sock.bind(('', self.port))
+        self.sock.settimeout(0.1)
+        self.running = True
+        self.receive_thread = threading.Thread(target=self.receive_loop, daemon=True)
+        self.receive_thread.start()
+        threading.Thread(target=self.broadcast_loop, daemon=True).start()
+
+    def run(self):
+        """Start both threads and block until stop() is called"""
+        self.start()
+        while self.receive_thread.is_alive():
+            self.receive_thread.join(0.5)
+
+    def receive_loop(self):
+        receiver = DatagramReceiver(self.sock)
+        while self.running:
+            try:
+                header, payload, address = receiver.receive()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.server.handle_packet(header, payload, address)
+
+    def broadcast_loop(self):
+        """Broadcast state snapshots at configured frequency"""
+        scheduler = self.server.scheduler
+        scheduler.start()
+        while self.running:
+            time.sleep(scheduler.delay())
+            run_tick(self.server, scheduler)
+
+    def sendto(self, data, address):
+        self.sock.sendto(data, address)
+
+    def stop(self):
+        self.running = False
+        self.sock.close()
+
+
+class _ServerProtocol(asyncio.DatagramProtocol):
+    """Fallback for event loops without add_reader (the Windows proactor loop)"""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def connection_made(self, transport):
+        self.engine.transport = transport
+
+    def datagram_received(self, data, address):
+        self.engine.server.handle_datagram(data, address)
+
+
+class AsyncServerEngine:
+    """Single event loop engine: datagram handling and the broadcast tick share one thread.
+
+    Datagrams are dispatched the moment they arrive, with no receive
+    timeout to poll, and because the broadcast tick runs on the same loop
+    the server state is never touched by two threads at once. Call run()
+    to host the loop in the current thread (headless) or start() to run
+    it in a background thread next to a Tk main loop.
+
+    The socket is read directly from a readiness callback through a
+    DatagramReceiver, so datagrams are not copied into new bytes objects.
+    """
+
+    def __init__(self, server, port, reuse_port=False):
+        self.server = server
+        self.port = port
+        self.reuse_port = reuse_port
+        self.loop = None
+        self.transport = None
+        self.sock = None
+        self.receiver = None
+        self.thread = None
+        self.ready = threading.Event()
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if self.reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(('0.0.0.0', self.port))
+        sock.setblocking(False)
+        try:
+            self.loop.add_reader(sock.fileno(), self.drain)
+            self.sock = sock
+            self.receiver = DatagramReceiver(sock)
+        except NotImplementedError:
+            await self.loop.create_datagram_endpoint(lambda: _ServerProtocol(self), sock=sock)
+        self.ready.set()
+        scheduler = self.server.scheduler
+        scheduler.start()
+        try:
+            while True:
+                await asyncio.sleep(scheduler.delay())
+                run_tick(self.server, scheduler)
+        finally:
+            if self.sock is not None:
+                self.loop.remove_reader(self.sock.fileno())
+                self.sock.close()
+            else:
+                self.transport.close()
+
+    def drain(self):
+        """Handle the datagrams waiting on the socket"""
+        receiver = self.receiver
+        handle_packet = self.server.handle_packet
+        for _ in range(DRAIN_BATCH):
+            try:
+                header, payload, address = receiver.receive()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                # e.g. an ICMP error reported for an earlier send; keep serving
+                continue
+            handle_packet(header, payload, address)
+
+    def run(self):
+        """Run the engine in the calling thread until stop() is called"""
+        try:
+            asyncio.run(self.serve())
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.ready.set()
+
+    def start(self):
+        """Run the engine in a daemon thread and wait until the socket is bound"""
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        if self.sock is None and self.transport is None:
+            raise OSError(f"could not bind UDP port {self.port}")
+
+    def sendto(self, data, address):
+        if self.sock is None:
+            self.transport.sendto(data, address)
+            return
+        try:
+            self.sock.sendto(data, address)
+        except (BlockingIOError, InterruptedError):
+            # Socket send buffer full: drop, like the network would
+            pass
+
+    def stop(self):
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._cancel)
+
+    def _cancel(self):
+        for task in asyncio.all_tasks(self.loop):
+            task.cancel()
+
+
+def create_engine(server, port, engine='asyncio', reuse_port=False):
+    """Create the network engine for the requested type ('asyncio' or 'threaded')
+
+    With reuse_port several processes can bind the same UDP port (SO_REUSEPORT);
+    the kernel then keeps each client address on one of them.
+    """
+    if engine == 'threaded':
+        return ThreadedServerEngine(server, port, reuse_port)
+    return AsyncServerEngine(server, port, reuse_port)
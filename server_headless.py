@@ -0,0 +1,19 @@
+import argparse
+from gridclash_core import add_server_arguments, create_core
+from ring_logger import stdout_sink
+
+# Dedicated server entry point for machines without a display: no tkinter is imported.
+# Example: python server_headless.py --port 12000 --grid-size 100 --frequency 20
+
+if __name__ == "__main__":
+    parser = add_server_arguments(argparse.ArgumentParser(description="Headless GridClash server"))
+    parser.add_argument('--quiet', action='store_true', help="do not write the log to stdout")
+    args = parser.parse_args()
+
+    core = create_core(args)
+    if not args.quiet:
+        core.logger.add_sink(stdout_sink)
+    try:
+        core.run()
+    except KeyboardInterrupt:
+        pass
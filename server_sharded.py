@@ -0,0 +1,224 @@
+import argparse
+import multiprocessing as mp
+import queue
+import signal
+import socket
+import struct
+import sys
+import time
+from collections import deque
+from multiprocessing import shared_memory
+from gridclash_core import GridClashCore, add_server_arguments
+from ring_logger import stdout_sink
+from tick_scheduler import TickScheduler
+
+# Multi-process server: N worker processes bind the same UDP port with SO_REUSEPORT and
+# each serves the clients the kernel hashes to it. The authoritative grid lives in one
+# shared memory block written only by the main process, which applies the claims the
+# workers forward and publishes the grid once per tick under a sequence lock.
+# Example: python server_sharded.py --workers 4 --port 12000 --frequency 20
+
+# Shared block layout: '=Q I' = publish sequence (odd while a publish is in progress),
+# snapshot_id; then one '=I' per worker = number of the last claim message from that
+# worker the grid includes; then grid_size * grid_size uint8 owners (0 = empty)
+SHM_HEADER_FORMAT = '=QI'
+SHM_HEADER_SIZE = struct.calcsize(SHM_HEADER_FORMAT)
+APPLIED_SIZE = 4
+DIFF_CHUNK = 256  # bytes compared at once when looking for changed cells
+
+
+class SharedGridWriter:
+    """Single writer of the shared grid: applies forwarded claims and publishes each tick"""
+
+    def __init__(self, grid_size, workers):
+        self.cell_count = grid_size * grid_size
+        self.cells_offset = SHM_HEADER_SIZE + workers * APPLIED_SIZE
+        size = self.cells_offset + self.cell_count
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.shm.buf[:size] = bytes(size)
+        # (worker index, message number, [(cell index, player_id), ...]), one per packet;
+        # each worker numbers its messages 1, 2, ... and the queue keeps them in order
+        self.claims = mp.Queue()
+        self.applied = [0] * workers  # last message number applied, per worker
+        self.sequence = 0
+        self.snapshot_id = 0
+
+    def publish(self):
+        """Apply the claims received since the last tick and publish a new snapshot id"""
+        claims = []
+        applied = self.applied
+        try:
+            while True:
+                worker_index, message, message_claims = self.claims.get_nowait()
+                claims.extend(message_claims)
+                applied[worker_index] = message
+        except queue.Empty:
+            pass
+
+        buf = self.shm.buf
+        cells_offset = self.cells_offset
+        self.sequence += 1
+        struct.pack_into('=Q', buf, 0, self.sequence)
+        for index, player_id in claims:
+            if 0 <= index < self.cell_count:
+                buf[cells_offset + index] = player_id
+        self.snapshot_id += 1
+        struct.pack_into('=I', buf, 8, self.snapshot_id)
+        struct.pack_into(f'={len(applied)}I', buf, SHM_HEADER_SIZE, *applied)
+        self.sequence += 1
+        struct.pack_into('=Q', buf, 0, self.sequence)
+
+    def run(self, frequency):
+        scheduler = TickScheduler(frequency)
+        scheduler.start()
+        while True:
+            time.sleep(scheduler.delay())
+            scheduler.tick(self.publish)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+class SharedGridReader:
+    """Consistent reads of the shared grid without locks (retries while a publish is in progress)"""
+
+    def __init__(self, name, grid_size, workers, worker_index):
+        self.cell_count = grid_size * grid_size
+        self.cells_offset = SHM_HEADER_SIZE + workers * APPLIED_SIZE
+        self.applied_offset = SHM_HEADER_SIZE + worker_index * APPLIED_SIZE
+        self.shm = shared_memory.SharedMemory(name=name)
+        self.cells = bytes(self.cell_count)  # last copy read, used to find changes
+
+    def read(self):
+        """Return (snapshot_id, last of this worker's claim messages included, cells)"""
+        buf = self.shm.buf
+        end = self.cells_offset + self.cell_count
+        while True:
+            sequence, snapshot_id = struct.unpack_from(SHM_HEADER_FORMAT, buf, 0)
+            if sequence & 1:
+                continue
+            applied, = struct.unpack_from('=I', buf, self.applied_offset)
+            cells = bytes(buf[self.cells_offset:end])
+            if struct.unpack_from('=Q', buf, 0)[0] == sequence:
+                return snapshot_id, applied, cells
+
+    def changed_cells(self, cells):
+        """Indices whose owner differs from the previous read; unchanged chunks are skipped in C"""
+        old = self.cells
+        self.cells = cells
+        if old == cells:
+            return []
+        changed = []
+        for start in range(0, self.cell_count, DIFF_CHUNK):
+            end = start + DIFF_CHUNK
+            if old[start:end] != cells[start:end]:
+                changed.extend(index for index in range(start, min(end, self.cell_count))
+                               if old[index] != cells[index])
+        return changed
+
+
+class ShardWorker(GridClashCore):
+    """GridClashCore serving one shard of the clients from the shared grid"""
+
+    def __init__(self, args, shm_name, claims, player_counter, worker_index):
+        # One metrics endpoint per worker: --metrics-port, --metrics-port + 1, ...
+        super().__init__(port=args.port, grid_size=args.grid_size, frequency=args.frequency,
+                         engine=args.engine, grid_engine=args.grid_engine,
+                         catch_up=args.catch_up, reuse_port=True, compress=args.compress,
+                         rate_control=args.rate_control, min_rate=args.min_rate,
+                         min_budget=args.min_budget, max_budget=args.max_budget,
+                         metrics_port=args.metrics_port + worker_index if args.metrics_port else 0,
+                         client_timeout=args.client_timeout)
+        self.reader = SharedGridReader(shm_name, args.grid_size, args.workers, worker_index)
+        self.claims = claims
+        self.player_counter = player_counter
+        self.worker_index = worker_index
+        self.sent_messages = 0
+        # (message number, client, input seq) of forwarded claims the mirrored grid lacks yet
+        self.unconfirmed = deque()
+
+    def apply_claim(self, index, player_id):
+        # Only the writer process changes the grid
+        self.sent_messages += 1
+        self.claims.put((self.worker_index, self.sent_messages, [(index, player_id)]))
+
+    def apply_claims(self, indices, player_id):
+        # One queue message for the whole batch
+        self.sent_messages += 1
+        self.claims.put((self.worker_index, self.sent_messages, [(index, player_id) for index in indices]))
+
+    def input_applied(self, client, seq):
+        # Forwarded, not applied: version 3 clients hear of it once the writer has published it
+        self.unconfirmed.append((self.sent_messages, client, seq))
+
+    def allocate_player_id(self):
+        with self.player_counter.get_lock():
+            number = self.player_counter.value
+            self.player_counter.value += 1
+        return ((number - 1) % 4) + 1
+
+    def advance_snapshot(self):
+        """Mirror the latest published grid into the local store under a new snapshot id
+
+        Ids are worker-local: each tick commits its own id even when the
+        writer has published nothing new, so a header id always names exactly
+        one payload. A client only ever talks to one worker (SO_REUSEPORT
+        pins its address), so the ids it acks are always this worker's.
+        Input seqs are confirmed from the same read as the cells, so every
+        seq reported with this snapshot has its claims in it.
+        """
+        _, applied, cells = self.reader.read()
+        unconfirmed = self.unconfirmed
+        while unconfirmed and unconfirmed[0][0] <= applied:
+            _, client, seq = unconfirmed.popleft()
+            client['last_input_seq'] = max(client['last_input_seq'], seq)
+        input_seqs = {addr: client['last_input_seq'] for addr, client in list(self.clients.items())}
+        for index in self.reader.changed_cells(cells):
+            self.grid.set(index, cells[index])
+        self.snapshot_id += 1
+        self.sequence_number += 1
+        self.grid.commit(self.snapshot_id)
+        return input_seqs
+
+
+def run_worker(args, shm_name, claims, player_counter, worker_index):
+    worker = ShardWorker(args, shm_name, claims, player_counter, worker_index)
+    if not args.quiet:
+        worker.logger.add_sink(lambda line: stdout_sink(f"[worker {worker_index}] {line}"))
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    parser = add_server_arguments(argparse.ArgumentParser(description="Multi-process GridClash server"))
+    parser.add_argument('--workers', type=int, default=mp.cpu_count())
+    parser.add_argument('--quiet', action='store_true', help="do not write the log to stdout")
+    args = parser.parse_args()
+    if not hasattr(socket, 'SO_REUSEPORT'):
+        parser.error("SO_REUSEPORT is not available on this platform")
+    if args.record:
+        # Each worker sees only its own clients' datagrams but they all write one shared grid
+        parser.error("--record needs a single-process server (server_headless.py or server_Decode.py)")
+
+    writer = SharedGridWriter(args.grid_size, args.workers)
+    player_counter = mp.Value('i', 1)
+    workers = [mp.Process(target=run_worker, daemon=True,
+                          args=(args, writer.shm.name, writer.claims, player_counter, index))
+               for index in range(args.workers)]
+    for worker in workers:
+        worker.start()
+
+    # Turn SIGTERM into a normal exit so the workers are stopped and the block is unlinked
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        writer.run(args.frequency)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            worker.terminate()
+            worker.join()
+        writer.close()
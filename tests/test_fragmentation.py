@@ -0,0 +1,143 @@
+"""Tests of snapshot fragmentation: pack_datagrams at the MTU edge and the Reassembler."""
+import os
+import struct
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fragmentation import (FRAGMENT_HEADER_FORMAT, FRAGMENT_PAYLOAD, MAX_PAYLOAD, MTU, Reassembler,
+                           pack_datagrams)
+from protocol import HEADER_SIZE, HEADER_STRUCT, MSG_BINARY_DELTA, MSG_FRAGMENT, MSG_SNAPSHOT
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fragments(snapshot_id, payload, msg_type=MSG_BINARY_DELTA):
+    """The fragment payloads (header stripped) pack_datagrams sends for payload"""
+    datagrams = pack_datagrams(msg_type, snapshot_id, 1, 0, payload)
+    for datagram in datagrams:
+        assert datagram[5] == MSG_FRAGMENT
+    return [datagram[HEADER_SIZE:] for datagram in datagrams]
+
+
+def payload_of(size, seed=0):
+    return bytes((seed + i * 7) % 251 for i in range(size))
+
+
+class PackDatagramsTest(unittest.TestCase):
+
+    def test_exactly_mtu(self):
+        payload = payload_of(MAX_PAYLOAD)
+        datagrams = pack_datagrams(MSG_BINARY_DELTA, 5, 2, 1234, payload, version=3)
+        self.assertEqual(len(datagrams), 1)
+        self.assertEqual(len(datagrams[0]), MTU)
+        magic, version, msg_type, snapshot_id, seq, timestamp, length = HEADER_STRUCT.unpack_from(datagrams[0], 0)
+        self.assertEqual((magic, version, msg_type, snapshot_id, seq, timestamp, length),
+                         (b'GCLP', 3, MSG_BINARY_DELTA, 5, 2, 1234, MAX_PAYLOAD))
+        self.assertEqual(datagrams[0][HEADER_SIZE:], payload)
+
+    def test_mtu_plus_one(self):
+        payload = payload_of(MAX_PAYLOAD + 1)
+        datagrams = pack_datagrams(MSG_BINARY_DELTA, 5, 2, 1234, payload)
+        self.assertEqual(len(datagrams), 2)
+        reassembler = Reassembler()
+        results = []
+        for datagram in datagrams:
+            self.assertLessEqual(len(datagram), MTU)
+            header = HEADER_STRUCT.unpack_from(datagram, 0)
+            self.assertEqual(header[2], MSG_FRAGMENT)
+            self.assertEqual(header[6], len(datagram) - HEADER_SIZE)
+            results.append(reassembler.add(header[3], datagram[HEADER_SIZE:]))
+        self.assertEqual(results, [None, (MSG_BINARY_DELTA, payload)])
+
+    def test_fragment_sizes(self):
+        payload = payload_of(FRAGMENT_PAYLOAD * 3)
+        self.assertEqual([len(fragment) for fragment in fragments(1, payload)],
+                         [MTU - HEADER_SIZE] * 3)
+
+
+class ReassemblerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.reassembler = Reassembler(timeout=1.0, clock=self.clock)
+
+    def test_out_of_order(self):
+        payload = payload_of(FRAGMENT_PAYLOAD * 3 + 10)
+        parts = fragments(7, payload)
+        self.assertEqual(len(parts), 4)
+        for part in (parts[2], parts[0], parts[3]):
+            self.assertIsNone(self.reassembler.add(7, part))
+        self.assertEqual(self.reassembler.add(7, parts[1]), (MSG_BINARY_DELTA, payload))
+        self.assertEqual(self.reassembler.partial, {})
+        self.assertEqual(self.reassembler.completed, 1)
+
+    def test_duplicate_fragment(self):
+        payload = payload_of(FRAGMENT_PAYLOAD * 2 + 1)
+        parts = fragments(7, payload)
+        self.assertIsNone(self.reassembler.add(7, parts[0]))
+        self.assertIsNone(self.reassembler.add(7, parts[0]))  # counted once
+        self.assertIsNone(self.reassembler.add(7, parts[2]))
+        self.assertEqual(self.reassembler.add(7, parts[1]), (MSG_BINARY_DELTA, payload))
+        # A duplicate after completion does not start the snapshot again
+        self.assertIsNone(self.reassembler.add(7, parts[1]))
+        self.assertEqual(self.reassembler.partial, {})
+        self.assertEqual(self.reassembler.completed, 1)
+
+    def test_newer_snapshot_supersedes_incomplete(self):
+        old = fragments(7, payload_of(FRAGMENT_PAYLOAD * 2, seed=1))
+        new_payload = payload_of(FRAGMENT_PAYLOAD * 2, seed=2)
+        new = fragments(8, new_payload)
+        self.assertIsNone(self.reassembler.add(7, old[0]))
+        self.assertIsNone(self.reassembler.add(8, new[1]))
+        self.assertEqual(self.reassembler.add(8, new[0]), (MSG_BINARY_DELTA, new_payload))
+        self.assertEqual(self.reassembler.superseded, 1)
+        self.assertEqual(self.reassembler.partial, {})
+        # The rest of the older snapshot arrives too late to matter
+        self.assertIsNone(self.reassembler.add(7, old[1]))
+        self.assertEqual(self.reassembler.partial, {})
+
+    def test_timeout_purge(self):
+        parts = fragments(7, payload_of(FRAGMENT_PAYLOAD * 2))
+        self.assertIsNone(self.reassembler.add(7, parts[0]))
+        self.clock.now = 1.5
+        # Any later fragment runs the purge; 7 starts over from this fragment alone
+        self.assertIsNone(self.reassembler.add(7, parts[1]))
+        self.assertEqual(self.reassembler.timed_out, 1)
+        self.assertEqual(set(self.reassembler.partial[7][3]), {1})
+
+    def test_timeout_keeps_recent(self):
+        self.assertIsNone(self.reassembler.add(7, fragments(7, payload_of(FRAGMENT_PAYLOAD * 2))[0]))
+        self.clock.now = 0.9
+        self.assertIsNone(self.reassembler.add(9, fragments(9, payload_of(FRAGMENT_PAYLOAD * 2))[0]))
+        self.assertEqual(self.reassembler.timed_out, 0)
+        self.assertEqual(set(self.reassembler.partial), {7, 9})
+
+    def test_index_out_of_range_rejected(self):
+        chunk = payload_of(10)
+        self.assertIsNone(self.reassembler.add(7, struct.pack(FRAGMENT_HEADER_FORMAT, 2, 2, MSG_BINARY_DELTA) + chunk))
+        self.assertIsNone(self.reassembler.add(7, struct.pack(FRAGMENT_HEADER_FORMAT, 0, 0, MSG_BINARY_DELTA) + chunk))
+        self.assertEqual(self.reassembler.rejected, 2)
+        self.assertEqual(self.reassembler.partial, {})
+
+    def test_count_mismatch_rejected(self):
+        payload = payload_of(FRAGMENT_PAYLOAD * 2)
+        parts = fragments(7, payload)
+        self.assertIsNone(self.reassembler.add(7, parts[0]))
+        # Claims 7 has one fragment only: it would complete it with half the payload
+        self.assertIsNone(self.reassembler.add(7, struct.pack(FRAGMENT_HEADER_FORMAT, 0, 1, MSG_BINARY_DELTA)))
+        # Same index and count but another message type
+        self.assertIsNone(self.reassembler.add(7, struct.pack(FRAGMENT_HEADER_FORMAT, 1, 2, MSG_SNAPSHOT)))
+        self.assertEqual(self.reassembler.rejected, 2)
+        self.assertEqual(self.reassembler.add(7, parts[1]), (MSG_BINARY_DELTA, payload))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+"""Tests of the versioned grid stores: deltas from a baseline, the history floor, viewports."""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grid_store import VersionedGrid, create_grid
+from gridclash_core import GridClashCore
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+GRID_SIZE = 40
+
+
+def as_dict(state):
+    indices, owners = state
+    return {int(index): int(owner) for index, owner in zip(indices, owners)}
+
+
+class GridStoreTests:
+    """Shared by both engines; subclasses set engine"""
+
+    engine = None
+
+    def make_grid(self, history=100):
+        return create_grid(GRID_SIZE, self.engine, history=history)
+
+    def commit_versions(self, grid):
+        """Commit versions 1..4, each setting its own cells; return {version: {cell: owner}}"""
+        changes = {
+            1: {0: 1, 5: 2, 41: 3},
+            2: {5: 3, 100: 4},  # 5 changes again
+            3: {},  # a tick without claims
+            4: {41: 1, 1599: 2, 820: 4},
+        }
+        for version, cells in changes.items():
+            for index, owner in cells.items():
+                grid.set(index, owner)
+            grid.commit(version)
+        return changes
+
+    def test_changes_since_each_version(self):
+        grid = self.make_grid()
+        changes = self.commit_versions(grid)
+        final = as_dict(grid.full_state())
+        for baseline in range(1, 5):
+            changed = set()
+            for version in range(baseline + 1, 5):
+                changed.update(changes[version])
+            self.assertEqual(as_dict(grid.changes_since(baseline)), {index: final[index] for index in changed})
+
+    def test_full_state(self):
+        grid = self.make_grid()
+        self.commit_versions(grid)
+        self.assertEqual(as_dict(grid.full_state()), {0: 1, 5: 3, 41: 1, 100: 4, 1599: 2, 820: 4})
+
+    def test_unknown_baselines(self):
+        grid = self.make_grid()
+        self.commit_versions(grid)
+        self.assertIsNone(grid.changes_since(0))  # nothing acknowledged yet
+        self.assertIsNone(grid.changes_since(5))  # newer than the store
+
+    def test_baseline_older_than_history(self):
+        grid = self.make_grid(history=3)
+        for version in range(1, 11):
+            grid.set(version, 1)
+            grid.commit(version)
+        self.assertIsNone(grid.changes_since(2))
+        self.assertEqual(as_dict(grid.changes_since(9)), {10: 1})
+
+    def test_rect_excludes_cells_outside(self):
+        grid = self.make_grid()
+        grid.commit(1)
+        inside = [2 * GRID_SIZE + 3, 5 * GRID_SIZE + 10]  # (2, 3) and (5, 10)
+        outside = [1 * GRID_SIZE + 3, 2 * GRID_SIZE + 2, 6 * GRID_SIZE + 5, 3 * GRID_SIZE + 11, 39 * GRID_SIZE + 39]
+        for index in inside + outside:
+            grid.set(index, 2)
+        grid.commit(2)
+        rect = (2, 3, 4, 8)  # rows 2-5, cols 3-10
+        self.assertEqual(as_dict(grid.changes_since(1, rect)), {index: 2 for index in inside})
+        self.assertEqual(as_dict(grid.full_state(rect)), {index: 2 for index in inside})
+        self.assertEqual(as_dict(grid.changes_since(2, rect)), {})
+
+    def test_published_snapshot_is_stable(self):
+        grid = self.make_grid()
+        self.commit_versions(grid)
+        snapshot = grid.published
+        before = as_dict(snapshot.full_state())
+        grid.set(7, 4)
+        grid.commit(5)
+        self.assertEqual(as_dict(snapshot.full_state()), before)
+        self.assertEqual(snapshot.version, 4)
+        self.assertEqual(as_dict(grid.changes_since(4)), {7: 4})
+
+    def test_compute_delta_falls_back_to_full_state(self):
+        core = GridClashCore(port=0, grid_size=GRID_SIZE, grid_engine=self.engine, client_timeout=0)
+        core.grid = self.make_grid(history=2)
+        for version in range(1, 6):
+            core.grid.set(version, 3)
+            core.grid.commit(version)
+        indices, owners, full_state = core.compute_delta(1)
+        self.assertTrue(full_state)
+        self.assertEqual(as_dict((indices, owners)), {index: 3 for index in range(1, 6)})
+        indices, owners, full_state = core.compute_delta(4)
+        self.assertFalse(full_state)
+        self.assertEqual(as_dict((indices, owners)), {5: 3})
+
+
+class VersionedGridTest(GridStoreTests, unittest.TestCase):
+    engine = 'dict'
+
+    def test_change_log_bounded(self):
+        grid = VersionedGrid(GRID_SIZE, history=3)
+        for version in range(1, 11):
+            grid.set(version, 1)
+            grid.commit(version)
+        self.assertEqual([entry[0] for entry in grid.published.change_log], [8, 9, 10])
+        self.assertEqual(grid.published.floor, 7)
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class ArrayGridTest(GridStoreTests, unittest.TestCase):
+    engine = 'array'
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+"""Tests of the metrics registry: rendering while the game thread keeps counting."""
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import MetricsRegistry
+
+
+class ConcurrentScrapeTest(unittest.TestCase):
+
+    def test_render_while_counting(self):
+        registry = MetricsRegistry()
+        counter = registry.counter('test_packets_total', "Packets", 'msg_type')
+        histogram = registry.histogram('test_seconds', "Durations")
+        done = threading.Event()
+
+        def count():
+            # The first pass adds a label value per inc: the dict grows under the scrape
+            value = 0
+            while not done.is_set():
+                counter.inc(value % 1000)
+                histogram.observe((value % 100) / 1000)
+                value += 1
+
+        thread = threading.Thread(target=count)
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)  # switch threads mid-render, not once per 5 ms
+        thread.start()
+        try:
+            for _ in range(100):
+                lines = registry.render().splitlines()
+                buckets = [int(line.split()[-1]) for line in lines if line.startswith('test_seconds_bucket')]
+                count = int(next(line for line in lines if line.startswith('test_seconds_count')).split()[-1])
+                self.assertEqual(buckets, sorted(buckets))
+                self.assertEqual(buckets[-1], count)
+        finally:
+            done.set()
+            thread.join()
+            sys.setswitchinterval(interval)
+        self.assertEqual(counter.total(), histogram.count)
+
+
+if __name__ == "__main__":
+    unittest.main()
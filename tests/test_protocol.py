@@ -0,0 +1,285 @@
+"""Tests of the wire helpers: delta codec round trips, ack windows (python -m unittest discover tests)."""
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gridclash_core import GridClashCore
+from protocol import (ACK_MASK, ACK_WINDOW, FLAG_COMPRESSED, FLAG_FULL_STATE, HEADER_SIZE, HEADER_STRUCT,
+                      MAX_TEXT_SNAPSHOT, MSG_ACK_BITS, MSG_INPUT_BATCH, MSG_RESET, PROTOCOL_VERSION, ack_contains,
+                      encode_ack, encode_input_batch, encode_delta, decode_delta, encode_text_delta, merge_ack,
+                      text_full_state_size)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def random_delta(grid_size, count, seed=1):
+    rng = random.Random(seed)
+    indices = sorted(rng.sample(range(grid_size * grid_size), count))
+    owners = [rng.randint(1, 4) for _ in indices]
+    return indices, owners
+
+
+class DeltaRoundTripTest(unittest.TestCase):
+
+    def assertRoundTrip(self, indices, owners, grid_size, flags=0, compress=False):
+        payload = encode_delta(indices, owners, grid_size, flags, compress=compress)
+        decoded_size, decoded_flags, decoded_indices, decoded_owners = decode_delta(payload)
+        self.assertEqual(decoded_size, grid_size)
+        self.assertEqual(decoded_flags & ~FLAG_COMPRESSED, flags)
+        self.assertEqual(list(decoded_indices), [int(index) for index in indices])
+        self.assertEqual(list(decoded_owners), [int(owner) for owner in owners])
+        return decoded_flags
+
+    def test_empty(self):
+        for compress in (False, True):
+            flags = self.assertRoundTrip([], [], 10, compress=compress)
+            self.assertFalse(flags & FLAG_COMPRESSED)
+
+    def test_full_state_flag(self):
+        indices, owners = random_delta(10, 40)
+        for compress in (False, True):
+            self.assertTrue(self.assertRoundTrip(indices, owners, 10, FLAG_FULL_STATE, compress) & FLAG_FULL_STATE)
+
+    def test_uncompressed(self):
+        indices, owners = random_delta(100, 500)
+        self.assertFalse(self.assertRoundTrip(indices, owners, 100) & FLAG_COMPRESSED)
+
+    def test_compressed(self):
+        # Neighbouring cells with few owners: the gaps compress well
+        indices = list(range(1000, 3000, 3))
+        owners = [index % 4 + 1 for index in indices]
+        self.assertTrue(self.assertRoundTrip(indices, owners, 100, compress=True) & FLAG_COMPRESSED)
+
+    def test_compressed_unsorted(self):
+        # Gaps wrap mod 2**32 when an index is below the previous one
+        indices, owners = random_delta(100, 800, seed=2)
+        indices.reverse()
+        owners.reverse()
+        self.assertRoundTrip(indices, owners, 100, compress=True)
+
+    def test_large_indices(self):
+        grid_size = 65535
+        last = grid_size * grid_size - 1
+        indices = [0, 1, grid_size, last - grid_size, last - 1, last]
+        owners = [1, 2, 3, 4, 1, 2]
+        for compress in (False, True):
+            self.assertRoundTrip(indices, owners, grid_size, compress=compress)
+        # Enough of them to be compressed
+        indices = list(range(last - 2000, last + 1, 2))
+        owners = [1] * len(indices)
+        self.assertTrue(self.assertRoundTrip(indices, owners, grid_size, compress=True) & FLAG_COMPRESSED)
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_numpy_inputs(self):
+        for grid_size, count in ((10, 0), (10, 40), (1000, 5000), (65535, 300)):
+            indices, owners = random_delta(grid_size, count, seed=count)
+            array_indices = np.array(indices, dtype=np.int64)
+            array_owners = np.array(owners, dtype=np.uint8)
+            for flags in (0, FLAG_FULL_STATE):
+                for compress in (False, True):
+                    self.assertRoundTrip(array_indices, array_owners, grid_size, flags, compress)
+                    # Same bytes as the list path
+                    self.assertEqual(encode_delta(array_indices, array_owners, grid_size, flags, compress),
+                                     encode_delta(indices, owners, grid_size, flags, compress))
+
+
+def received(latest, bits):
+    """Every snapshot id the ack window reports"""
+    return {snapshot_id for snapshot_id in range(1, latest + 1) if ack_contains(latest, bits, snapshot_id)}
+
+
+class AckWindowTest(unittest.TestCase):
+
+    def test_newer_ack_shifts_window(self):
+        # 10 with 9 and 7 received, then 12 with 11: 10, 9 and 7 move two bits down
+        latest, bits = merge_ack(10, 0b101, 12, 0b1)
+        self.assertEqual(latest, 12)
+        self.assertEqual(received(latest, bits), {12, 11, 10, 9, 7})
+
+    def test_older_ack_folds_into_bits(self):
+        # A late ack never moves latest back; what it reports lands in the bits
+        latest, bits = merge_ack(12, 0b1, 10, 0b101)
+        self.assertEqual((latest, bits), merge_ack(10, 0b101, 12, 0b1))
+        self.assertEqual(received(latest, bits), {12, 11, 10, 9, 7})
+
+    def test_duplicate_ack(self):
+        latest, bits = merge_ack(20, 0b1101, 20, 0b1101)
+        self.assertEqual((latest, bits), (20, 0b1101))
+        self.assertEqual(merge_ack(latest, bits, 20, 0b1101), (latest, bits))
+        # The same latest with other bits is a union
+        self.assertEqual(merge_ack(20, 0b0101, 20, 0b1010), (20, 0b1111))
+
+    def test_first_ack(self):
+        self.assertEqual(merge_ack(0, 0, 5, 0b11), (5, 0b11))
+        self.assertEqual(merge_ack(5, 0b11, 0, 0), (5, 0b11))
+        self.assertFalse(ack_contains(0, 0, 0))
+
+    def test_window_edge(self):
+        # 32 back is the last bit of the window, 33 back falls out of it
+        latest, bits = merge_ack(100, 0, 100 + ACK_WINDOW)
+        self.assertEqual(bits, 1 << (ACK_WINDOW - 1))
+        self.assertTrue(ack_contains(latest, bits, 100))
+        latest, bits = merge_ack(100, 0, 101 + ACK_WINDOW)
+        self.assertEqual(bits, 0)
+        self.assertFalse(ack_contains(latest, bits, 100))
+
+    def test_gap_larger_than_window(self):
+        latest, bits = merge_ack(50, ACK_MASK, 50 + 1000, 0b1)
+        self.assertEqual((latest, bits), (1050, 0b1))
+        self.assertEqual(received(latest, bits), {1050, 1049})
+        # Nothing older than the window is reported, whatever the bits
+        self.assertFalse(ack_contains(1050, ACK_MASK, 1050 - ACK_WINDOW - 1))
+        self.assertFalse(ack_contains(1050, ACK_MASK, 1051))
+
+    def test_bits_stay_in_window(self):
+        latest, bits = 1, 0
+        for snapshot_id in range(2, 200, 3):
+            latest, bits = merge_ack(latest, bits, snapshot_id, ACK_MASK)
+            self.assertLessEqual(bits, ACK_MASK)
+        self.assertEqual(latest, 197)
+
+
+class AckFloorTest(unittest.TestCase):
+    """set_view discards acks of snapshots built for the previous view"""
+
+    def setUp(self):
+        self.core = GridClashCore(port=0, grid_size=40, client_timeout=0)
+        self.address = ('10.0.0.1', 20000)
+        self.core.add_client(self.address, 3)
+        self.core.snapshot_id = 10
+        self.core.record_ack(self.address, 9, 0b11)
+
+    def ack(self):
+        return self.core.client_last_ack[self.address], self.core.client_ack_bits[self.address]
+
+    def test_view_change_resets_acks(self):
+        self.assertEqual(self.ack(), (9, 0b11))
+        self.core.set_view(self.address, (0, 0, 10, 10))
+        self.assertEqual(self.ack(), (0, 0))
+        self.assertEqual(self.core.clients[self.address]['ack_floor'], 10)
+
+    def test_acks_up_to_floor_ignored(self):
+        self.core.set_view(self.address, (0, 0, 10, 10))
+        # Late acks of old-view snapshots, including the one sent as the view changed
+        self.core.record_ack(self.address, 10, ACK_MASK)
+        self.core.record_ack(self.address, 8)
+        self.assertEqual(self.ack(), (0, 0))
+        # The first snapshot of the new view is a baseline again; old ones in its bits are harmless
+        self.core.record_ack(self.address, 11, 0b111)
+        self.assertEqual(self.ack(), (11, 0b111))
+        self.core.record_ack(self.address, 9)
+        self.assertEqual(self.ack(), (11, 0b111))
+
+    def test_same_view_keeps_acks(self):
+        self.core.set_view(self.address, None)
+        self.assertEqual(self.ack(), (9, 0b11))
+
+
+class CaptureEngine:
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, data, address):
+        self.sent.append((data, address))
+
+
+class TextSnapshotSizeTest(unittest.TestCase):
+
+    def test_full_state_size(self):
+        for grid_size in (1, 9, 10, 11, 37, 100, 101):
+            indices = list(range(grid_size * grid_size))
+            payload = encode_text_delta(indices, [4] * len(indices), grid_size)
+            self.assertEqual(text_full_state_size(grid_size), len(payload))
+
+    def init(self, grid_size, version):
+        core = GridClashCore(port=0, grid_size=grid_size, client_timeout=0)
+        core.engine = CaptureEngine()
+        core.running = True
+        address = ('10.0.0.1', 20000)
+        core.handle_datagram(HEADER_STRUCT.pack(b'GCLP', version, 0, 0, 0, 0, 0), address)
+        (reply, _), = core.engine.sent
+        return core, address, reply[HEADER_SIZE:].decode()
+
+    def test_version_1_rejected_on_large_grid(self):
+        self.assertGreater(text_full_state_size(200), MAX_TEXT_SNAPSHOT)
+        core, address, reply = self.init(200, 1)
+        self.assertTrue(reply.startswith('REJECTED:'))
+        self.assertNotIn(address, core.clients)
+        # Binary clients fragment their snapshots: any grid size is fine
+        core, address, reply = self.init(200, 3)
+        self.assertTrue(reply.startswith('PLAYER:'))
+        self.assertIn(address, core.clients)
+
+    def test_version_1_accepted_on_small_grid(self):
+        self.assertLessEqual(text_full_state_size(50), MAX_TEXT_SNAPSHOT)
+        core, address, reply = self.init(50, 1)
+        self.assertTrue(reply.startswith('PLAYER:'))
+        # Its largest snapshot, the full state of a grid with every cell owned, goes out in one datagram
+        for index in range(50 * 50):
+            core.grid.set(index, 4)
+        core.engine.sent.clear()
+        core.broadcast_delta_snapshot()
+        (snapshot, _), = core.engine.sent
+        self.assertEqual(len(snapshot), HEADER_SIZE + text_full_state_size(50))
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class ResetTest(unittest.TestCase):
+    """A sender without a session is told to INIT again instead of being ignored"""
+
+    def setUp(self):
+        self.monotonic = FakeClock(100.0)
+        self.core = GridClashCore(port=0, grid_size=10, client_timeout=1.0, clock=FakeClock(5000.0),
+                                  monotonic=self.monotonic)
+        self.core.engine = CaptureEngine()
+        self.core.running = True
+        self.address = ('10.0.0.1', 20000)
+
+    def receive(self, msg_type, payload=b'', seq=0):
+        self.core.engine.sent.clear()
+        header = HEADER_STRUCT.pack(b'GCLP', PROTOCOL_VERSION, msg_type, 0, seq, 0, len(payload))
+        self.core.handle_datagram(header + payload, self.address)
+        return [data[5] for data, _ in self.core.engine.sent]
+
+    def test_evicted_client_is_reset(self):
+        self.assertEqual(self.receive(0), [2])
+        self.core.broadcast_delta_snapshot()
+        self.monotonic.now += 1.5
+        self.core.broadcast_delta_snapshot()
+        self.assertNotIn(self.address, self.core.clients)
+
+        self.assertEqual(self.receive(MSG_ACK_BITS, encode_ack(1, 0)), [MSG_RESET])
+        self.assertEqual(self.receive(MSG_INPUT_BATCH, encode_input_batch(1, 0, [5], [7]), seq=7), [MSG_RESET])
+        # Its claims are not applied without a session
+        self.core.advance_snapshot()
+        self.assertIsNone(self.core.grid.get(5))
+
+        # INIT starts a new session, which gets the full state
+        self.assertEqual(self.receive(0), [2])
+        self.assertEqual(self.receive(MSG_ACK_BITS, encode_ack(0, 0)), [])
+        self.assertIn(self.address, self.core.clients)
+
+    def test_keepalive_keeps_session(self):
+        self.receive(0)
+        for _ in range(10):
+            self.monotonic.now += 0.5
+            self.receive(MSG_ACK_BITS, encode_ack(0, 0))
+            self.core.broadcast_delta_snapshot()
+        self.assertIn(self.address, self.core.clients)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+"""Tests of the input recording format and of replaying it through the core."""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol import HEADER_STRUCT, PROTOCOL_VERSION, MSG_ACK_BITS, encode_ack
+from recorder import (FILE_HEADER, KIND_DATAGRAM, KIND_TICK, MAGIC, RECORD_HEADER_V1, InputRecorder,
+                      read_recording)
+from replay import replay
+
+
+class RecordingTest(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.rec')
+        os.close(handle)
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+    def test_round_trip_keeps_both_clocks(self):
+        recorder = InputRecorder(self.path, {'grid_size': 10})
+        recorder.datagram(b'abc', ('10.0.0.1', 5000), now=1.5, wall=1700000000.25)
+        recorder.datagram(b'', ('10.0.0.2', 5001), now=1.75, wall=1700000000.5)
+        recorder.tick(2.0, 1699999990.0)  # the wall clock stepped back; monotonic did not
+        recorder.datagram(b'de', ('10.0.0.1', 5000), now=2.5, wall=1699999990.5)
+        recorder.close()
+        config, records = read_recording(self.path)
+        self.assertEqual(config, {'grid_size': 10})
+        self.assertEqual(list(records), [
+            (KIND_DATAGRAM, 1.5, 1700000000.25, ('10.0.0.1', 5000), b'abc'),
+            (KIND_DATAGRAM, 1.75, 1700000000.5, ('10.0.0.2', 5001), b''),
+            (KIND_TICK, 2.0, 1699999990.0, None, b''),
+            (KIND_DATAGRAM, 2.5, 1699999990.5, ('10.0.0.1', 5000), b'de'),
+        ])
+
+    def test_torn_last_record(self):
+        recorder = InputRecorder(self.path, {})
+        recorder.datagram(b'abc', ('10.0.0.1', 5000), now=1.0, wall=2.0)
+        recorder.datagram(b'defg', ('10.0.0.1', 5000), now=1.0, wall=2.0)
+        recorder.close()
+        with open(self.path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.path) - 2)
+        _, records = read_recording(self.path)
+        self.assertEqual([data for _, _, _, _, data in records], [b'abc'])
+
+    def test_version_1_recording(self):
+        # One time per record, read back as both clocks
+        name = b'10.0.0.1:5000'
+        with open(self.path, 'wb') as f:
+            f.write(MAGIC + FILE_HEADER.pack(1, 2) + b'{}')
+            f.write(RECORD_HEADER_V1.pack(3, 0.0, 1, len(name)) + name)
+            f.write(RECORD_HEADER_V1.pack(KIND_DATAGRAM, 5.0, 1, 1) + b'x')
+            f.write(RECORD_HEADER_V1.pack(KIND_TICK, 6.0, 0, 0))
+        _, records = read_recording(self.path)
+        self.assertEqual(list(records), [(KIND_DATAGRAM, 5.0, 5.0, ('10.0.0.1', 5000), b'x'),
+                                         (KIND_TICK, 6.0, 6.0, None, b'')])
+
+    def test_replay_is_deterministic(self):
+        config = {'grid_size': 10, 'frequency': 20, 'grid_engine': 'dict', 'compress': False,
+                  'rate_control': True, 'min_rate': 2.0, 'min_budget': 4000, 'max_budget': 250000,
+                  'client_timeout': 1.0, 'started': 99.0}
+        recorder = InputRecorder(self.path, config)
+        address = ('10.0.0.1', 5000)
+        recorder.datagram(HEADER_STRUCT.pack(b'GCLP', PROTOCOL_VERSION, 0, 0, 0, 0, 0), address, 100.0, 5000.0)
+        for tick in range(1, 40):
+            now = 100.0 + tick * 0.05
+            # The wall clock jumps back a minute halfway; intervals must not notice
+            wall = 5000.0 + tick * 0.05 - (60 if tick > 20 else 0)
+            if tick < 10:
+                ack = encode_ack(tick - 1, 0)
+                recorder.datagram(HEADER_STRUCT.pack(b'GCLP', PROTOCOL_VERSION, MSG_ACK_BITS, tick - 1, tick,
+                                                     int(wall * 1000) - 30, len(ack)) + ack, address, now, wall)
+            recorder.tick(now, wall)
+        recorder.close()
+        runs = [replay(self.path) for _ in range(2)]
+        digests = {core.engine.digest.hexdigest() for core, *_ in runs}
+        self.assertEqual(len(digests), 1)
+        core, datagrams, ticks, recorded, _ = runs[0]
+        self.assertEqual((datagrams, ticks), (10, 39))
+        self.assertAlmostEqual(recorded, 1.95)
+        # Silent after tick 9 (100.45 s): dropped once the 1 s timeout passed, by monotonic time
+        self.assertEqual(core.clients, {})
+        self.assertEqual(core.evictions.current(), {'timeout': 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+"""Tests of the hashed timer wheel behind client liveness."""
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timer_wheel import TimerWheel
+
+
+class TimerWheelTest(unittest.TestCase):
+
+    def setUp(self):
+        # 8 slots of 1 s: a revolution is 8 s, so most tests cross several
+        self.wheel = TimerWheel(resolution=1.0, slots=8, now=100.0)
+
+    def run_until(self, end, step=1.0, start=100.0):
+        """Advance in steps from start to end; return {key: time it fired}"""
+        fired = {}
+        now = start
+        while now < end:
+            now += step
+            for key in self.wheel.advance(now):
+                self.assertNotIn(key, fired)
+                fired[key] = now
+        return fired
+
+    def test_fires_at_deadline(self):
+        self.wheel.schedule('a', 103.0)
+        self.wheel.schedule('b', 104.5)  # rounded up to the next tick, never early
+        self.assertEqual(self.run_until(110), {'a': 103.0, 'b': 105.0})
+        self.assertEqual(len(self.wheel), 0)
+
+    def test_several_revolutions(self):
+        self.wheel.schedule('a', 100.0 + 8 * 3 + 2)  # same slot as 102, three turns later
+        self.wheel.schedule('b', 102.0)
+        self.wheel.schedule('c', 100.0 + 8 * 5)
+        self.assertEqual(self.run_until(150), {'b': 102.0, 'a': 126.0, 'c': 140.0})
+
+    def test_reschedule_replaces(self):
+        self.wheel.schedule('a', 103.0)
+        self.wheel.schedule('a', 120.0)  # pushed back into another slot and revolution
+        self.assertEqual(len(self.wheel), 1)
+        self.assertEqual(self.run_until(130), {'a': 120.0})
+        # And moved earlier, from a timer that would have fired much later
+        self.wheel.schedule('b', 200.0)
+        self.wheel.schedule('b', 132.0)
+        self.assertEqual(self.run_until(210, start=130.0), {'b': 132.0})
+
+    def test_cancel(self):
+        self.wheel.schedule('a', 103.0)
+        self.wheel.schedule('b', 111.0)  # same slot as 103, next revolution
+        self.wheel.cancel('a')
+        self.wheel.cancel('a')  # twice, and an unknown key: no error
+        self.wheel.cancel('unknown')
+        self.assertEqual(len(self.wheel), 1)
+        self.assertEqual(self.run_until(120), {'b': 111.0})
+
+    def test_deadline_in_the_past(self):
+        self.wheel.schedule('a', 50.0)  # fires on the next tick
+        self.assertEqual(self.wheel.advance(100.9), [])
+        self.assertEqual(self.wheel.advance(101.0), ['a'])
+
+    def test_stall_longer_than_a_revolution(self):
+        for offset in range(1, 30):
+            self.wheel.schedule(offset, 100.0 + offset)
+        # 25 s without a tick: every slot is visited once, everything due fires together
+        self.assertEqual(sorted(self.wheel.advance(125.0)), list(range(1, 26)))
+        self.assertEqual(self.run_until(130, start=125.0), {26: 126.0, 27: 127.0, 28: 128.0, 29: 129.0})
+
+    def test_time_never_goes_back(self):
+        self.wheel.schedule('a', 105.0)
+        self.assertEqual(self.wheel.advance(104.0), [])
+        self.assertEqual(self.wheel.advance(90.0), [])
+        self.assertEqual(self.wheel.advance(105.0), ['a'])
+
+    def test_never_early_at_most_one_resolution_late(self):
+        wheel = TimerWheel(resolution=0.1, slots=64, now=0.0)
+        deadlines = {key: 0.05 + key * 0.137 for key in range(50)}  # up to one revolution and more
+        for key, deadline in deadlines.items():
+            wheel.schedule(key, deadline)
+        now = 0.0
+        for step in range(1, 1000):
+            now = step * 0.01
+            for key in wheel.advance(now):
+                self.assertGreaterEqual(now, deadlines[key])
+                self.assertLessEqual(now, deadlines[key] + 0.1 + 0.01 + 1e-9)
+                del deadlines[key]
+        self.assertEqual(deadlines, {})
+
+    def test_against_a_model(self):
+        rng = random.Random(3)
+        # Whole seconds: the model needs exact ticks (0.3 / 0.1 is 2.999...)
+        wheel = TimerWheel(resolution=1.0, slots=16, now=0.0)
+        deadlines = {}  # key -> deadline tick of the live timers
+        tick = 0
+        for _ in range(3000):
+            action = rng.random()
+            key = rng.randrange(40)
+            if action < 0.4:
+                deadline = tick + rng.randint(-2, 60)  # up to almost four revolutions
+                wheel.schedule(key, float(deadline))
+                deadlines[key] = max(deadline, tick + 1)
+            elif action < 0.5:
+                wheel.cancel(key)
+                deadlines.pop(key, None)
+            else:
+                tick += rng.choice((1, 1, 1, 2, 5, 40))
+                expected = {key for key, deadline in deadlines.items() if deadline <= tick}
+                self.assertEqual(set(wheel.advance(float(tick))), expected)
+                for key in expected:
+                    del deadlines[key]
+            self.assertEqual(len(wheel), len(deadlines))
+
+
+if __name__ == "__main__":
+    unittest.main()
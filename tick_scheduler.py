@@ -0,0 +1,93 @@
+import collections
+import time
+
+
+class TickScheduler:
+    """Fixed-timestep scheduler driven by time.monotonic() deadlines.
+
+    Deadlines advance by exactly one interval per tick, so time spent
+    doing the tick's work is absorbed instead of added to the period and
+    the long-run rate matches the configured frequency. When a tick ends
+    after the next deadline it is counted as an overrun; the missed slots
+    are then either run back to back (catch_up, bounded by max_catch_up)
+    or skipped.
+    """
+
+    def __init__(self, frequency, catch_up=False, max_catch_up=5, window=1000):
+        self.frequency = frequency
+        self.interval = 1.0 / frequency
+        self.catch_up = catch_up
+        self.max_catch_up = max_catch_up
+        self.next_deadline = None
+
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.durations = collections.deque(maxlen=window)  # seconds of work per tick
+        self.starts = collections.deque(maxlen=window)  # monotonic start of each tick
+
+    def start(self):
+        self.next_deadline = time.monotonic() + self.interval
+
+    def delay(self):
+        """Seconds to wait before the next tick is due (0 if it is already late)"""
+        if self.next_deadline is None:
+            self.start()
+        return max(0.0, self.next_deadline - time.monotonic())
+
+    def tick(self, callback):
+        """Run one tick now and schedule the next deadline"""
+        start = time.monotonic()
+        try:
+            callback()
+        finally:
+            # Keep the schedule even when the tick raised, or the next one would be due at once
+            self.account(start)
+
+    def account(self, start):
+        """Record a tick that started at start and move the deadline"""
+        end = time.monotonic()
+        self.ticks += 1
+        self.durations.append(end - start)
+        self.starts.append(start)
+
+        self.next_deadline += self.interval
+        if end > self.next_deadline:
+            self.overruns += 1
+            # Whole slots already missed beyond the one that is due right now
+            behind = int((end - self.next_deadline) / self.interval)
+            allowed = self.max_catch_up if self.catch_up else 0
+            if behind > allowed:
+                dropped = behind - allowed
+                self.skipped += dropped
+                self.next_deadline += dropped * self.interval
+
+    def actual_rate(self):
+        if len(self.starts) < 2:
+            return 0.0
+        span = self.starts[-1] - self.starts[0]
+        return (len(self.starts) - 1) / span if span > 0 else 0.0
+
+    def percentile(self, fraction):
+        if not self.durations:
+            return 0.0
+        ordered = sorted(self.durations)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    def stats(self):
+        return {
+            'target_hz': self.frequency,
+            'actual_hz': self.actual_rate(),
+            'ticks': self.ticks,
+            'overruns': self.overruns,
+            'skipped': self.skipped,
+            'p50_ms': self.percentile(0.50) * 1000,
+            'p95_ms': self.percentile(0.95) * 1000,
+            'p99_ms': self.percentile(0.99) * 1000,
+        }
+
+    def summary(self):
+        stats = self.stats()
+        return (f"Tick rate {stats['actual_hz']:.1f}/{stats['target_hz']:g} Hz | "
+                f"p50 {stats['p50_ms']:.2f} ms p95 {stats['p95_ms']:.2f} ms p99 {stats['p99_ms']:.2f} ms | "
+                f"overruns {stats['overruns']} skipped {stats['skipped']}")
@@ -0,0 +1,50 @@
+class TimerWheel:
+    """Hashed timer wheel: schedule() and cancel() are O(1), advance() visits only the slots passed.
+
+    Time is cut into ticks of `resolution` seconds and a timer lives in slot
+    deadline_tick % slots. A deadline more than one revolution away waits in
+    its slot until the revolution it is due, so the wheel should span the
+    usual timeout. Timers fire up to one resolution late, never early.
+    """
+
+    def __init__(self, resolution=0.1, slots=512, now=0.0):
+        self.resolution = resolution
+        self.slots = [{} for _ in range(slots)]  # key -> deadline tick
+        self.slot_of = {}  # key -> its slot
+        self.current = int(now / resolution)
+
+    def __len__(self):
+        return len(self.slot_of)
+
+    def schedule(self, key, deadline):
+        """Fire key at deadline (seconds), replacing any timer it already has"""
+        self.cancel(key)
+        tick = max(-int(-deadline // self.resolution), self.current + 1)
+        slot = self.slots[tick % len(self.slots)]
+        slot[key] = tick
+        self.slot_of[key] = slot
+
+    def cancel(self, key):
+        slot = self.slot_of.pop(key, None)
+        if slot is not None:
+            del slot[key]
+
+    def advance(self, now):
+        """Move the wheel to now and return the keys whose deadline passed"""
+        target = int(now / self.resolution)
+        if target <= self.current:
+            return []
+        expired = []
+        slots = self.slots
+        # After a stall longer than a revolution every slot is visited once
+        for tick in range(self.current + 1, self.current + 1 + min(target - self.current, len(slots))):
+            slot = slots[tick % len(slots)]
+            if not slot:
+                continue
+            due = [key for key, deadline in slot.items() if deadline <= target]
+            for key in due:
+                del slot[key]
+                del self.slot_of[key]
+            expired.extend(due)
+        self.current = target
+        return expired